@@ -0,0 +1,165 @@
+# benchmarks/bench_callbacks.py
+# Filter-button callbacks per second: the old handler (an if-chain over the
+# split callback_data, every keyboard built from scratch) vs the routing
+# table with prebuilt keyboards. Telegram and the FSM are stubbed out, so
+# this is the bot's own CPU cost per tap.
+#
+#   python -m benchmarks.bench_callbacks [--rounds 2000]
+import argparse
+import asyncio
+import logging
+import time
+
+import benchmarks.fixtures  # noqa: F401  (BOT_TOKEN for config)
+from handlers import filters_handlers
+from keyboards import filters_kb
+
+# a filter session: open the menus, pick values, go back, reset
+TAPS = [
+    "buy:open", "buy:price", "buy:price:2000000-4000000", "buy:back",
+    "buy:bedrooms", "buy:bed:2", "buy:back", "buy:type", "buy:type:Condo",
+    "buy:back", "buy:area", "buy:area:Jomtien", "buy:more", "buy:feat:pool",
+    "buy:feat:pool", "rent:open", "rent:price", "rent:price:10000-20000",
+    "rent:back", "buy:reset",
+]
+
+
+class FakeMessage:
+    class chat:
+        id = 1
+
+    async def edit_text(self, text, reply_markup=None):
+        return None
+
+
+class FakeQuery:
+    def __init__(self, data: str):
+        self.data = data
+        self.message = FakeMessage()
+
+    async def answer(self, *args, **kwargs):
+        return None
+
+
+class FakeState:
+    def __init__(self):
+        self.data = {}
+
+    async def get_data(self):
+        return dict(self.data)
+
+    async def set_data(self, data):
+        self.data = dict(data)
+
+    async def update_data(self, data=None, **kwargs):
+        self.data.update(data or {}, **kwargs)
+        return dict(self.data)
+
+
+def _unwrapped(name: str):
+    return getattr(filters_kb, name).__wrapped__
+
+
+async def legacy_handle_callbacks(query, state):
+    """The pre-table handler, trimmed to the filter actions benchmarked here."""
+    main_filters_kb = _unwrapped("_main_filters_kb")
+    price_kb, bedrooms_kb, type_kb = _unwrapped("price_kb"), _unwrapped("bedrooms_kb"), _unwrapped("type_kb")
+    area_kb, more_kb, summary_kb = _unwrapped("area_kb"), _unwrapped("more_kb"), _unwrapped("summary_kb")
+
+    parts = query.data.split(":")
+    mode = parts[0]
+    action = parts[1] if len(parts) > 1 else None
+
+    user_data = await state.get_data()
+    if not user_data:
+        await state.set_data(filters_handlers.empty_filters(mode))
+        user_data = await state.get_data()
+
+    if action in ["open", "back"]:
+        await query.message.edit_text("Выберите параметры поиска:", reply_markup=main_filters_kb(mode))
+        await query.answer()
+        return
+    if action == "price" and len(parts) == 2:
+        await query.message.edit_text("Выберите диапазон цены:", reply_markup=price_kb(mode))
+        await query.answer()
+        return
+    if action == "bedrooms" and len(parts) == 2:
+        await query.message.edit_text("Выберите количество спален:", reply_markup=bedrooms_kb(mode))
+        await query.answer()
+        return
+    if action == "type" and len(parts) == 2:
+        await query.message.edit_text("Выберите тип недвижимости:", reply_markup=type_kb(mode))
+        await query.answer()
+        return
+    if action == "area" and len(parts) == 2:
+        await query.message.edit_text("Выберите район:", reply_markup=area_kb(mode))
+        await query.answer()
+        return
+    if action == "more" and len(parts) == 2:
+        await query.message.edit_text("Дополнительные фильтры:", reply_markup=more_kb(mode))
+        await query.answer()
+        return
+    if action == "price" and len(parts) == 3:
+        min_s, max_s = parts[2].split("-")
+        await state.update_data(min_price=int(min_s) if min_s else None, max_price=int(max_s) if max_s else None)
+        user = await state.get_data()
+        await query.message.edit_text(f"Цена установлена: {parts[2]}\n\nТекущие фильтры: {user}", reply_markup=summary_kb(mode))
+        await query.answer("Цена установлена")
+        return
+    for name, key, label in (("bed", "bedrooms", "Спальни"), ("type", "property_type", "Тип"), ("area", "location", "Район")):
+        if action == name and len(parts) == 3:
+            await state.update_data({key: parts[2]})
+            user = await state.get_data()
+            await query.message.edit_text(f"{label}: {parts[2]}\n\nТекущие фильтры: {user}", reply_markup=summary_kb(mode))
+            await query.answer()
+            return
+    if action == "feat" and len(parts) == 3:
+        feats = (await state.get_data()).get("features", [])
+        feats.remove(parts[2]) if parts[2] in feats else feats.append(parts[2])
+        await state.update_data(features=feats)
+        user = await state.get_data()
+        await query.message.edit_text(f"Фильтры: {user}", reply_markup=main_filters_kb(mode))
+        await query.answer("Изменено")
+        return
+    if action == "reset":
+        await state.set_data(filters_handlers.empty_filters(mode))
+        await query.message.edit_text("Фильтры сброшены.", reply_markup=main_filters_kb(mode))
+        await query.answer("Сброшено")
+        return
+    await query.answer()
+
+
+async def run(handle, rounds: int) -> float:
+    state = FakeState()
+    queries = [FakeQuery(d) for d in TAPS]
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            await handle(q, state)
+    return rounds * len(queries) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=2000)
+    args = ap.parse_args()
+    # the PRICE set log line is not what we measure
+    logging.disable(logging.INFO)
+
+    filters_kb.prebuild()
+    old = asyncio.run(run(legacy_handle_callbacks, args.rounds))
+    new = asyncio.run(run(filters_handlers.handle_callbacks, args.rounds))
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        _unwrapped("area_kb")("buy")
+    build_us = (time.perf_counter() - t0) / args.rounds * 1e6
+
+    print(f"{'handler':<28}{'callbacks/s':>14}")
+    print(f"{'if-chain, fresh keyboards':<28}{old:>14.0f}")
+    print(f"{'table, prebuilt keyboards':<28}{new:>14.0f}")
+    print(f"speedup x{new / old:.2f}; building area_kb from scratch: {build_us:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# benchmarks/bench_cluster.py
+# Throughput of the whole bot as separate processes: `python bot.py` in the
+# single-process mode and with WORKERS=2..N, fed through getUpdates by a fake
+# Bot API server, with the fixture server as the site. --chats users play
+# the replay benchmark's recorded session at the same time, one tap each per
+# round: the next round is released once /healthz counts the previous one as
+# handled, the way a user taps again after the answer. Every run waits for
+# the first crawl and plays a warm-up session with other users first.
+#
+# Scaling needs cores: the front, every worker and this script each want one.
+#
+#   python -m benchmarks.bench_cluster [--workers 2,4] [--chats 60]
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fixtures import FixtureServer
+from benchmarks.replay import HERE, for_chat, load_session
+
+ROOT = os.path.dirname(HERE)
+QUIET = 0.5  # no Telegram calls for this long after the last round: the session is over
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rounds(chats: List[List[Dict]]) -> List[List[Dict]]:
+    """Round i holds update i of every chat."""
+    return [[updates[i] for updates in chats if i < len(updates)] for i in range(max(map(len, chats)))]
+
+
+class FakeTelegram:
+    """getUpdates hands out whatever was released; every other method answers at once after `latency`."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.updates: List[Dict] = []
+        self.released = asyncio.Event()
+        self.calls = 0
+        self.last_call = 0.0
+        self.confirmed = 0  # update ids below this were taken and acknowledged
+        self._next_id = 0
+        self._message_ids = 0
+
+    def release(self, updates: List[Dict]) -> int:
+        """Queues the updates under new ids; returns the last id."""
+        for upd in updates:
+            self._next_id += 1
+            self.updates.append(dict(upd, update_id=self._next_id))
+        self.released.set()
+        return self._next_id
+
+    def _message(self, chat_id) -> Dict:
+        self._message_ids += 1
+        chat = int(chat_id) if str(chat_id).lstrip("-").isdigit() else 1
+        return {"message_id": self._message_ids, "date": int(time.time()), "chat": {"id": chat, "type": "private"},
+                "text": "ok"}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if method == "getupdates":
+            offset = int(params.get("offset") or 0)
+            self.confirmed = max(self.confirmed, offset)
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates:
+                self.released.clear()
+                try:
+                    await asyncio.wait_for(self.released.wait(), min(float(params.get("timeout") or 0), 1.0))
+                except asyncio.TimeoutError:
+                    pass
+            return web.json_response({"ok": True, "result": self.updates[:100]})
+
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.last_call = time.perf_counter()
+        if method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        elif method == "sendmediagroup":
+            result = [self._message(params.get("chat_id")) for _ in json.loads(params.get("media", "[]"))]
+        elif method.startswith(("send", "edit", "copy")):
+            result = self._message(params.get("chat_id"))
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+async def health(http: aiohttp.ClientSession, port: int) -> Dict:
+    async with http.get(f"http://127.0.0.1:{port}/healthz") as resp:
+        return await resp.json()
+
+
+async def wait_ready(http: aiohttp.ClientSession, port: int, timeout: float = 120) -> None:
+    """Until /healthz says the first crawl is done."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await health(http, port))["index_records"]:
+                return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("the bot did not come up")
+
+
+async def play(http: aiohttp.ClientSession, port: int, tg: FakeTelegram, chats: List[List[Dict]],
+               timeout: float) -> float:
+    """Plays the sessions round by round; returns when the bot made its last Telegram call."""
+    handled = (await health(http, port))["updates_handled"]
+    deadline = time.perf_counter() + timeout
+    for batch in rounds(chats):
+        tg.release(batch)
+        handled += len(batch)
+        while (await health(http, port))["updates_handled"] < handled:
+            if time.perf_counter() > deadline:
+                raise TimeoutError("the bot did not keep up")
+            await asyncio.sleep(0.01)
+    # answers still being sent for the last round
+    while time.perf_counter() - tg.last_call < QUIET:
+        await asyncio.sleep(0.05)
+    return tg.last_call
+
+
+async def run(args, tg: FakeTelegram, tg_url: str, site_url: str, workers: Optional[int]) -> Dict:
+    data_dir = tempfile.mkdtemp(prefix="cluster-")
+    port = free_port()
+    env = dict(
+        os.environ, BOT_TOKEN="0:benchmark", DATA_DIR=data_dir, SNAPSHOT="0",
+        TELEGRAM_API_URL=tg_url, BASE_URL=site_url, WEB_HOST="127.0.0.1", WEB_PORT=str(port),
+        WORKERS=str(workers or 1), PARSE_PROCESSES="0",
+        # users tap as soon as they get the answer; Telegram's per-chat limit isn't what we measure
+        SEND_GLOBAL_RATE="1000000", SEND_CHAT_RATE="1000000", SEND_CHAT_BURST="1000000",
+    )
+    log = open(os.path.join(data_dir, "bot.log"), "w")
+    proc = subprocess.Popen([sys.executable, "bot.py"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        recorded = load_session(args.updates)
+        async with aiohttp.ClientSession() as http:
+            await wait_ready(http, port)
+            await play(http, port, tg, [for_chat(recorded, 800_000 + c, 0) for c in range(args.chats)], args.timeout)
+
+            chats = [for_chat(recorded, 900_000 + c, 0) for c in range(args.chats)]
+            calls = tg.calls
+            t0 = time.perf_counter()
+            end = await play(http, port, tg, chats, args.timeout)
+        return {"updates": sum(map(len, chats)), "seconds": end - t0, "telegram_calls": tg.calls - calls}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            # the bot still talks to the fake Telegram while it stops
+            await asyncio.to_thread(proc.wait, 60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        if args.keep:
+            print(f"  (logs in {data_dir})")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+async def bench(args, site_url: str) -> List[tuple]:
+    tg = FakeTelegram(args.tg_latency)
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", tg.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    rows = []
+    try:
+        for workers in [None] + args.workers:
+            label = "single process" if workers is None else f"front + {workers} workers"
+            r = await run(args, tg, f"http://127.0.0.1:{port}", site_url, workers)
+            rows.append((label, r))
+            print(f"  {label:<22}{r['updates'] / r['seconds']:>10.1f} updates/s", flush=True)
+    finally:
+        await runner.cleanup()
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="2,4", help="worker counts to try, comma-separated (WORKERS=1 is the single process)")
+    ap.add_argument("--chats", type=int, default=60, help="users playing the recorded session at once")
+    ap.add_argument("--updates", default=os.path.join(HERE, "updates.jsonl"))
+    ap.add_argument("--latency", type=float, default=0.05, help="site response time, s")
+    ap.add_argument("--tg-latency", type=float, default=0.02, help="Bot API response time, s")
+    ap.add_argument("--pages", type=int, default=3, help="result pages per search on the fixture site")
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--keep", action="store_true", help="keep the data dirs and logs")
+    args = ap.parse_args()
+    args.workers = [int(w) for w in args.workers.split(",") if int(w) > 1]
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{cores} CPU cores available")
+    with FixtureServer(latency=args.latency, pages=args.pages) as server:
+        rows = asyncio.run(bench(args, server.url))
+
+    base = rows[0][1]
+    base_rate = base["updates"] / base["seconds"]
+    print(f"\n{'':<24}{'updates/s':>10}{'vs single':>11}{'tg calls':>10}")
+    for label, r in rows:
+        rate = r["updates"] / r["seconds"]
+        print(f"{label:<24}{rate:>10.1f}{rate / base_rate:>10.2f}x{r['telegram_calls']:>10}")
+    print(f"({base['updates']} updates: {args.chats} chats x the recorded session)")
+    if cores < 2:
+        print("one core: the processes take turns on it, so more workers can't go faster here")
+
+
+if __name__ == "__main__":
+    main()
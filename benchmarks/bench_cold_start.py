@@ -0,0 +1,133 @@
+# benchmarks/bench_cold_start.py
+# Time from process start to the first answers, measured in fresh
+# processes the way Fly restarts the bot: a first boot with an empty data
+# dir, a restart without the cache snapshot (the index is still restored
+# from disk) and a restart with it. Each child imports the bot, runs the
+# dispatcher's startup hooks and feeds a short session; Telegram is the
+# replay benchmark's recording session, the site is the fixture server.
+#
+#   python -m benchmarks.bench_cold_start [--latency 0.3] [--budget 3.0]
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureServer
+
+# (label, update); the first one is what "time to first update" means
+SESSION = [
+    ("/start", {"text": "/start", "entities": [{"offset": 0, "length": 6, "type": "bot_command"}]}),
+    ("🌆 Проекты", {"text": "🌆 Проекты"}),
+    ("📞 Контакты", {"text": "📞 Контакты"}),
+    ("🏠 Купить", {"text": "🏠 Купить"}),
+    ("buy:type:Condo", {"data": "buy:type:Condo"}),
+    ("buy:show", {"data": "buy:show"}),
+]
+
+HEAVY = ("bs4", "lxml")
+
+
+def _update(i: int, spec: dict) -> dict:
+    user = {"id": 4242, "is_bot": False, "first_name": "Boot"}
+    msg = {"message_id": i, "date": int(time.time()), "chat": {"id": 4242, "type": "private"}, "from": user}
+    if "data" in spec:
+        msg["text"] = "Выберите параметры поиска:"
+        return {"update_id": i, "callback_query": {
+            "id": str(i), "from": user, "chat_instance": "boot", "data": spec["data"], "message": msg,
+        }}
+    return {"update_id": i, "message": dict(msg, **spec)}
+
+
+async def child(url: str, spawned: float, settle: float) -> dict:
+    started = time.perf_counter()
+    import bot as app
+    imported = time.perf_counter() - started
+
+    from aiogram.types import Update
+
+    from benchmarks.replay import make_session
+    from services import index, parser
+
+    parser.BASE = url
+    bot = app.create_bot(make_session(0.0))
+    dp = app.create_dispatcher()
+    # what start_polling does before the first getUpdates
+    await dp.emit_startup(bot=bot)
+    ready = time.time() - spawned
+
+    answered = {}
+    heavy_before_first = None
+    for i, (label, spec) in enumerate(SESSION, 1):
+        await dp.feed_update(bot, Update.model_validate(_update(i, spec), context={"bot": bot}))
+        answered[label] = time.time() - spawned
+        if heavy_before_first is None:
+            heavy_before_first = [m for m in HEAVY if m in sys.modules]
+    upstream = parser.fetch_stats["requests"]
+
+    # let the background crawl finish so the next boot has an index to restore
+    deadline = time.perf_counter() + settle
+    while settle and index.current() is None and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+
+    await dp.emit_shutdown(bot=bot)
+    return {
+        "import_s": imported, "ready_s": ready, "answered": answered,
+        "heavy_before_first": heavy_before_first, "upstream_requests": upstream,
+    }
+
+
+def spawn(url: str, data_dir: str, snapshot: bool, settle: float) -> dict:
+    env = dict(
+        os.environ, BOT_TOKEN="0:benchmark", DATA_DIR=data_dir, SNAPSHOT="1" if snapshot else "0",
+        # the session taps without pauses; Telegram's per-chat limit isn't what we measure
+        SEND_GLOBAL_RATE="1000000", SEND_CHAT_RATE="1000000", SEND_CHAT_BURST="1000000",
+        SPAWNED_AT=repr(time.time()),
+    )
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", url, "--settle", str(settle)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.3, help="site response time, s")
+    ap.add_argument("--settle", type=float, default=60.0, help="max wait for the first crawl before shutdown, s")
+    ap.add_argument("--budget", type=float, default=3.0, help="max seconds to the first answer after a restart")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        result = asyncio.run(child(args.child, float(os.environ["SPAWNED_AT"]), args.settle))
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    data_dir = tempfile.mkdtemp(prefix="cold-start-")
+    runs = []
+    with FixtureServer(latency=args.latency, pages=2) as server:
+        # the first boot also leaves the index and the snapshot behind
+        runs.append(("first boot", spawn(server.url, data_dir, True, args.settle)))
+        runs.append(("restart, no snapshot", spawn(server.url, data_dir, False, 0)))
+        runs.append(("restart, snapshot", spawn(server.url, data_dir, True, 0)))
+
+    labels = [label for label, _ in SESSION]
+    print(f"{'':<22}{'import':>8}{'ready':>8}" + "".join(f"{label[:12]:>14}" for label in labels) + f"{'upstream':>10}")
+    for name, r in runs:
+        cells = "".join(f"{r['answered'][label]:>13.2f}s" for label in labels)
+        print(f"{name:<22}{r['import_s']:>7.2f}s{r['ready_s']:>7.2f}s{cells}{r['upstream_requests']:>10}")
+    print("(seconds since process start; upstream = site requests until the last answer, crawler included)")
+    print(f"parsing libraries loaded before the first answer: {runs[-1][1]['heavy_before_first'] or 'none'}")
+
+    first = runs[-1][1]["answered"][labels[0]]
+    verdict = "ok" if first <= args.budget else "OVER BUDGET"
+    print(f"time to first update after a restart: {first:.2f}s (budget {args.budget:.1f}s) {verdict}")
+    return 0 if first <= args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# benchmarks/bench_memory.py
+# Memory of N listings held as dicts (the old representation), as slotted
+# Listing objects and as one ListingTable; plus the price range filter:
+# price_in_range per dict vs the table's column scan.
+#
+#   python -m benchmarks.bench_memory [--items 20000]
+import argparse
+import dataclasses
+import time
+import tracemalloc
+
+from benchmarks.fixtures import listing_page_html
+from services import parser
+from services.listing import ListingTable
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20_000)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    per_page = 50
+    pages = -(-args.items // per_page)
+    # parse outside the measurement
+    html = [listing_page_html(p, per_page) for p in range(1, pages + 1)]
+    raw = [dataclasses.asdict(i) for h in html for i in parser._parse_page(h)][:args.items]
+    n = len(raw)
+
+    def fresh_strings(r: dict) -> dict:
+        # every row gets its own string objects, like pages parsed at different times
+        return {k: "".join(v) if isinstance(v, str) else v for k, v in r.items()}
+
+    dicts, dict_bytes = measure(lambda: [fresh_strings(r) for r in raw])
+    objs, obj_bytes = measure(lambda: [parser.Listing(**fresh_strings(r)) for r in raw])
+    table, table_bytes = measure(lambda: ListingTable(fresh_strings(r) for r in raw))
+    assert list(table) == objs
+
+    print(f"{n} listings")
+    print(f"{'layout':<14}{'MB':>8}{'B/item':>9}")
+    for name, b in (("dicts", dict_bytes), ("Listing", obj_bytes), ("ListingTable", table_bytes)):
+        print(f"{name:<14}{b / 2 ** 20:>8.2f}{b / n:>9.0f}")
+
+    lo, hi = 2_000_000, 8_000_000
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        hits_old = [i for i in dicts if parser.price_in_range(i["price_value"], lo, hi)]
+    old = (time.perf_counter() - t0) / args.rounds
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        hits_new = table.price_ids(lo, hi)
+    new = (time.perf_counter() - t0) / args.rounds
+    assert len(hits_old) == len(hits_new)
+    print(f"\nprice filter, {len(hits_new)} hits: price_in_range {old * 1000:.2f} ms, column scan {new * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_pages.py
+# Reading every result page of a search: one page after another vs page
+# discovery + parallel fetch. Reports time to the first page and to the last.
+#
+#   python -m benchmarks.bench_pages [--pages 10] [--latency 0.3]
+import argparse
+import asyncio
+import time
+
+from benchmarks.fixtures import FixtureServer
+from services import parser
+
+FILTERS = {"mode": "buy", "property_type": "Condo"}
+
+
+async def fetch(url: str, page: int):
+    # a live search's fetch without the result cache (fetch_fresh would go
+    # through the crawler's slower limiter)
+    return await parser.fetch_parsed(parser.page_url(url, page))
+
+
+async def sequential(url: str, max_pages: int) -> tuple:
+    """The old way: page after page until one comes back empty."""
+    t0 = time.perf_counter()
+    first = None
+    items = 0
+    for page in range(1, max_pages + 1):
+        got = await fetch(url, page)
+        if not got:
+            break
+        first = first or time.perf_counter() - t0
+        items += len(got)
+    return first, time.perf_counter() - t0, items
+
+
+async def streamed(url: str, max_pages: int) -> tuple:
+    t0 = time.perf_counter()
+    first = None
+    items = 0
+    async for got in parser.stream_pages(url, max_pages, fetch):
+        if got is None:
+            break
+        first = first or time.perf_counter() - t0
+        items += len(got)
+    return first, time.perf_counter() - t0, items
+
+
+async def run(server: FixtureServer, max_pages: int) -> None:
+    parser.BASE = server.url
+    url = parser._build_search_url(FILTERS)
+    print(f"{'mode':<12}{'first ms':>10}{'total ms':>10}{'items':>8}{'requests':>10}")
+    for name, fn in (("sequential", sequential), ("parallel", streamed)):
+        parser._page_states.clear()
+        before = server.requests
+        first, total, items = await fn(url, max_pages)
+        print(f"{name:<12}{first * 1000:>10.0f}{total * 1000:>10.0f}{items:>8}{server.requests - before:>10}")
+    await parser.close_session()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--latency", type=float, default=0.3)
+    args = ap.parse_args()
+
+    with FixtureServer(latency=args.latency, pages=args.pages) as server:
+        asyncio.run(run(server, args.pages + 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_parser.py
+# BeautifulSoup vs the lxml fast path: pages/s and peak memory per page.
+#
+#   python -m benchmarks.bench_parser                 # synthetic pages
+#   python -m benchmarks.bench_parser saved/*.html    # pages saved from the site
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.fixtures import listing_page_html
+from services import parser
+
+
+def load_pages(paths, count: int) -> list:
+    if paths:
+        pages = []
+        for p in paths:
+            with open(p, encoding="utf-8") as f:
+                pages.append(f.read())
+        return pages
+    return [listing_page_html(page) for page in range(1, count + 1)]
+
+
+def bench(fn, pages: list, rounds: int) -> dict:
+    fn(pages[0])  # warm-up
+
+    t0 = time.perf_counter()
+    items = 0
+    for _ in range(rounds):
+        for html in pages:
+            items += len(fn(html))
+    elapsed = time.perf_counter() - t0
+
+    # Python-heap peak only: libxml2's own tree memory is invisible to tracemalloc
+    peak = 0
+    tracemalloc.start()
+    for html in pages:
+        tracemalloc.reset_peak()
+        fn(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    n = rounds * len(pages)
+    return {"pages_s": n / elapsed, "ms_page": elapsed / n * 1000, "items": items // rounds, "peak_kb": peak / 1024}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("html", nargs="*", help="saved HTML pages (default: synthetic)")
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    pages = load_pages(args.html, args.pages)
+    size_kb = sum(len(p) for p in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size_kb:.0f} KB avg")
+
+    # both must agree before speed means anything
+    for html in pages:
+        assert parser._parse_page_bs4(html) == parser._parse_page_lxml(html), "parsers disagree"
+
+    print(f"{'parser':<8}{'pages/s':>10}{'ms/page':>10}{'items':>8}{'peak KB':>10}")
+    for name, fn in (("bs4", parser._parse_page_bs4), ("lxml", parser._parse_page_lxml)):
+        r = bench(fn, pages, args.rounds)
+        print(f"{name:<8}{r['pages_s']:>10.1f}{r['ms_page']:>10.2f}{r['items']:>8}{r['peak_kb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_prices.py
+# Price texts per second: the old string-replace parse_price vs the
+# normalizer (uncached, and with the cache warm the way a recrawl of the
+# same cards finds it); then price-button filters over a big table and the
+# index: the old per-row comparison vs the bucket lookup.
+#
+#   python -m benchmarks.bench_prices [--rows 100000] [--rounds 20]
+import argparse
+import random
+import sys
+import time
+from typing import Optional
+
+import benchmarks.fixtures  # noqa: F401  (BOT_TOKEN for config)
+from benchmarks.check_prices import BUTTON_RANGES, random_price, render
+from services import index, prices
+from services.listing import Listing, ListingTable
+
+
+def legacy_parse_price(text: str) -> Optional[int]:
+    """services.parser.parse_price before the normalizer."""
+    if not text:
+        return None
+    t = text.lower()
+    if "request" in t:
+        return None
+    t = t.replace("from", "").replace("฿", "").replace(",", "").strip()
+    if "m" in t:
+        try:
+            return int(float(t.replace("m", "")) * 1_000_000)
+        except ValueError:
+            return None
+    digits = "".join(c for c in t if c.isdigit())
+    return int(digits) if digits else None
+
+
+def legacy_price_ids(table: ListingTable, min_price: Optional[int], max_price: Optional[int]) -> list:
+    """ListingTable.price_ids before the bucket column."""
+    lo = 0 if min_price is None else max(min_price, 0)
+    hi = sys.maxsize if max_price is None else max_price
+    return [i for i, p in enumerate(table.price_values) if lo <= p <= hi]
+
+
+def per_second(fn, items, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return rounds * len(items) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+    rng = random.Random(1)
+
+    thb = [random_price(rng) for _ in range(20_000)]
+    texts = [render(rng, p) for p in thb]
+    old = per_second(legacy_parse_price, texts, 3)
+    uncached = per_second(prices.normalize.__wrapped__, texts, 3)
+    texts_seen = texts[:5_000]  # fits the cache
+    for t in texts_seen:
+        prices.normalize(t)
+    cached = per_second(prices.normalize, texts_seen, 12)
+
+    def right(fn) -> float:
+        return sum(fn(t) == p for t, p in zip(texts, thb)) / len(texts) * 100
+
+    def value(text: str) -> Optional[int]:
+        price = prices.normalize.__wrapped__(text)
+        return None if price is None else price.value
+
+    print(f"{'price texts':<34}{'texts/s':>12}{'read right':>12}")
+    print(f"{'string replaces (old)':<34}{old:>12.0f}{right(legacy_parse_price):>11.1f}%")
+    print(f"{'normalizer, uncached':<34}{uncached:>12.0f}{right(value):>11.1f}%")
+    print(f"{'normalizer, cache warm':<34}{cached:>12.0f}")
+
+    rows = [
+        Listing(f"#{i}", f"https://x/unit/{i}", "", None if rng.random() < 0.1 else random_price(rng), None, "Pattaya", None)
+        for i in range(args.rows)
+    ]
+    table = ListingTable(rows)
+    records = [(r.title, r.link, r.price, r.price_value, r.img, r.location, r.area, r.features) for r in rows]
+    idx = index.ListingIndex(records, {"mode": {"buy": range(len(rows))}}, time.time())
+    ranges = [r for r in BUTTON_RANGES if r != (None, None)]
+    filters = [{"mode": "buy", "min_price": lo, "max_price": hi} for lo, hi in ranges]
+
+    old = per_second(lambda r: legacy_price_ids(table, *r), ranges, args.rounds)
+    new = per_second(lambda r: table.price_ids(*r), ranges, args.rounds)
+    # off the buttons' bounds: the index falls back to its sorted price list
+    idx_old = per_second(lambda f: idx.ids_for(dict(f, min_price=(f["min_price"] or 0) + 1)), filters, args.rounds)
+    idx._bucket_ranges.clear()
+    idx_new = per_second(idx.ids_for, filters, args.rounds)
+
+    print(f"\n{f'price buttons, {args.rows} rows':<34}{'filters/s':>12}")
+    print(f"{'table, compare per row (old)':<34}{old:>12.0f}")
+    print(f"{'table, bucket column':<34}{new:>12.0f}  x{new / old:.1f}")
+    print(f"{'index, sorted prices':<34}{idx_old:>12.0f}")
+    print(f"{'index, bucket sets':<34}{idx_new:>12.0f}  x{idx_new / idx_old:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_ranking.py
+# Sorted results: heap top-K (what the bot does) vs sorting every match and
+# slicing, over the index and over a streamed ListingTable. Both must give
+# the same listings in the same order; the script checks that first.
+#
+#   python -m benchmarks.bench_ranking [--rows 50000] [--k 30] [--rounds 20]
+import argparse
+import random
+import time
+
+import benchmarks.fixtures  # noqa: F401  (BOT_TOKEN for config)
+from benchmarks.check_prices import random_price
+from keyboards.filters_kb import BEDROOMS
+from services import index, ranking
+from services.listing import Listing, ListingTable
+
+
+def build(rows: int, rng: random.Random):
+    items, bed_postings = [], {bed: set() for _, bed in BEDROOMS}
+    for i in range(rows):
+        beds = rng.choice(BEDROOMS)[1]
+        title = rng.choice([f"{beds} Bedroom Condo #{i}", f"Condo #{i}", "Studio in Jomtien"])
+        price = None if rng.random() < 0.05 else random_price(rng)
+        items.append(Listing(title, f"https://x/public/unit/{rng.randrange(1, 10 * rows)}", "", price, None, "Pattaya", None))
+        bed_postings[beds].add(i)
+    records = [(r.title, r.link, r.price, r.price_value, r.img, r.location, r.area, r.features) for r in items]
+    idx = index.ListingIndex(records, {"mode": {"buy": range(rows)}, "bed": bed_postings}, time.time())
+    return ListingTable(items), idx
+
+
+def sort_all_index(idx, filters, k):
+    key = idx.rank_key(filters)
+    return sorted(idx.ids_for(filters), key=lambda i: (key(i), i))[:k]
+
+
+def sort_all_table(table, sort, k):
+    return sorted(table, key=lambda r: ranking.rank(sort, r.price_value, r.title, r.link))[:k]
+
+
+def per_second(fn, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return rounds / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--k", type=int, default=ranking.TOP_K)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+    table, idx = build(args.rows, random.Random(1))
+
+    print(f"{args.rows} listings, top {args.k}")
+    print(f"{'':<26}{'heap/s':>10}{'sort all/s':>12}")
+    for sort in ranking.SORTS:
+        filters = {"mode": "buy", "sort": sort}
+        heap_ids = ranking.top_ids(idx.ids_for(filters), idx.rank_key(filters), args.k)
+        assert heap_ids == sort_all_index(idx, filters, args.k), f"index order differs for {sort}"
+        assert list(ranking.top(table, sort, args.k)) == sort_all_table(table, sort, args.k), \
+            f"table order differs for {sort}"
+
+        heap = per_second(lambda: ranking.top_ids(idx.ids_for(filters), idx.rank_key(filters), args.k), args.rounds)
+        full = per_second(lambda: sort_all_index(idx, filters, args.k), args.rounds)
+        print(f"{'index, ' + sort:<26}{heap:>10.1f}{full:>12.1f}")
+        heap = per_second(lambda: ranking.top(table, sort, args.k), args.rounds)
+        full = per_second(lambda: sort_all_table(table, sort, args.k), args.rounds)
+        print(f"{'table, ' + sort:<26}{heap:>10.1f}{full:>12.1f}")
+    print("orders match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_recrawl.py
+# Repeated crawls of unchanged pages: what conditional requests and the
+# listing-region hash save in bytes and parses.
+#
+#   python -m benchmarks.bench_recrawl               # server without ETags, hash only
+#   python -m benchmarks.bench_recrawl --etags       # server answers 304
+import argparse
+import asyncio
+import time
+
+from benchmarks.fixtures import FixtureServer
+from services import parser
+
+
+async def crawl(url: str, pages: int) -> int:
+    got = await asyncio.gather(*(parser.fetch_parsed(f"{url}?page={p}") for p in range(1, pages + 1)))
+    return sum(len(items or ()) for items in got)
+
+
+async def run(server: FixtureServer, rounds: int, change_every: int) -> None:
+    url = f"{server.url}/public/units/sale"
+    print(f"{'round':<7}{'items':>7}{'KB':>9}{'parsed':>8}{'skipped':>9}{'ms':>8}")
+    for r in range(rounds):
+        if change_every and r and r % change_every == 0:
+            server.seed += 1
+        before = dict(parser.fetch_stats)
+        t0 = time.perf_counter()
+        items = await crawl(url, server.pages)
+        ms = (time.perf_counter() - t0) * 1000
+        d = {k: parser.fetch_stats[k] - before[k] for k in before}
+        print(f"{r:<7}{items:>7}{d['bytes_downloaded'] / 1024:>9.1f}{d['parses']:>8}{d['parses_skipped']:>9}{ms:>8.1f}")
+    await parser.close_session()
+
+    s = parser.fetch_stats
+    print(f"\nrequests {s['requests']}, 304 {s['not_modified']}, "
+          f"{s['bytes_downloaded'] / 1024:.0f} KB, parses {s['parses']}, skipped {s['parses_skipped']}, "
+          f"parse time saved {s['parse_seconds_saved'] * 1000:.0f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--change-every", type=int, default=3, help="new listings every N rounds (0: never)")
+    ap.add_argument("--etags", action="store_true")
+    args = ap.parse_args()
+
+    with FixtureServer(pages=args.pages, etags=args.etags) as server:
+        asyncio.run(run(server, args.rounds, args.change_every))
+
+
+if __name__ == "__main__":
+    main()
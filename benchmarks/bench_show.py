@@ -0,0 +1,83 @@
+# benchmarks/bench_show.py
+# How many concurrent "🔎 Показать результаты" searches the bot survives,
+# old blocking path vs the async engine.
+#
+#   python -m benchmarks.bench_show [--latency 0.2] [--levels 1,5,20,50] [--cached]
+import argparse
+import asyncio
+import time
+import urllib.request
+
+from benchmarks.fixtures import FixtureServer
+from services import parser
+from services.listing import ListingTable
+
+FILTERS = {"mode": "buy", "property_type": "Condo", "bedrooms": "2"}
+
+
+def blocking_search(filters: dict) -> list:
+    """The pre-async code path: blocking GET + parse + sleep(0.3) per page."""
+    url = parser._build_search_url(filters)
+    req = urllib.request.Request(url, headers=parser.HEADERS)
+    with urllib.request.urlopen(req, timeout=15) as r:
+        html = r.read().decode()
+    results = parser._filter_items(ListingTable(parser._parse_page(html)), filters)
+    time.sleep(0.3)
+    return results
+
+
+async def heartbeat(stop: asyncio.Event, lags: list) -> None:
+    # an idle user's update: how late does the loop wake us up?
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - t - 0.01)
+
+
+async def run_level(concurrency: int, blocking: bool, cached: bool = False) -> dict:
+    if not cached:
+        parser.result_cache.clear()
+
+    async def one():
+        if blocking:
+            return blocking_search(FILTERS)
+        return await parser.parse_properties_async("🏠 Купить", FILTERS)
+
+    lags = []
+    stop = asyncio.Event()
+    hb = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    stop.set()
+    await hb
+    return {
+        "elapsed": elapsed,
+        "rps": concurrency / elapsed,
+        "max_lag": max(lags) if lags else elapsed,
+    }
+
+
+async def main(levels, latency: float, cached: bool) -> None:
+    with FixtureServer(latency=latency) as server:
+        parser.BASE = server.url
+        print(f"fixture latency {latency * 1000:.0f} ms, concurrency limit {parser.config.SCRAPER_CONCURRENCY}")
+        print(f"{'mode':<10}{'clients':>8}{'total s':>10}{'req/s':>10}{'loop lag s':>12}")
+        for mode in ("blocking", "async"):
+            for c in levels:
+                r = await run_level(c, blocking=(mode == "blocking"), cached=cached)
+                print(f"{mode:<10}{c:>8}{r['elapsed']:>10.2f}{r['rps']:>10.1f}{r['max_lag']:>12.3f}")
+        print(f"upstream requests: {server.requests}, result cache: {parser.result_cache.stats()}")
+        await parser.close_session()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--levels", default="1,5,20,50")
+    ap.add_argument("--cached", action="store_true", help="keep the result cache warm between levels")
+    args = ap.parse_args()
+    asyncio.run(main([int(x) for x in args.levels.split(",")], args.latency, args.cached))
@@ -0,0 +1,209 @@
+# benchmarks/check_prices.py
+# The price normalizer and the price buckets: a table of texts seen on the
+# site (and near-misses), then seeded random checks:
+#   - prices rendered the ways the site writes them read back to the same THB
+#   - random junk never raises and never yields a negative or inverted range
+#   - a listing is in a button's buckets exactly when price_in_range says so
+#   - table and index filters by bucket match a plain price_in_range scan
+#
+#   python -m benchmarks.check_prices [--rounds 20000] [--seed 1]
+import argparse
+import random
+import sys
+import time
+
+import benchmarks.fixtures  # noqa: F401  (BOT_TOKEN for config)
+from keyboards.filters_kb import BUY_PRICE_BUTTONS, RENT_PRICE_BUTTONS
+from services import index, prices
+from services.listing import Listing, ListingTable
+from services.parser import parse_price, price_in_range
+
+# text -> (THB, unit); None: no price
+KNOWN = {
+    "฿1,250,000": (1_250_000, "total"),
+    "From ฿950,000": (950_000, "total"),
+    "1.2M": (1_200_000, "total"),
+    "฿12M": (12_000_000, "total"),
+    "THB 3.5 million": (3_500_000, "total"),
+    "3,500,000 Baht": (3_500_000, "total"),
+    "2,5 ล้านบาท": (2_500_000, "total"),
+    "฿ 1 250 000": (1_250_000, "total"),
+    "1,250,000.50": (1_250_000, "total"),
+    "฿25,000/month": (25_000, "month"),
+    "฿ 45,000 per month": (45_000, "month"),
+    "25K/mo": (25_000, "month"),
+    "฿18,000 monthly": (18_000, "month"),
+    "฿1,500/night": (45_000, "month"),
+    "฿600,000 / year": (50_000, "month"),
+    "฿1.2M – ฿1.5M": (1_200_000, "total"),
+    "1.2 - 1.5M": (1_200_000, "total"),
+    "฿12,000 - 15,000 / month": (12_000, "month"),
+    "฿3,500,000 – 2 bed": (3_500_000, "total"),
+    "2 bed ฿3,500,000": (3_500_000, "total"),
+    "฿1.5": None,
+    "฿0": None,
+    "$120,000": (120_000 * prices.THB_PER["USD"], "total"),
+    "€250,000": (250_000 * prices.THB_PER["EUR"], "total"),
+    "฿85,000 / sqm": (85_000, "sqm"),
+    "85,000 m2": (85_000, "sqm"),
+    "฿12,000,000 (฿95,000/sqm)": (12_000_000, "total"),
+    "฿85,000 ตร.ม": (85_000, "sqm"),
+    "฿3,500,000 35 sqm": (3_500_000, "total"),
+    "฿3,500,000 / 35 sqm": (3_500_000, "total"),
+    "฿3,500,000 · 35 m²": (3_500_000, "total"),
+    "Monthly rent ฿25,000": (25_000, "month"),
+    "Asking price ฿3,500,000": (3_500_000, "total"),
+    "฿3,500,000 (negotiable, ask agent)": (3_500_000, "total"),
+    "฿3.5M Basket": (3_500_000, "total"),
+    "Call for price: ฿4.2M": (4_200_000, "total"),
+    "Price on request": None,
+    "Contact us": None,
+    "Contact agent": None,
+    "Call +66 81 234 5678": None,
+    "TBA": None,
+    "Sold": None,
+    "": None,
+}
+
+BUTTON_RANGES = [(None, None)] + [
+    tuple(int(v) if v else None for v in value.split("-"))
+    for _, value in BUY_PRICE_BUTTONS + RENT_PRICE_BUTTONS
+]
+
+
+def check_known() -> int:
+    failures = 0
+    for text, want in KNOWN.items():
+        got = prices.normalize(text)
+        got = None if got is None else (got.low, got.unit)
+        want = None if want is None else (round(want[0]), want[1])
+        if got != want:
+            failures += 1
+            print(f"  {text!r}: got {got}, want {want}")
+    return failures
+
+
+def _spaced(n: int) -> str:
+    return f"{n:,}".replace(",", " ")
+
+
+def render(rng: random.Random, thb: int) -> str:
+    """`thb` the way a card might write it."""
+    forms = [
+        f"฿{thb:,}", f"{thb:,} THB", f"From ฿{thb:,}", f"฿ {_spaced(thb)}", f"{thb:,} baht", f"฿{thb}",
+    ]
+    if thb % 10_000 == 0 and thb >= 1_000_000:
+        forms.append(f"{thb / 1e6:g}M")
+        forms.append(f"฿{thb / 1e6:g} million")
+    if thb % 1_000 == 0 and thb < 1_000_000:
+        forms.append(f"{thb // 1000}K")
+    return rng.choice(forms)
+
+
+def random_price(rng: random.Random) -> int:
+    roll = rng.random()
+    if roll < 0.2:
+        # the bottom bound ฿0 is no price
+        return rng.choice(prices.BOUNDS[1:])
+    if roll < 0.5:
+        return rng.randrange(1_000, 200_000, 1_000)
+    return rng.randrange(100_000, 50_000_000, 10_000)
+
+
+JUNK = list("0123456789,.  -–/~$€฿KkMmBb") + [" month", " sqm", "million", "to", " per ", "ล้าน", "บาท", "From "]
+
+
+def check_random(rng: random.Random, rounds: int) -> int:
+    failures = 0
+
+    def fail(msg: str) -> None:
+        nonlocal failures
+        failures += 1
+        if failures <= 20:
+            print("  " + msg)
+
+    for _ in range(rounds):
+        # round trip
+        thb = random_price(rng)
+        text = render(rng, thb)
+        if parse_price(text) != thb:
+            fail(f"{text!r} -> {parse_price(text)}, want {thb}")
+        rent = f"{render(rng, thb)}/month"
+        got = prices.normalize(rent)
+        if got is None or (got.low, got.unit) != (thb, "month"):
+            fail(f"{rent!r} -> {got}, want {thb}/month")
+        lo, hi = sorted((random_price(rng), random_price(rng)))
+        span = f"฿{lo:,} – ฿{hi:,}"
+        got = prices.normalize(span)
+        if got is None or (got.low, got.high) != (lo, hi):
+            fail(f"{span!r} -> {got}, want {lo}..{hi}")
+
+        # junk
+        junk = "".join(rng.choice(JUNK) for _ in range(rng.randrange(1, 12)))
+        try:
+            got = prices.normalize(junk)
+        except Exception as e:  # noqa: BLE001  (any exception is the failure)
+            fail(f"{junk!r} raised {e!r}")
+        else:
+            if got is not None and (got.low < 0 or (got.high is not None and got.high < got.low)):
+                fail(f"{junk!r} -> {got}")
+
+        # buckets vs the range check (prices are never negative: NO_BUCKET like None)
+        p = rng.choice([None, thb, lo, hi, max(0, rng.choice(prices.BOUNDS) + rng.choice((-1, 0, 1)))])
+        for min_p, max_p in BUTTON_RANGES:
+            first, last = prices.bucket_range(min_p, max_p)
+            if (first <= prices.bucket(p) <= last) != price_in_range(p, min_p, max_p):
+                fail(f"price {p} vs {min_p}..{max_p}: bucket {prices.bucket(p)} not in {first}..{last}")
+
+    # buckets are ordered like the prices
+    ps = sorted(random_price(rng) for _ in range(2000))
+    bs = [prices.bucket(p) for p in ps]
+    if bs != sorted(bs):
+        fail("bucket() is not monotonic")
+    return failures
+
+
+def check_filters(rng: random.Random) -> int:
+    failures = 0
+    rows = []
+    for i in range(3000):
+        p = None if rng.random() < 0.1 else random_price(rng)
+        rows.append(Listing(f"#{i}", f"https://x/unit/{i}", "", p, None, "Pattaya", None))
+    table = ListingTable(rows)
+    records = [(r.title, r.link, r.price, r.price_value, r.img, r.location, r.area, r.features) for r in rows]
+    postings = {"mode": {"buy": range(len(rows))}}
+    idx = index.ListingIndex(records, postings, time.time())
+
+    for min_p, max_p in BUTTON_RANGES + [(1_500_000, 2_500_000), (None, 15_000), (2_000_000, 2_000_000)]:
+        want = [i for i, r in enumerate(rows) if price_in_range(r.price_value, min_p, max_p)]
+        if table.price_ids(min_p, max_p) != want:
+            failures += 1
+            print(f"  table {min_p}..{max_p}: {len(table.price_ids(min_p, max_p))} rows, want {len(want)}")
+        got = sorted(idx.ids_for({"mode": "buy", "min_price": min_p, "max_price": max_p}))
+        if got != want:
+            failures += 1
+            print(f"  index {min_p}..{max_p}: {len(got)} ids, want {len(want)}")
+    return failures
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    total = 0
+    for name, run in (
+        ("known texts", check_known),
+        (f"random, {args.rounds} rounds", lambda: check_random(rng, args.rounds)),
+        ("table and index filters", lambda: check_filters(rng)),
+    ):
+        failures = run()
+        total += failures
+        print(f"{name:<28}{'ok' if not failures else f'{failures} FAILED'}")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# benchmarks/check_upstream.py
+# The search path against a misbehaving site: slow, failing and flapping
+# responses from the fixture server. Each scenario asserts what the user
+# would get and how long they'd wait.
+#
+#   python -m benchmarks.check_upstream
+import asyncio
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureServer
+import config
+from services import index, parser, upstream
+
+# short knobs so the scenarios run in seconds
+config.UPSTREAM_DEADLINE = 2.0
+config.UPSTREAM_BACKOFF = 0.05
+config.BREAKER_FAILURES = 3
+config.BREAKER_RESET = 1.0
+
+FILTERS = {"mode": "buy", "property_type": "Condo"}
+
+
+async def cancel_leftovers() -> None:
+    # fetches a search gave up on keep running to fill the caches (shielded
+    # from the search): stop them before the next scenario or the loop's end
+    leftovers = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in leftovers:
+        task.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
+
+
+async def reset() -> None:
+    await cancel_leftovers()
+    parser.result_cache.clear()
+    parser.stale_cache.clear()
+    parser._page_states.clear()
+    upstream.breaker = upstream.CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET)
+
+
+async def search(pages=None):
+    t0 = time.perf_counter()
+    try:
+        res = await parser.parse_properties_async("🏠 Купить", FILTERS, pages)
+    except upstream.UpstreamUnavailable:
+        res = None
+    return res, time.perf_counter() - t0
+
+
+async def scenario_failing(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "fail"
+    res, took = await search()
+    assert res is None, "failure without a cached copy must not look like an empty result"
+    # retries stop at the breaker, later searches don't touch the site at all
+    for _ in range(3):
+        await search()
+    before = server.requests
+    res, took = await search()
+    assert res is None and server.requests == before and took < 0.05, (server.requests - before, took)
+    print(f"failing: UpstreamUnavailable, breaker {upstream.breaker.state}, open-circuit search {took * 1000:.1f} ms")
+
+
+async def scenario_stale(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "ok"
+    fresh, _ = await search()
+    assert fresh and not fresh.stale
+
+    parser.result_cache.clear()  # the fresh copy expired
+    server.mode = "fail"
+    res, took = await search()
+    assert res == fresh and res.stale, "stale copy expected"
+    print(f"failing + cached: {len(res)} stale items in {took * 1000:.0f} ms")
+
+
+async def scenario_slow(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "ok"
+    await search()
+    parser.result_cache.clear()
+
+    server.mode = "slow"
+    res, took = await search()
+    assert res is not None and res.stale, "slow site: stale copy expected"
+    assert took < config.UPSTREAM_DEADLINE + 0.5, f"waited {took:.1f}s past the deadline"
+    print(f"slow + cached: stale answer after {took:.2f}s (deadline {config.UPSTREAM_DEADLINE}s)")
+
+    await reset()
+    res, took = await search()
+    assert res is None and took < config.UPSTREAM_DEADLINE + 0.5
+    print(f"slow, nothing cached: UpstreamUnavailable after {took:.2f}s")
+
+
+async def scenario_flapping(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "flap"
+    ok = 0
+    for _ in range(10):
+        parser.result_cache.clear()
+        res, _ = await search()
+        ok += res is not None and not res.stale
+    # every other request fails: one retry gets through, the breaker stays closed
+    assert ok == 10 and upstream.breaker.state == upstream.CLOSED, (ok, upstream.breaker.state)
+    print(f"flapping: {ok}/10 fresh answers, {parser.fetch_stats['retries']} retries so far")
+
+
+async def scenario_recovery(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "fail"
+    for _ in range(4):
+        await search()
+    assert upstream.breaker.is_open
+
+    server.mode = "ok"
+    await asyncio.sleep(config.BREAKER_RESET)
+    res, _ = await search()
+    assert res and not res.stale and upstream.breaker.state == upstream.CLOSED
+    print("recovery: half-open probe succeeded, breaker closed")
+
+
+async def scenario_crawl(server: FixtureServer) -> None:
+    await reset()
+    server.mode = "ok"
+    server.latency, server.pages = 0.2, 30
+    config.DATA_DIR = tempfile.mkdtemp()
+    try:
+        _, alone = await search(pages=1)
+        parser.result_cache.clear()
+
+        # a full crawl: 20 queries of 30 pages each, far longer than the check
+        crawl = asyncio.create_task(index.crawl_once())
+        await asyncio.sleep(1.0)
+        res, took = await search(pages=1)
+        assert not crawl.done(), "the crawl should still be running"
+        assert res and not res.stale, "live search during a crawl must not fail"
+        assert took < alone + 0.5, f"live search took {took:.2f}s during a crawl, {alone:.2f}s alone"
+        print(f"crawl running: live search {took * 1000:.0f} ms (alone {alone * 1000:.0f} ms)")
+    finally:
+        server.latency, server.pages = 0.0, 1
+        await reset()
+
+
+async def main() -> None:
+    with FixtureServer(pages=1) as server:
+        server.hang = 10.0
+        parser.BASE = server.url
+        try:
+            for scenario in (scenario_failing, scenario_stale, scenario_slow, scenario_flapping, scenario_recovery,
+                             scenario_crawl):
+                await scenario(server)
+        finally:
+            await cancel_leftovers()
+            await parser.close_session()
+    print("all upstream scenarios passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+# benchmarks/fixtures.py
+# Synthetic enlightproperty.com pages and a local HTTP server to serve them,
+# so benchmarks never touch the real site.
+import asyncio
+import os
+import random
+import threading
+from typing import Optional
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+
+from aiohttp import web
+
+AREAS = [
+    "Central Pattaya", "South Pattaya", "North Pattaya", "Pratumnak",
+    "Jomtien", "Wongamat", "Naklua", "East Pattaya"
+]
+
+
+EXTRAS = ["", "", " with Pool", " Sea View", " High Floor", " Corner Unit", " Brand New"]
+
+
+def listing_block(i: int, rng: random.Random) -> str:
+    price = rng.randrange(800_000, 25_000_000, 10_000)
+    area = rng.choice(AREAS)
+    extra = rng.choice(EXTRAS)
+    return f"""
+<div class="ltn__property-item">
+  <div class="product-img"><a href="/public/unit/{i}"><img src="/uploads/units/{i}.jpg"></a></div>
+  <div class="product-img-location">{area}, Pattaya</div>
+  <h2 class="product-title"><a href="/public/unit/{i}">Condo #{i} in {area}{extra}</a></h2>
+  <div class="product-price"><span>฿{price:,}</span></div>
+</div>"""
+
+
+# roughly what surrounds the listings on the real site: assets, menus, footer
+_HEAD = "".join(
+    f'<link rel="stylesheet" href="/assets/css/{i}.css"><script src="/assets/js/{i}.js"></script>'
+    for i in range(30)
+)
+_NAV = "<nav><ul>" + "".join(f'<li><a href="/page/{i}">Menu item {i}</a></li>' for i in range(120)) + "</ul></nav>"
+_FOOTER = "<footer>" + "<p>Enlight Property Pattaya. All rights reserved.</p>" * 40 + "</footer>"
+
+
+def pagination_html(page: int, pages: int) -> str:
+    """Laravel-style windowed pagination: 1 … page-2..page+2 … last."""
+    if pages <= 1:
+        return ""
+    shown = sorted({1, pages, *range(max(1, page - 2), min(pages, page + 2) + 1)})
+    links = "".join(f'<li class="page-item"><a class="page-link" href="?page={p}">{p}</a></li>' for p in shown)
+    return f'<ul class="pagination">{links}</ul>'
+
+
+def listing_page_html(page: int = 1, per_page: int = 12, seed: int = 0, nonce: str = "", pages: int = 0) -> str:
+    rng = random.Random(seed * 10_000 + page)
+    start = (page - 1) * per_page
+    blocks = "".join(listing_block(start + i, rng) for i in range(per_page))
+    return (
+        f"<html><head><title>Units</title><meta name='csrf-token' content='{nonce}'>{_HEAD}</head><body>{_NAV}"
+        f"<div class='row'>{blocks}</div>{pagination_html(page, pages)}{_FOOTER}</body></html>"
+    )
+
+
+def _page(title: str, body: str) -> str:
+    return f"<html><head><title>{title}</title>{_HEAD}</head><body>{_NAV}{body}{_FOOTER}</body></html>"
+
+
+def blog_page_html(posts: int = 9) -> str:
+    items = "".join(
+        f'<div class="ltn__blog-item"><div class="ltn__blog-img"><img src="/uploads/blog/{i}.jpg"></div>'
+        f'<h3 class="ltn__blog-title"><a href="/public/blog/{i}">Pattaya market update #{i}</a></h3>'
+        f'<div class="ltn__blog-meta"><span class="ltn__blog-date">{1 + i % 28:02d}.05.2024</span></div></div>'
+        for i in range(posts)
+    )
+    return _page("Blog", f"<div class='row'>{items}</div>")
+
+
+def contact_page_html() -> str:
+    return _page("Contact", """
+<div class="ltn__contact-address-item"><h3>Email</h3><p><a href="mailto:info@example.com">info@example.com</a></p></div>
+<div class="ltn__contact-address-item"><h3>Phone</h3><p><a href="tel:+66381234567">+66 38 123 4567</a></p></div>
+<div class="ltn__contact-address-item"><h3>Office</h3><p>123/4 Moo 10, Pattaya, Chonburi 20150</p></div>
+<a href="https://line.me/ti/p/~enlight">LINE</a>""")
+
+
+def about_page_html() -> str:
+    paragraphs = "".join(f"<p>Enlight Property has helped buyers in Pattaya since 20{10 + i}. </p>" for i in range(8))
+    return _page("About", f"<h1>About Enlight Property</h1>{paragraphs}")
+
+
+SECTION_PAGES = {
+    "/public/projects": lambda: listing_page_html(1, 8),
+    "/public/blog": blog_page_html,
+    "/public/contact": contact_page_html,
+    "/public/about": about_page_html,
+}
+
+
+class FixtureServer:
+    """
+    aiohttp server in a background thread. It lives on its own loop so that
+    blocking clients in the benchmark don't stall it.
+    """
+
+    def __init__(self, latency: float = 0.0, per_page: int = 12, pages: int = 5, etags: bool = False):
+        self.latency = latency
+        self.per_page = per_page
+        self.pages = pages
+        self.etags = etags
+        self.requests = 0
+        self.not_modified = 0
+        self.seed = 0  # bump to change the listings
+        # failure modes: "ok", "slow" (hangs for `hang` s), "fail" (500), "flap" (every other request 500s)
+        self.mode = "ok"
+        self.hang = 30.0
+        self.url: Optional[str] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _units(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.mode == "slow":
+            await asyncio.sleep(self.hang)
+        if self.mode == "fail" or (self.mode == "flap" and self.requests % 2):
+            return web.Response(status=500, text="upstream error")
+        page = int(request.query.get("page", "1"))
+        per_page = self.per_page if page <= self.pages else 0
+        if self.etags:
+            kind = request.match_info["kind"]
+            etag = f'"{kind}-{page}-{per_page}-{self.seed}"'
+            if request.headers.get("If-None-Match") == etag:
+                self.not_modified += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.Response(text=listing_page_html(page, per_page, self.seed, pages=self.pages),
+                                content_type="text/html", headers={"ETag": etag})
+        # like the real site: a fresh token in the head on every response
+        html = listing_page_html(page, per_page, self.seed, nonce=str(self.requests), pages=self.pages)
+        return web.Response(text=html, content_type="text/html")
+
+    async def _section(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.mode == "fail":
+            return web.Response(status=500, text="upstream error")
+        return web.Response(text=SECTION_PAGES[request.path](), content_type="text/html")
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/public/units/{kind}", self._units)
+        for path in SECTION_PAGES:
+            app.router.add_get(path, self._section)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    async def _stop(self) -> None:
+        await self._runner.cleanup()
+        # handlers still sleeping in "slow" mode would be left pending on a stopped loop
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __exit__(self, *exc) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
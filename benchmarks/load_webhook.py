@@ -0,0 +1,99 @@
+# benchmarks/load_webhook.py
+# Replays a JSONL file of updates against a locally running webhook instance
+# and reports updates/sec and latency percentiles.
+#
+#   RUN_MODE=webhook WEBHOOK_IN_BACKGROUND=0 python bot.py
+#   python -m benchmarks.load_webhook updates.jsonl --concurrency 20 --repeat 5
+#
+# Lines that are not Telegram updates (no "update_id", e.g. requests.jsonl)
+# are turned into text messages from a handful of fake chats.
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from typing import Dict, List
+
+import aiohttp
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def as_update(obj: Dict, update_id: int, chats: int) -> Dict:
+    if "update_id" in obj:
+        return dict(obj, update_id=update_id)
+
+    chat_id = 100_000 + update_id % chats
+    text = obj.get("text") or obj.get("title") or "/start"
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+        },
+    }
+
+
+def load_updates(path: str, repeat: int, chats: int) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        raw = [json.loads(line) for line in f if line.strip()]
+    ids = itertools.count(1)
+    return [as_update(obj, next(ids), chats) for _ in range(repeat) for obj in raw]
+
+
+async def main(args) -> None:
+    updates = load_updates(args.file, args.repeat, args.chats)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for u in updates:
+        queue.put_nowait(u)
+
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        nonlocal errors
+        while not queue.empty():
+            update = queue.get_nowait()
+            t = time.perf_counter()
+            try:
+                async with session.post(args.url, json=update, headers=headers) as r:
+                    await r.read()
+                    if r.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+
+    async with aiohttp.ClientSession() as session:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    print(f"updates: {len(updates)}  errors: {errors}  concurrency: {args.concurrency}")
+    print(f"throughput: {len(updates) / elapsed:.1f} updates/s")
+    print(
+        f"latency ms: p50 {percentile(latencies, 0.50) * 1000:.1f}  "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f}  "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f}  "
+        f"max {max(latencies, default=0) * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("file", help="JSONL file with one update per line")
+    ap.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    ap.add_argument("--secret", default="")
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--chats", type=int, default=50, help="fake chats for non-update lines")
+    asyncio.run(main(ap.parse_args()))
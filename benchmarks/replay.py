@@ -0,0 +1,264 @@
+# benchmarks/replay.py
+# Offline replay: recorded Telegram updates go through the real Dispatcher
+# (all four routers, middlewares, FSM, send scheduler) with a Bot session
+# that records outgoing calls instead of talking to Telegram, while
+# enlightproperty.com is served by the local fixture server.
+#
+# Every virtual chat plays the recorded session in order; chats run
+# concurrently. Reports updates/s, latency percentiles per update, upstream
+# requests per update and the memory high-water mark.
+#
+#   python -m benchmarks.replay [--updates benchmarks/updates.jsonl] [--chats 20]
+#   python -m benchmarks.replay --save baseline.json
+#   python -m benchmarks.replay --baseline baseline.json   # exit 1 on regression
+import argparse
+import asyncio
+import copy
+import datetime
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from benchmarks.fixtures import FixtureServer
+from benchmarks.load_webhook import percentile
+
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# metric -> which direction is worse
+REGRESSION = {"updates_per_sec": -1, "p95_ms": 1, "p99_ms": 1, "upstream_per_update": 1, "peak_mb": 1}
+
+
+# ---------- RECORDED UPDATES ----------
+
+def load_session(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def for_chat(session: List[Dict], chat_id: int, first_update_id: int) -> List[Dict]:
+    """The recorded session as another user would send it."""
+    out = []
+    for i, upd in enumerate(session):
+        upd = copy.deepcopy(upd)
+        upd["update_id"] = first_update_id + i
+        for key in ("message", "callback_query"):
+            event = upd.get(key)
+            if event is None:
+                continue
+            msg = event.get("message", event)
+            msg["chat"]["id"] = chat_id
+            if key == "callback_query":
+                event["from"]["id"] = chat_id
+                event["id"] = f"{chat_id}-{i}"
+            elif "from" in msg:
+                msg["from"]["id"] = chat_id
+        out.append(upd)
+    return out
+
+
+def kind_of(upd: Dict) -> str:
+    """'msg:<text>' or 'cb:<action>', for the per-kind latency table."""
+    if "callback_query" in upd:
+        parts = upd["callback_query"].get("data", "").split(":")
+        return "cb:" + (parts[1] if len(parts) > 1 else parts[0])
+    text = upd.get("message", {}).get("text", "")
+    return "msg:" + (text if len(text) <= 24 else "<text>")
+
+
+# ---------- TELEGRAM ----------
+
+def make_session(latency: float):
+    from aiogram import methods, types
+    from aiogram.client.session.base import BaseSession
+
+    class RecordingSession(BaseSession):
+        """Answers every Bot API call locally after `latency` seconds and counts them."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls: Counter = Counter()
+            self._message_ids = 1_000_000
+
+        def _message(self, chat_id) -> types.Message:
+            self._message_ids += 1
+            return types.Message(
+                message_id=self._message_ids, date=datetime.datetime.now(),
+                chat=types.Chat(id=chat_id if isinstance(chat_id, int) else 1, type="private"),
+                text="ok",
+            )
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[type(method).__name__] += 1
+            if latency:
+                await asyncio.sleep(latency)
+            chat_id = getattr(method, "chat_id", None)
+            if isinstance(method, methods.SendMediaGroup):
+                return [self._message(chat_id) for _ in method.media]
+            if "Message" in str(method.__returning__):
+                return self._message(chat_id)
+            return True
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return RecordingSession()
+
+
+# ---------- REPLAY ----------
+
+async def replay(args, server: FixtureServer) -> Dict:
+    from aiogram.types import Update
+
+    import bot as app
+    from services import index, metrics, parser, sections
+
+    parser.BASE = server.url
+    session = make_session(args.tg_latency)
+    bot = app.create_bot(session)
+    dp = app.create_dispatcher()
+
+    if args.index:
+        await index.crawl_once()
+    # what dp.startup does before the first update
+    await sections.refresh()
+
+    recorded = load_session(args.updates)
+    chats = [for_chat(recorded, 900_000 + c, c * len(recorded) + 1) for c in range(args.chats)]
+    latencies: List[float] = []
+    by_kind: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    async def play(updates: List[Dict]) -> None:
+        nonlocal errors
+        for raw in updates:
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+            except Exception:
+                errors += 1
+                logging.getLogger(__name__).exception("Update %s failed", raw["update_id"])
+            took = time.perf_counter() - started
+            latencies.append(took)
+            by_kind[kind_of(raw)].append(took)
+
+    upstream_before = server.requests
+    if args.tracemalloc:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(play(updates) for updates in chats))
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    tracemalloc.stop()
+
+    n = len(latencies)
+    result = {
+        "updates": n,
+        "errors": errors,
+        "seconds": elapsed,
+        "updates_per_sec": n / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "upstream_per_update": (server.requests - upstream_before) / n,
+        # ru_maxrss is KiB on Linux; includes the fixture server thread
+        "peak_mb": (peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024) / 2 ** 20,
+        "peak_kind": "python heap (tracemalloc)" if peak is not None else "process RSS",
+        "telegram_calls": dict(session.calls),
+        "kinds": {k: (len(v), percentile(v, 0.5) * 1000, percentile(v, 0.95) * 1000) for k, v in by_kind.items()},
+        "handler_ms": {
+            key[0]: metrics.handler_seconds.sums[key] / sum(counts) * 1000
+            for key, counts in metrics.handler_seconds.counts.items()
+        },
+    }
+
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    return result
+
+
+def report(r: Dict) -> None:
+    print(f"{r['updates']} updates in {r['seconds']:.2f}s, {r['errors']} errors")
+    print(f"  updates/s            {r['updates_per_sec']:10.1f}")
+    print(f"  latency p50/p95/p99  {r['p50_ms']:7.1f} / {r['p95_ms']:.1f} / {r['p99_ms']:.1f} ms")
+    print(f"  upstream req/update  {r['upstream_per_update']:10.2f}")
+    print(f"  memory high-water    {r['peak_mb']:10.1f} MB ({r['peak_kind']})")
+    print("  telegram calls       " + ", ".join(f"{k}={v}" for k, v in sorted(r["telegram_calls"].items())))
+    print(f"\n  {'update':<30}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for kind, (count, p50, p95) in sorted(r["kinds"].items(), key=lambda kv: -kv[1][2]):
+        print(f"  {kind:<30}{count:>6}{p50:>10.1f}{p95:>10.1f}")
+    print(f"\n  {'router':<30}{'mean handler ms':>16}")
+    for router, ms in sorted(r["handler_ms"].items()):
+        print(f"  {router:<30}{ms:>16.1f}")
+
+
+def compare(r: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    worse = []
+    for key, direction in REGRESSION.items():
+        old, new = baseline.get(key), r.get(key)
+        if not old or new is None:
+            continue
+        if key == "peak_mb" and baseline.get("peak_kind") != r["peak_kind"]:
+            # RSS vs traced heap: not comparable
+            continue
+        change = (new - old) / old * direction
+        mark = "REGRESSION" if change > tolerance else "ok"
+        print(f"  {key:<22}{old:>10.2f} -> {new:<10.2f} {change * direction:+.0%}  {mark}")
+        if change > tolerance:
+            worse.append(key)
+    return worse
+
+
+def main() -> Optional[int]:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", default=os.path.join(HERE, "updates.jsonl"), help="recorded updates, one per line")
+    ap.add_argument("--chats", type=int, default=20, help="concurrent users replaying the session")
+    ap.add_argument("--latency", type=float, default=0.05, help="site response time, s")
+    ap.add_argument("--tg-latency", type=float, default=0.02, help="Bot API response time, s")
+    ap.add_argument("--pages", type=int, default=3, help="result pages per search on the fixture site")
+    ap.add_argument("--index", action="store_true", help="build the listing index before replaying")
+    ap.add_argument("--send-limits", action="store_true",
+                    help="keep Telegram's send rate limits; replayed users tap with no pauses, so "
+                         "without this flag the per-chat limit would dominate every latency")
+    ap.add_argument("--tracemalloc", action="store_true", help="peak Python heap instead of process RSS (slower)")
+    ap.add_argument("--save", help="write the results as JSON")
+    ap.add_argument("--baseline", help="compare with saved results; exit 1 on regression")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args()
+
+    # a clean bot: no saved index, subscriptions or FSM from this machine
+    config.DATA_DIR = tempfile.mkdtemp(prefix="replay-")
+    config.FSM_STORAGE = "memory"
+    if not args.send_limits:
+        config.SEND_GLOBAL_RATE = config.SEND_CHAT_RATE = config.SEND_CHAT_BURST = 1e6
+    logging.basicConfig(level=logging.WARNING)
+
+    with FixtureServer(latency=args.latency, pages=args.pages) as server:
+        result = asyncio.run(replay(args, server))
+    report(result)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nvs {args.baseline} (tolerance {args.tolerance:.0%}):")
+        if compare(result, baseline, args.tolerance):
+            return 1
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
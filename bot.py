@@ -3,25 +3,146 @@ print(">>> ACTIVE CODE VERSION: filters v2 loaded <<<")
 print(">>> ORDER CHECK: filters BEFORE listings loaded <<<")
 
 import asyncio
+from typing import Optional
+
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
 import config  # правильный импорт
 from handlers import start, menu, listings, filters_handlers
+from keyboards import filters_kb
+from services import cluster, parser, index, images, metrics, sections, snapshot, subscriptions
+from services.sender import SendScheduler
+from services.storage import UpdateCacheMiddleware, create_storage
+import webhook
 
-async def main():
+
+def create_bot(session: Optional[BaseSession] = None) -> Bot:
+    if session is None and config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    # в кластере лимит Telegram на весь бот делится между воркерами
+    global_rate = config.SEND_GLOBAL_RATE / (config.WORKERS if cluster.role == "worker" else 1)
     bot = Bot(
         token=config.BOT_TOKEN,   # обращаемся через config
+        session=session,          # None — обычная aiohttp-сессия
         default=DefaultBotProperties(parse_mode='HTML')
     )
-    dp = Dispatcher()
+    # все исходящие сообщения идут через общую очередь с лимитами Telegram
+    bot.session.middleware(SendScheduler(
+        global_rate=global_rate,
+        chat_rate=config.SEND_CHAT_RATE,
+        chat_burst=config.SEND_CHAT_BURST,
+    ))
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    # состояния пользователей переживают рестарт (см. FSM_STORAGE)
+    dp = Dispatcher(storage=create_storage())
+    # клавиатуры фильтров строим один раз, до первого апдейта
+    filters_kb.prebuild()
+    # трассировка первой: её время включает все остальные middleware
+    dp.update.outer_middleware(metrics.TracingMiddleware())
+    dp.update.outer_middleware(UpdateCacheMiddleware())
+
+    routers = {
+        "start": start.router,
+        "menu": menu.router,
+        "filters_handlers": filters_handlers.router,  # <- ДО listings
+        "listings": listings.router,
+    }
+    for name, router in routers.items():
+        # время обработчиков по роутерам (bot_handler_seconds)
+        router.message.middleware(metrics.HandlerTimer(name))
+        router.callback_query.middleware(metrics.HandlerTimer(name))
+        dp.include_router(router)
+
+    # снимок кэшей с прошлого запуска — раньше всего остального
+    dp.startup.register(snapshot.on_startup)
+    if cluster.role != "worker":
+        # общее на весь бот; воркеры кластера ходят за этим во фронт
+        # индекс объявлений: восстанавливаем с диска и обновляем в фоне
+        dp.startup.register(index.start_crawler)
+        dp.shutdown.register(index.stop_crawler)
+        # подписки: после каждого обхода рассылаем новые объекты
+        dp.startup.register(subscriptions.start)
+        # разделы меню (проекты, новости, контакты, компания) держим в памяти
+        dp.startup.register(sections.start)
+        dp.shutdown.register(sections.stop)
+
+    dp.shutdown.register(images.stop_prefetch)
+    # кэши на диск до закрытия сессий и хранилищ
+    dp.shutdown.register(snapshot.on_shutdown)
+    # закрываем общий HTTP-пул скрапера при остановке
+    dp.shutdown.register(parser.close_session)
+    dp.shutdown.register(parser.shutdown_parse_pool)
+    # сбрасываем на диск отложенные записи FSM
+    dp.shutdown.register(dp.storage.close)
+    return dp
 
-    dp.include_router(start.router)
-    dp.include_router(menu.router)
-    dp.include_router(filters_handlers.router)  # <- ДО listings
-    dp.include_router(listings.router)
 
-    print("Бот запущен...")
-    await dp.start_polling(bot)
+async def run_polling(bot: Bot, dp: Dispatcher) -> None:
+    # /healthz для Fly работает и в режиме polling
+    runner = web.AppRunner(webhook.health_app())
+    await runner.setup()
+    await web.TCPSite(runner, config.WEB_HOST, config.WEB_PORT).start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await runner.cleanup()
+
+
+async def run_front(bot: Bot, dp: Dispatcher) -> None:
+    # апдейты принимает фронт и раздаёт воркерам; dp здесь — только общие сервисы
+    front = cluster.Front(config.WORKERS)
+    await front.start()
+    await dp.emit_startup(bot=bot)
+
+    app = webhook.health_app(front)
+    if config.RUN_MODE == "webhook":
+        app.router.add_post(config.WEBHOOK_PATH, front.handle_webhook)
+        if config.WEBHOOK_BASE_URL:
+            async def set_webhook(app: web.Application) -> None:
+                await bot.set_webhook(
+                    url=config.WEBHOOK_BASE_URL.rstrip("/") + config.WEBHOOK_PATH,
+                    secret_token=config.WEBHOOK_SECRET or None,
+                    allowed_updates=dp.resolve_used_update_types(),
+                )
+            app.on_startup.append(set_webhook)
+    else:
+        async def polling(app: web.Application):
+            task = asyncio.create_task(
+                front.poll(bot.token, bot.session.api.api_url, dp.resolve_used_update_types())
+            )
+            yield
+            task.cancel()
+        app.cleanup_ctx.append(polling)
+
+    try:
+        await webhook.serve(app)
+    finally:
+        await front.stop()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
+async def main():
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    if cluster.role == "worker":
+        await cluster.run_worker(bot, dp)
+        return
+    print(f"Бот запущен ({config.RUN_MODE}, воркеров: {config.WORKERS})...")
+    if cluster.role == "front":
+        await run_front(bot, dp)
+    elif config.RUN_MODE == "webhook":
+        await webhook.run_webhook(bot, dp)
+    else:
+        await run_polling(bot, dp)
 
 if __name__ == "__main__":
     asyncio.run(main())
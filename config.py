@@ -5,4 +5,107 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN environment variable is not set!")
 
-BASE_URL = "https://enlightproperty.com"
+BASE_URL = os.getenv("BASE_URL", "https://enlightproperty.com")
+
+# Скрапер: сколько страниц качаем одновременно и сколько ждём ответа
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "15"))
+
+# Кэш результатов поиска (страницы сайта после парсинга)
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+
+# Локальный индекс объявлений: фоновый обход сайта и файл на диске
+DATA_DIR = os.getenv("DATA_DIR", "data")
+CRAWL_INTERVAL = float(os.getenv("CRAWL_INTERVAL", "900"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "30"))
+# обход занимает не больше CRAWL_CONCURRENCY из SCRAPER_CONCURRENCY соединений
+# и идёт медленнее живых поисков, чтобы они не ждали в очереди за ним
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "1"))
+CRAWL_RATE = float(os.getenv("CRAWL_RATE", "2"))
+
+# Доп. фильтры: если в карточке нет признака, смотреть страницу объекта
+FEATURES_FETCH_DETAILS = os.getenv("FEATURES_FETCH_DETAILS", "0") == "1"
+FEATURES_DETAIL_LIMIT = int(os.getenv("FEATURES_DETAIL_LIMIT", "20"))
+
+# Выдача результатов: объектов на страницу (не больше 10 — лимит media group)
+RESULTS_PAGE_SIZE = min(int(os.getenv("RESULTS_PAGE_SIZE", "10")), 10)
+RESULTS_TTL = float(os.getenv("RESULTS_TTL", "3600"))
+# С сортировкой показываем только лучшие объекты — столько, не все найденные
+RESULTS_TOP_K = int(os.getenv("RESULTS_TOP_K", "30"))
+
+# Лимиты исходящих сообщений (Telegram: ~30/с всего, ~1/с в один чат)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+
+# Режим запуска: polling (по умолчанию) или webhook
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8080"))
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # напр. https://pavel-pattaya-property-bot.fly.dev
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# 0 — отвечать Telegram только после обработки апдейта (удобно для нагрузочного теста)
+WEBHOOK_IN_BACKGROUND = os.getenv("WEBHOOK_IN_BACKGROUND", "1") == "1"
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+# Хранилище состояний FSM: sqlite (по умолчанию), redis или memory
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Фото объектов: фоновая загрузка и сжатие перед первой отправкой (нужен Pillow)
+IMAGE_PREFETCH = os.getenv("IMAGE_PREFETCH", "0") == "1"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1280"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+
+# Парсер: lxml (быстрый, по умолчанию) или bs4; PARSE_PROCESSES > 0 — парсить в отдельных процессах
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "lxml")
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0"))
+
+# Подписки на поиск
+SUBSCRIPTIONS_PER_CHAT = int(os.getenv("SUBSCRIPTIONS_PER_CHAT", "5"))
+SUBSCRIPTION_ITEMS_PER_MESSAGE = int(os.getenv("SUBSCRIPTION_ITEMS_PER_MESSAGE", "5"))
+
+# Условные запросы: сколько страниц помнить (ETag/Last-Modified + хэш блока объявлений)
+PAGE_STATE_SIZE = int(os.getenv("PAGE_STATE_SIZE", "4096"))
+
+# Устойчивость к сбоям сайта: повторы с джиттером, бюджет времени на поиск,
+# circuit breaker и показ устаревших результатов вместо "ничего не найдено"
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "4"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "8"))
+UPSTREAM_MIN_ATTEMPT = float(os.getenv("UPSTREAM_MIN_ATTEMPT", "0.5"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+STALE_TTL = int(os.getenv("STALE_TTL", str(24 * 3600)))
+
+# Многостраничный поиск: сколько страниц выдачи читать и с какой скоростью
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "10"))
+SCRAPER_RATE = float(os.getenv("SCRAPER_RATE", "8"))
+SCRAPER_BURST = float(os.getenv("SCRAPER_BURST", "4"))
+# сколько следующих страниц качать заранее, пока читается текущая
+PREFETCH_PAGES = int(os.getenv("PREFETCH_PAGES", "3"))
+
+# Метрики и трассировка: медленные апдейты пишутся в лог с разбивкой по этапам,
+# частые отладочные логи — только для доли вызовов
+TRACE_SLOW = float(os.getenv("TRACE_SLOW", "2"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Разделы меню (проекты, новости, контакты, компания): грузятся при старте
+# и обновляются в фоне раз в SECTIONS_REFRESH секунд
+SECTIONS_REFRESH = float(os.getenv("SECTIONS_REFRESH", str(6 * 3600)))
+
+# Снимок кэшей на диске: пишется при остановке, читается при старте,
+# чтобы после деплоя первые ответы шли из памяти
+SNAPSHOT = os.getenv("SNAPSHOT", "1") == "1"
+
+# Несколько процессов: WORKERS > 1 — фронт принимает апдейты и раздаёт их
+# воркерам по chat_id; скрапер, кэши, индекс и разделы остаются во фронте
+WORKERS = int(os.getenv("WORKERS", "1"))
+CLUSTER_WORKER = os.getenv("CLUSTER_WORKER")  # номер воркера, ставит фронт
+# свой Bot API сервер (telegram-bot-api) вместо api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
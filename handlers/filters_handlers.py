@@ -1,11 +1,17 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from keyboards.filters_kb import (
-    main_filters_kb, price_kb, bedrooms_kb, type_kb, area_kb, more_kb, summary_kb
+    SORT_LABELS, main_filters_kb, price_kb, bedrooms_kb, type_kb, area_kb, sort_kb, more_kb, summary_kb
 )
-from services.parser import parse_properties
+from services.parser import iter_properties
+from services import index, ranking, searches, subscriptions
+from services.upstream import UpstreamUnavailable
+from handlers.results import open_results, show_page, stale_notice, stream_results
 
+import asyncio
+import contextlib
 import json
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +21,46 @@ logger.warning(">>> FILTERS HANDLER LOADED AND ACTIVE <<<")
 
 router = Router()
 
+# действия, которые меняют фильтры ("<mode>:<action>:<value>")
+FILTER_SETTERS = ("price", "bed", "type", "area", "feat", "sort")
+
+# подменю: действие -> (текст, клавиатура)
+SUBMENUS = {
+    "price": ("Выберите диапазон цены:", price_kb),
+    "bedrooms": ("Выберите количество спален:", bedrooms_kb),
+    "type": ("Выберите тип недвижимости:", type_kb),
+    "area": ("Выберите район:", area_kb),
+    "sort": ("Как отсортировать результаты:", sort_kb),
+    "more": ("Дополнительные фильтры:", more_kb),
+}
+
+# простые значения: действие -> (ключ в state, подпись)
+VALUE_SETTERS = {
+    "bed": ("bedrooms", "Спальни"),
+    "type": ("property_type", "Тип"),
+    "area": ("location", "Район"),
+}
+
+
+def empty_filters(mode: str) -> dict:
+    return {
+        "mode": mode,
+        "location": None, "min_price": None, "max_price": None,
+        "bedrooms": None, "property_type": None, "features": [], "sort": None
+    }
+
+
+# (действие, число частей callback_data) -> обработчик; None — любое число частей
+Route = Callable[[types.CallbackQuery, FSMContext, str, List[str], dict], Awaitable]
+ROUTES: Dict[Tuple[str, Optional[int]], Route] = {}
+
+
+def route(action: str, parts: Optional[int] = None):
+    def register(fn: Route) -> Route:
+        ROUTES[(action, parts)] = fn
+        return fn
+    return register
+
 
 # --- 1. Вход в фильтры ("Купить" / "Арендовать") ---
 @router.message(F.text.in_(["🏠 Купить", "🏖 Арендовать"]))
@@ -23,15 +69,7 @@ async def enter_filters(message: types.Message, state: FSMContext):
     text = message.text
     mode = "buy" if "Купить" in text else "rent"
 
-    await state.set_data({
-        "mode": mode,
-        "location": None,
-        "min_price": None,
-        "max_price": None,
-        "bedrooms": None,
-        "property_type": None,
-        "features": []
-    })
+    await state.set_data(empty_filters(mode))
 
     await message.answer(
         "Выберите параметры поиска:",
@@ -40,6 +78,45 @@ async def enter_filters(message: types.Message, state: FSMContext):
 
 
 # --- 2. Универсальный обработчик всех callback-кнопок ---
+async def _show_results(query: types.CallbackQuery, state: FSMContext, mode: str, filters: dict):
+    section = "🏠 Купить" if mode == "buy" else "🏖 Арендовать"
+
+    await query.message.edit_text("Идёт поиск по выбранным фильтрам... 🔎")
+    try:
+        # сначала локальный индекс, живой парсинг — только пока он не готов
+        results = await index.search(filters)
+        if results is not None:
+            if not results:
+                text = "Не найдено объектов по указанным фильтрам."
+                notice = stale_notice(results)
+                await query.message.answer(f"{text}\n{notice}" if notice else text)
+                await query.answer()
+                return
+            await open_results(query.message, state, mode, results)
+            await query.answer("Готово")
+            return
+
+        # живой поиск: страницы сайта показываем по мере загрузки
+        await query.answer()
+        try:
+            found = await stream_results(
+                query.message, state, mode, iter_properties(section, filters),
+                sort=filters.get("sort"), bedrooms=ranking.filter_bedrooms(filters)
+            )
+        except UpstreamUnavailable:
+            # сайт не ответил — это не то же самое, что «ничего не найдено»
+            await query.message.answer("Сайт агентства сейчас не отвечает 😕 Попробуйте через пару минут.")
+            return
+
+        if not found:
+            await query.message.answer("Не найдено объектов по указанным фильтрам.")
+    except asyncio.CancelledError:
+        # отправки этого поиска в очереди отменены вместе с задачей
+        with contextlib.suppress(Exception):
+            await query.message.edit_text("⏹ Поиск остановлен: фильтры изменились.")
+        raise
+
+
 @router.callback_query()
 async def handle_callbacks(query: types.CallbackQuery, state: FSMContext):
     data = query.data
@@ -53,174 +130,170 @@ async def handle_callbacks(query: types.CallbackQuery, state: FSMContext):
     # Берём или создаём фильтры
     user_data = await state.get_data()
     if not user_data:
-        await state.set_data({
-            "mode": mode,
-            "location": None, "min_price": None, "max_price": None,
-            "bedrooms": None, "property_type": None, "features": []
-        })
+        await state.set_data(empty_filters(mode))
         user_data = await state.get_data()
 
-    # --- Навигация ---
-    if action in ["open", "back"]:
-        await query.message.edit_text(
-            "Выберите параметры поиска:",
-            reply_markup=main_filters_kb(mode, user_data)
-        )
-        await query.answer()
-        return
+    # новое значение фильтра делает идущий поиск устаревшим
+    if (action in FILTER_SETTERS and len(parts) == 3) or action == "reset":
+        searches.coordinator.cancel(query.message.chat.id)
 
-    # --- Переход в подменю ---
-    if action == "price" and len(parts) == 2:
-        await query.message.edit_text("Выберите диапазон цены:", reply_markup=price_kb(mode))
+    handler = ROUTES.get((action, len(parts))) or ROUTES.get((action, None))
+    if handler is None:
+        # fallback
         await query.answer()
         return
+    await handler(query, state, mode, parts, user_data)
 
-    if action == "bedrooms" and len(parts) == 2:
-        await query.message.edit_text("Выберите количество спален:", reply_markup=bedrooms_kb(mode))
-        await query.answer()
-        return
 
-    if action == "type" and len(parts) == 2:
-        await query.message.edit_text("Выберите тип недвижимости:", reply_markup=type_kb(mode))
-        await query.answer()
-        return
+# --- Навигация ---
+@route("open")
+@route("back")
+async def _open_filters(query, state, mode, parts, user_data):
+    await query.message.edit_text(
+        "Выберите параметры поиска:",
+        reply_markup=main_filters_kb(mode, user_data)
+    )
+    await query.answer()
 
-    if action == "area" and len(parts) == 2:
-        await query.message.edit_text("Выберите район:", reply_markup=area_kb(mode))
-        await query.answer()
-        return
 
-    if action == "more" and len(parts) == 2:
-        await query.message.edit_text("Дополнительные фильтры:", reply_markup=more_kb(mode))
-        await query.answer()
-        return
+# --- Переход в подменю ---
+async def _open_submenu(query, state, mode, parts, user_data):
+    text, kb = SUBMENUS[parts[1]]
+    await query.message.edit_text(text, reply_markup=kb(mode))
+    await query.answer()
 
-    # --- Установка значений ---
-    if action == "price" and len(parts) == 3:
-        rng = parts[2]  # "0-2000000" или "10000000-"
-        min_s, max_s = rng.split("-")
-        try:
-            min_v = int(min_s) if min_s and min_s.isdigit() else int(min_s) if min_s else None
-        except Exception:
-            min_v = None
-        try:
-            max_v = int(max_s) if max_s and max_s.isdigit() else None
-        except Exception:
-            max_v = None
-
-        # Если кнопки приходят с тысячным разделителем (unlikely), можно также replace()
-        # обновляем state
-        await state.update_data(min_price=min_v, max_price=max_v)
-        user = await state.get_data()
-
-        logger.info("PRICE set -> min=%s max=%s, state=%s", min_v, max_v, json.dumps(user, ensure_ascii=False))
-        await query.message.edit_text(
-            f"Цена установлена: {rng}\n\nТекущие фильтры: {user}",
-            reply_markup=summary_kb(mode)
-        )
-        await query.answer("Цена установлена")
-        return
 
-    if action == "bed" and len(parts) == 3:
-        bedrooms = parts[2]
-        await state.update_data(bedrooms=bedrooms)
+for _action in SUBMENUS:
+    route(_action, 2)(_open_submenu)
 
-        user = await state.get_data()
-        await query.message.edit_text(
-            f"Спальни: {bedrooms}\n\nТекущие фильтры: {user}",
-            reply_markup=summary_kb(mode)
-        )
-        await query.answer()
-        return
 
-    if action == "type" and len(parts) == 3:
-        ptype = parts[2]
-        await state.update_data(property_type=ptype)
+# --- Установка значений ---
+@route("price", 3)
+async def _set_price(query, state, mode, parts, user_data):
+    rng = parts[2]  # "0-2000000" или "10000000-"
+    min_s, _, max_s = rng.partition("-")
+    min_v = int(min_s) if min_s.isdigit() else None
+    max_v = int(max_s) if max_s.isdigit() else None
 
-        user = await state.get_data()
-        await query.message.edit_text(
-            f"Тип: {ptype}\n\nТекущие фильтры: {user}",
-            reply_markup=summary_kb(mode)
-        )
-        await query.answer()
-        return
+    await state.update_data(min_price=min_v, max_price=max_v)
+    user = await state.get_data()
 
-    if action == "area" and len(parts) == 3:
-        area = parts[2]
-        await state.update_data(location=area)
+    logger.info("PRICE set -> min=%s max=%s, state=%s", min_v, max_v, json.dumps(user, ensure_ascii=False))
+    await query.message.edit_text(
+        f"Цена установлена: {rng}\n\nТекущие фильтры: {user}",
+        reply_markup=summary_kb(mode)
+    )
+    await query.answer("Цена установлена")
 
-        user = await state.get_data()
-        await query.message.edit_text(
-            f"Район: {area}\n\nТекущие фильтры: {user}",
-            reply_markup=summary_kb(mode)
-        )
-        await query.answer()
-        return
 
-    # --- Доп. фильтры (toggle) ---
-    if action == "feat" and len(parts) == 3:
-        feat = parts[2]
-        data_now = await state.get_data()
-
-        feats = data_now.get("features", [])
-        if feat in feats:
-            feats.remove(feat)
-        else:
-            feats.append(feat)
-
-        await state.update_data(features=feats)
-        user = await state.get_data()
-
-        await query.message.edit_text(
-            f"Фильтры: {user}",
-            reply_markup=main_filters_kb(mode, user)
-        )
-        await query.answer("Изменено")
-        return
+async def _set_value(query, state, mode, parts, user_data):
+    key, label = VALUE_SETTERS[parts[1]]
+    value = parts[2]
+    await state.update_data({key: value})
 
-    # --- Сброс ---
-    if action == "reset":
-        await state.set_data({
-            "mode": mode,
-            "location": None, "min_price": None, "max_price": None,
-            "bedrooms": None, "property_type": None, "features": []
-        })
-
-        await query.message.edit_text(
-            "Фильтры сброшены.",
-            reply_markup=main_filters_kb(mode, {})
-        )
-        await query.answer("Сброшено")
-        return
+    user = await state.get_data()
+    await query.message.edit_text(
+        f"{label}: {value}\n\nТекущие фильтры: {user}",
+        reply_markup=summary_kb(mode)
+    )
+    await query.answer()
 
-    # --- Показ результатов ---
-    if action == "show":
-        filters = await state.get_data()
-        section = "🏠 Купить" if mode == "buy" else "🏖 Арендовать"
 
-        await query.message.edit_text("Идёт поиск по выбранным фильтрам... 🔎")
+for _action in VALUE_SETTERS:
+    route(_action, 3)(_set_value)
 
-        results = parse_properties(section, filters)
 
-        if not results:
-            await query.message.answer("Не найдено объектов по указанным фильтрам.")
-            await query.answer()
-            return
+@route("sort", 3)
+async def _set_sort(query, state, mode, parts, user_data):
+    # "none" и незнакомые ключи — порядок сайта
+    sort = parts[2] if parts[2] in ranking.SORTS else None
+    await state.update_data(sort=sort)
+    user = await state.get_data()
 
-        for item in results:
-            caption = (
-                f"<b>{item['title']}</b>\n"
-                f"💰 {item['price']}\n"
-                f"📍 {item.get('location', '')}\n"
-                f"<a href='{item['link']}'>Подробнее</a>"
-            )
-            if item.get("img"):
-                await query.message.answer_photo(item["img"], caption=caption)
-            else:
-                await query.message.answer(caption)
+    await query.message.edit_text(
+        f"Сортировка: {SORT_LABELS.get(sort, 'как на сайте')}\n\nТекущие фильтры: {user}",
+        reply_markup=main_filters_kb(mode, user)
+    )
+    await query.answer()
+
+
+# --- Доп. фильтры (toggle) ---
+@route("feat", 3)
+async def _toggle_feature(query, state, mode, parts, user_data):
+    feat = parts[2]
+    data_now = await state.get_data()
 
-        await query.answer("Готово")
+    feats = data_now.get("features", [])
+    if feat in feats:
+        feats.remove(feat)
+    else:
+        feats.append(feat)
+
+    await state.update_data(features=feats)
+    user = await state.get_data()
+
+    await query.message.edit_text(
+        f"Фильтры: {user}",
+        reply_markup=main_filters_kb(mode, user)
+    )
+    await query.answer("Изменено")
+
+
+# --- Сброс ---
+@route("reset")
+async def _reset(query, state, mode, parts, user_data):
+    await state.set_data(empty_filters(mode))
+
+    await query.message.edit_text(
+        "Фильтры сброшены.",
+        reply_markup=main_filters_kb(mode, {})
+    )
+    await query.answer("Сброшено")
+
+
+# --- Показ результатов ---
+@route("show")
+async def _show(query, state, mode, parts, user_data):
+    filters = await state.get_data()
+    task, joined = searches.coordinator.start(
+        query.message.chat.id, searches.search_key(filters),
+        lambda: _show_results(query, state, mode, filters)
+    )
+    if joined:
+        # повторное нажатие: поиск с теми же фильтрами уже идёт
+        await query.answer("Поиск уже идёт ⏳")
+        return
+    try:
+        await task
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise
+        # поиск вытеснен новым — фильтры изменились
+
+
+# --- Подписка на новые объекты ---
+@route("sub")
+async def _subscribe(query, state, mode, parts, user_data):
+    sid = await subscriptions.store().add(query.message.chat.id, user_data)
+    if sid is None:
+        await query.answer("Такая подписка уже есть или достигнут лимит подписок", show_alert=True)
+    else:
+        await query.answer("🔔 Подписка сохранена — пришлю новые объекты по этим фильтрам", show_alert=True)
+
+
+@route("unsub", 3)
+async def _unsubscribe(query, state, mode, parts, user_data):
+    if not parts[2].isdigit():
+        await query.answer()
         return
+    removed = await subscriptions.store().remove(int(parts[2]), chat_id=query.message.chat.id)
+    await query.answer("Подписка удалена" if removed else "Подписка не найдена")
 
-    # fallback
-    await query.answer()
+
+# --- Листание результатов ---
+@route("page", 3)
+async def _page(query, state, mode, parts, user_data):
+    if not parts[2].isdigit():
+        await query.answer()
+        return
+    await show_page(query, state, mode, int(parts[2]))
@@ -1,5 +1,6 @@
 from aiogram import Router, types, F
-from services.parser import parse_properties
+from aiogram.fsm.context import FSMContext
+from handlers.results import show_section
 
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -11,21 +12,6 @@ router = Router()
 SECTIONS = ["🌆 Проекты", "🏢 Продать недвижимость", "📅 Бронирование"]
 
 @router.message(F.text.in_(SECTIONS))
-async def show_listings(message: types.Message):
+async def show_listings(message: types.Message, state: FSMContext):
     logger.info("listings.show_listings triggered for user %s text=%s", message.from_user.id, message.text)
-
-    listings = parse_properties(message.text)
-    if not listings:
-        await message.answer("Не удалось загрузить объекты. Попробуйте позже.")
-        return
-
-    for item in listings:
-        caption = (
-            f"<b>{item['title']}</b>\n"
-            f"💰 {item['price']}\n"
-            f"<a href='{item['link']}'>Подробнее</a>"
-        )
-        if item.get('img'):
-            await message.answer_photo(item['img'], caption=caption)
-        else:
-            await message.answer(caption)
+    await show_section(message, state, "Не удалось загрузить объекты. Попробуйте позже.")
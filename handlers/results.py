@@ -0,0 +1,245 @@
+# handlers/results.py
+# Постраничная выдача объектов: одна media group (до 10 фото) + одно
+# сообщение с навигацией на страницу, вместо отдельного сообщения на объект.
+import logging
+import time
+import uuid
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InputMediaPhoto
+
+import config
+from keyboards.filters_kb import results_nav_kb
+from services import images, metrics, ranking, sections, snapshot
+from services.cache import TTLCache
+from services.listing import ListingTable
+from services.upstream import Listings
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = config.RESULTS_PAGE_SIZE
+
+# найденные списки объектов; в FSM хранится только ключ и номер страницы
+results_store = TTLCache(maxsize=2048, ttl=config.RESULTS_TTL)
+metrics.register_cache("results", results_store)
+# листание переживает рестарт: ключи лежат в FSM, сами списки — в снимке
+snapshot.register_cache("results", results_store)
+
+
+def caption_for(item: Dict) -> str:
+    lines = [f"<b>{item['title']}</b>"]
+    if item.get("price"):
+        lines.append(f"💰 {item['price']}")
+    if item.get("location"):
+        lines.append(f"📍 {item['location']}")
+    if item.get("description"):
+        lines.append(item["description"])
+    lines.append(f"<a href='{item['link']}'>Подробнее</a>")
+    return "\n".join(lines)
+
+
+def stale_notice(items: List[Dict]) -> Optional[str]:
+    """Предупреждение для результатов, показанных из кэша, пока сайт недоступен."""
+    if not getattr(items, "stale", False):
+        return None
+    minutes = max(1, round(items.age / 60))
+    return f"⚠️ Сайт сейчас недоступен — показаны данные {minutes} мин. назад."
+
+
+def page_count(items: List[Dict]) -> int:
+    return max(1, -(-len(items) // PAGE_SIZE))
+
+
+async def _send_items(message: types.Message, chunk: List[Dict]) -> None:
+    photos = [i for i in chunk if i.get("img")]
+    texts = [i for i in chunk if not i.get("img")]
+
+    if len(photos) == 1:
+        url = photos[0]["img"]
+        media = images.media_for(url)
+        try:
+            sent = await message.answer_photo(media, caption=caption_for(photos[0]))
+            await images.remember(url, sent)
+        except TelegramBadRequest:
+            await images.forget(url)
+            if media == url:
+                texts.append(photos[0])
+            else:
+                # устаревший file_id или сжатая копия не подошли — пробуем исходный URL
+                try:
+                    sent = await message.answer_photo(url, caption=caption_for(photos[0]))
+                    await images.remember(url, sent)
+                except TelegramBadRequest:
+                    texts.append(photos[0])
+    elif photos:
+        urls = [i["img"] for i in photos]
+        media = [InputMediaPhoto(media=images.media_for(u), caption=caption_for(i)) for u, i in zip(urls, photos)]
+        try:
+            sent = await message.answer_media_group(media)
+            await images.remember_group(urls, sent)
+        except TelegramBadRequest:
+            # одна битая картинка валит всю группу — шлём по одной, по исходным URL
+            logger.warning("media group rejected, sending %d photos one by one", len(photos))
+            for url, i in zip(urls, photos):
+                await images.forget(url)
+                try:
+                    sent = await message.answer_photo(url, caption=caption_for(i))
+                    await images.remember(url, sent)
+                except TelegramBadRequest:
+                    texts.append(i)
+
+    if texts:
+        await message.answer("\n\n".join(caption_for(i) for i in texts))
+
+
+async def _send_nav(message: types.Message, mode: str, items: List[Dict], page: int) -> None:
+    pages = page_count(items)
+    first = page * PAGE_SIZE + 1
+    last = min(len(items), (page + 1) * PAGE_SIZE)
+    # с сортировкой в выдаче только лучшие из найденного
+    total = getattr(items, "total", 0)
+    best = f" — лучшие из {total} найденных" if total else ""
+    await message.answer(
+        f"Объекты {first}–{last} из {len(items)}{best} (стр. {page + 1}/{pages})",
+        reply_markup=results_nav_kb(mode, page, pages)
+    )
+
+    # фото следующей страницы готовим заранее
+    following = items[(page + 1) * PAGE_SIZE:(page + 2) * PAGE_SIZE]
+    images.prefetch(i["img"] for i in following if i.get("img"))
+
+
+async def send_page(message: types.Message, mode: str, items: List[Dict], page: int) -> None:
+    page = max(0, min(page, page_count(items) - 1))
+    await _send_items(message, items[page * PAGE_SIZE:(page + 1) * PAGE_SIZE])
+    await _send_nav(message, mode, items, page)
+
+
+async def open_results(message: types.Message, state: FSMContext, mode: str, items: List[Dict]) -> None:
+    key = uuid.uuid4().hex
+    results_store.set(key, items)
+    await state.update_data(results_key=key, results_page=0)
+    notice = stale_notice(items)
+    if notice:
+        await message.answer(notice)
+    await send_page(message, mode, items, 0)
+
+
+async def show_section(message: types.Message, state: FSMContext, failed: str) -> None:
+    """Раздел меню: текст одним сообщением или список объектов с листанием."""
+    name = message.text
+    if not sections.cached(name):
+        await message.answer(f"Вы выбрали: {name}\n🔄 Загружаю информацию...")
+
+    content = await sections.get(name)
+    if not content:
+        await message.answer(failed)
+        return
+    if isinstance(content, str):
+        await message.answer(content, disable_web_page_preview=True)
+        return
+    await open_results(message, state, "list", content)
+
+
+# ---------- STREAMING ----------
+
+# Telegram не любит частые правки одного сообщения
+PROGRESS_EVERY = 1.0
+
+
+async def _progress(status: types.Message, text: str) -> None:
+    try:
+        await status.edit_text(text)
+    except TelegramBadRequest:
+        # текст не изменился или сообщение удалено — не повод прерывать поиск
+        pass
+
+
+async def stream_results(
+    status: types.Message, state: FSMContext, mode: str, chunks: AsyncIterator[List[Dict]],
+    sort: Optional[str] = None, bedrooms: Optional[int] = None,
+) -> int:
+    """
+    Показывает результаты по мере поступления страниц: первая страница
+    выдачи уходит, как только набралось PAGE_SIZE объектов (или поиск
+    закончился), статусное сообщение обновляется счётчиком найденного.
+    С сортировкой (sort из ranking.SORTS) хранятся только RESULTS_TOP_K
+    лучших, и выдача уходит в конце: порядок известен только тогда.
+    Возвращает число найденных объектов.
+    """
+    started = time.perf_counter()
+    key = uuid.uuid4().hex
+    items = ListingTable()
+    # таблица дополняется на месте — листание увидит всё, что нашлось
+    results_store.set(key, items)
+    await state.update_data(results_key=key, results_page=0)
+
+    sent_first = False
+    first_result = 0.0
+    noticed = False
+    scanned = 0
+    found = 0
+    last_progress = started
+
+    async with aclosing(chunks) as pages:
+        async for chunk in pages:
+            scanned += 1
+            found += len(chunk)
+            items.extend(chunk)
+            if sort:
+                items = ranking.top(items, sort, bedrooms=bedrooms)
+
+            notice = None if noticed else stale_notice(chunk)
+            if notice:
+                noticed = True
+                await status.answer(notice)
+
+            if not sort and not sent_first and len(items) >= PAGE_SIZE:
+                sent_first = True
+                first_result = time.perf_counter() - started
+                await _send_items(status, items[:PAGE_SIZE])
+
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_EVERY:
+                last_progress = now
+                await _progress(status, f"Идёт поиск... 🔎 Найдено: {found} (просмотрено страниц: {scanned})")
+
+    if not items:
+        return 0
+
+    if sort:
+        items = Listings(items, total=found if found > len(items) else 0)
+        results_store.set(key, items)
+    if not sent_first:
+        first_result = time.perf_counter() - started
+        await _send_items(status, items[:PAGE_SIZE])
+    total = time.perf_counter() - started
+    # замеры потокового поиска — гистограммы bot_search_seconds на /metrics
+    metrics.record("search", first_result, "first_result")
+    metrics.record("search", total, "total")
+    logger.info(
+        "Streamed search: %d items from %d pages, first result %.2fs, total %.2fs",
+        found, scanned, first_result, total
+    )
+
+    await _progress(status, f"✅ Поиск завершён. Найдено: {found}")
+    await _send_nav(status, mode, items, 0)
+    return found
+
+
+async def show_page(query: types.CallbackQuery, state: FSMContext, mode: str, page: int) -> None:
+    data = await state.get_data()
+    items = results_store.get(data.get("results_key"))
+    if items is None:
+        await query.answer("Результаты устарели, запустите поиск заново", show_alert=True)
+        return
+
+    await state.update_data(results_page=page)
+    # навигация со старой страницы больше не нужна
+    await query.message.edit_reply_markup(reply_markup=None)
+    await send_page(query.message, mode, items, page)
+    await query.answer()
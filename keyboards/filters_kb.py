@@ -1,6 +1,16 @@
 # keyboards/filters_kb.py
+# Клавиатуры фильтров не зависят от пользователя: каждая строится один раз
+# на режим (prebuild() при старте) и дальше отдаётся из кэша.
+from functools import lru_cache
+from typing import Optional
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+MODES = ("buy", "rent")
+
+# режим приходит из callback_data, так что кэш ограничен
+KB_CACHE_SIZE = 32
+
 AREAS = [
     "Central Pattaya", "South Pattaya", "North Pattaya", "Pratumnak",
     "Jomtien", "Wongamat", "Naklua", "East Pattaya"
@@ -34,10 +44,28 @@ POPULAR_FEATURES = [
     ("Brand New", "brand_new")
 ]
 
+# ключи — services.ranking.SORTS; "none" — порядок сайта
+SORT_BUTTONS = [
+    ("💸 Сначала дешёвые", "price_asc"),
+    ("💎 Сначала дорогие", "price_desc"),
+    ("🛏 Цена за спальню", "price_per_bed"),
+    ("🆕 Сначала новые", "newest"),
+    ("Как на сайте", "none")
+]
+SORT_LABELS = {key: label for label, key in SORT_BUTTONS if key != "none"}
+
 
 # ----- Aiogram 3 совместимые клавиатуры -----
 
 def main_filters_kb(mode: str, selected: dict) -> InlineKeyboardMarkup:
+    sort = (selected or {}).get("sort")
+    return _main_filters_kb(mode, sort if sort in SORT_LABELS else None)
+
+
+# по клавиатуре на режим и сортировку: выбранная видна на кнопке
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def _main_filters_kb(mode: str, sort: Optional[str] = None) -> InlineKeyboardMarkup:
+    sort_text = f"↕️ {SORT_LABELS[sort]}" if sort else "↕️ Сортировка"
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
@@ -52,6 +80,9 @@ def main_filters_kb(mode: str, selected: dict) -> InlineKeyboardMarkup:
                 InlineKeyboardButton(text="⚙️ More", callback_data=f"{mode}:more"),
                 InlineKeyboardButton(text="♻️ Сбросить", callback_data=f"{mode}:reset")
             ],
+            [
+                InlineKeyboardButton(text=sort_text, callback_data=f"{mode}:sort")
+            ],
             [
                 InlineKeyboardButton(text="🔎 Показать результаты", callback_data=f"{mode}:show")
             ]
@@ -59,6 +90,7 @@ def main_filters_kb(mode: str, selected: dict) -> InlineKeyboardMarkup:
     )
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def price_kb(mode: str) -> InlineKeyboardMarkup:
     rows = []
     buttons = BUY_PRICE_BUTTONS if mode == "buy" else RENT_PRICE_BUTTONS
@@ -75,6 +107,7 @@ def price_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def bedrooms_kb(mode: str) -> InlineKeyboardMarkup:
     rows = []
 
@@ -90,6 +123,7 @@ def bedrooms_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def type_kb(mode: str) -> InlineKeyboardMarkup:
     rows = []
 
@@ -105,6 +139,7 @@ def type_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def area_kb(mode: str) -> InlineKeyboardMarkup:
     rows = []
 
@@ -120,6 +155,23 @@ def area_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def sort_kb(mode: str) -> InlineKeyboardMarkup:
+    rows = []
+
+    for label, key in SORT_BUTTONS:
+        rows.append([
+            InlineKeyboardButton(text=label, callback_data=f"{mode}:sort:{key}")
+        ])
+
+    rows.append([
+        InlineKeyboardButton(text="↩️ Назад", callback_data=f"{mode}:back")
+    ])
+
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def more_kb(mode: str) -> InlineKeyboardMarkup:
     rows = []
 
@@ -139,12 +191,47 @@ def more_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=KB_CACHE_SIZE)
 def summary_kb(mode: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="Изменить фильтры", callback_data=f"{mode}:open"),
                 InlineKeyboardButton(text="🔎 Показать результаты", callback_data=f"{mode}:show")
+            ],
+            [
+                InlineKeyboardButton(text="🔔 Подписаться на новые", callback_data=f"{mode}:sub")
             ]
         ]
     )
+
+
+# страниц немного, но режимов у разделов больше двух
+@lru_cache(maxsize=512)
+def results_nav_kb(mode: str, page: int, pages: int) -> InlineKeyboardMarkup:
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"{mode}:page:{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton(text="Ещё ➡️", callback_data=f"{mode}:page:{page + 1}"))
+
+    rows = [nav] if nav else []
+    if mode in ("buy", "rent"):
+        rows.append([
+            InlineKeyboardButton(text="Изменить фильтры", callback_data=f"{mode}:open")
+        ])
+
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+STATIC_KEYBOARDS = (_main_filters_kb, price_kb, bedrooms_kb, type_kb, area_kb, sort_kb, more_kb, summary_kb)
+
+
+def prebuild(modes=MODES) -> int:
+    """Строит все статические клавиатуры заранее; возвращает их число."""
+    for mode in modes:
+        for build in STATIC_KEYBOARDS:
+            build(mode)
+        for sort in SORT_LABELS:
+            _main_filters_kb(mode, sort)
+    return len(modes) * (len(STATIC_KEYBOARDS) + len(SORT_LABELS))
@@ -0,0 +1,388 @@
+# services/cluster.py
+# Several processes for one bot (WORKERS > 1). The front process takes the
+# updates (polling or webhook) and hands each one to worker chat_id % N over
+# a Unix socket, in arrival order: a chat always lands on the same worker, so
+# its updates are handled in order and its FSM state has one writer.
+#
+# Workers run the routers. What must exist once for the whole bot stays in
+# the front: the site's HTTP pool with its rate limit and breaker, the page,
+# result and detail caches, the listing index and its crawler, the menu
+# sections and subscription notices. Workers reach it through the functions
+# marked @shared, which run in the front and send the result back.
+#
+# Frames are a 4-byte length plus a pickle; both ends are this code.
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import os
+import pickle
+import signal
+import struct
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+import config
+from services import metrics, upstream
+
+logger = logging.getLogger(__name__)
+
+worker_id: Optional[int] = None if config.CLUSTER_WORKER is None else int(config.CLUSTER_WORKER)
+role = "worker" if worker_id is not None else ("front" if config.WORKERS > 1 else "single")
+
+POLL_TIMEOUT = 30  # getUpdates long poll, s
+_HEADER = struct.Struct(">I")
+
+stats = {"routed": 0, "done": 0, "calls": 0, "call_errors": 0, "restarts": 0}
+
+for _key in stats:
+    metrics.CallbackCounter(
+        f"bot_cluster_{_key}_total", f"cluster.stats[{_key!r}]", fn=lambda k=_key: stats[k]
+    )
+
+
+def _socket_path() -> str:
+    return os.path.join(config.DATA_DIR, "cluster.sock")
+
+
+async def _read(reader: asyncio.StreamReader) -> Any:
+    size, = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+def _frame(msg: Any) -> bytes:
+    data = pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(data)) + data
+
+
+async def _write(writer: asyncio.StreamWriter, msg: Any) -> None:
+    writer.write(_frame(msg))
+    await writer.drain()
+
+
+def chat_of(raw: Dict) -> int:
+    """The chat an update belongs to (the user for chat-less ones, 0 if neither)."""
+    for key, event in raw.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return 0
+
+
+# ---------- SHARED CALLS ----------
+
+# "module.name" -> the local function, for the front to run
+_registry: Dict[str, Callable] = {}
+_client: Optional["_Client"] = None
+
+
+def shared(fn: Callable) -> Callable:
+    """
+    Runs `fn` in the front when called from a worker; a plain call anywhere
+    else. The caller's upstream budget goes with it. Arguments and the
+    result are pickled.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    _registry[name] = fn
+
+    @functools.wraps(fn)
+    async def call(*args, **kwargs):
+        if _client is None:
+            return await fn(*args, **kwargs)
+        return await _client.call(name, args, kwargs)
+
+    return call
+
+
+class _Client:
+    """A worker's end of the socket: pending shared calls by id."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self._writer = writer
+        self._ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    async def send(self, msg: Any) -> None:
+        await _write(self._writer, msg)
+
+    async def call(self, name: str, args: tuple, kwargs: dict) -> Any:
+        cid = next(self._ids)
+        fut = self._pending[cid] = asyncio.get_running_loop().create_future()
+        try:
+            await self.send(("call", cid, name, args, kwargs, upstream.remaining()))
+            return await fut
+        except asyncio.CancelledError:
+            # the search was cancelled here: don't keep the front busy with it
+            if not self._writer.is_closing():
+                self._writer.write(_frame(("cancel", cid)))
+            raise
+        finally:
+            self._pending.pop(cid, None)
+
+    def resolve(self, cid: int, ok: bool, value: Any) -> None:
+        fut = self._pending.get(cid)
+        if fut is None or fut.done():
+            return
+        if ok:
+            fut.set_result(value)
+        else:
+            fut.set_exception(value)
+
+    def fail_all(self, exc: BaseException) -> None:
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+
+# ---------- FRONT ----------
+
+_STOP = object()
+
+
+class _Worker:
+    def __init__(self, wid: int):
+        self.id = wid
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.in_flight = 0
+        # updates sent and not yet handled
+        metrics.register_queue(f"worker{wid}", lambda: self.in_flight)
+
+
+class Front:
+    """Routes updates to the workers, serves their shared calls and restarts them if they die."""
+
+    def __init__(self, workers: int):
+        self.workers = [_Worker(i) for i in range(workers)]
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._supervisors: List[asyncio.Task] = []
+        self._stopping = False
+
+    @property
+    def in_flight(self) -> int:
+        return sum(w.in_flight for w in self.workers)
+
+    def route(self, raw: Dict) -> None:
+        w = self.workers[chat_of(raw) % len(self.workers)]
+        w.in_flight += 1
+        w.queue.put_nowait(raw)
+        stats["routed"] += 1
+
+    async def start(self) -> None:
+        path = _socket_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)  # left by a killed front
+        self._server = await asyncio.start_unix_server(self._accept, path)
+        self._supervisors = [asyncio.create_task(self._supervise(w)) for w in self.workers]
+        logger.info("Cluster: %d workers on %s", len(self.workers), path)
+
+    async def stop(self) -> None:
+        """Workers finish the updates they were given, save their state and exit."""
+        self._stopping = True
+        for w in self.workers:
+            w.queue.put_nowait(_STOP)
+        _, pending = await asyncio.wait(self._supervisors, timeout=config.SHUTDOWN_DRAIN_TIMEOUT + 10)
+        for w in self.workers:
+            if w.proc is not None and w.proc.returncode is None and pending:
+                logger.warning("Cluster: worker %d did not stop, killing", w.id)
+                w.proc.kill()
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(_socket_path()):
+            os.unlink(_socket_path())
+
+    async def _supervise(self, w: _Worker) -> None:
+        env = dict(os.environ, CLUSTER_WORKER=str(w.id))
+        while True:
+            # the same command line the front was started with
+            w.proc = await asyncio.create_subprocess_exec(*sys.orig_argv, env=env)
+            code = await w.proc.wait()
+            if self._stopping:
+                return
+            stats["restarts"] += 1
+            logger.error("Cluster: worker %d exited with %s, restarting", w.id, code)
+            await asyncio.sleep(1)
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            _, wid = await _read(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        w = self.workers[wid]
+        pump = asyncio.create_task(self._pump(w, writer))
+        calls: Dict[int, asyncio.Task] = {}
+        try:
+            while True:
+                msg = await _read(reader)
+                kind = msg[0]
+                if kind == "call":
+                    cid = msg[1]
+                    task = calls[cid] = asyncio.create_task(self._call(writer, *msg[1:]))
+                    task.add_done_callback(lambda t, cid=cid: calls.pop(cid, None))
+                elif kind == "cancel":
+                    task = calls.get(msg[1])
+                    if task is not None:
+                        task.cancel()
+                elif kind == "done":
+                    w.in_flight -= 1
+                    stats["done"] += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            pump.cancel()
+            for task in list(calls.values()):
+                task.cancel()
+            writer.close()
+            # updates the worker had taken are lost with it, like in a single process
+            w.in_flight = w.queue.qsize()
+
+    async def _pump(self, w: _Worker, writer: asyncio.StreamWriter) -> None:
+        while True:
+            raw = await w.queue.get()
+            try:
+                await _write(writer, ("stop",) if raw is _STOP else ("update", raw))
+            except ConnectionError:
+                logger.warning("Cluster: worker %d is gone, update dropped", w.id)
+                return
+
+    async def _call(self, writer: asyncio.StreamWriter, cid: int, name: str, args: tuple, kwargs: dict,
+                    budget: Optional[float]) -> None:
+        stats["calls"] += 1
+        try:
+            if budget is None:
+                reply = ("result", cid, True, await _registry[name](*args, **kwargs))
+            else:
+                with upstream.deadline(budget):
+                    reply = ("result", cid, True, await _registry[name](*args, **kwargs))
+        except Exception as e:
+            stats["call_errors"] += 1
+            reply = ("result", cid, False, e)
+        try:
+            data = _frame(reply)
+        except Exception:
+            # an exception that doesn't pickle
+            data = _frame(("result", cid, False, RuntimeError(repr(reply[3]))))
+        if not writer.is_closing():
+            writer.write(data)
+            await writer.drain()
+
+    # ---------- INTAKE ----------
+
+    async def poll(self, token: str, api_url: Callable[..., str], allowed_updates: List[str]) -> None:
+        """getUpdates in a loop; updates are routed as raw JSON, never parsed here."""
+        url = api_url(token=token, method="getUpdates")
+        offset = None
+        timeout = aiohttp.ClientTimeout(total=POLL_TIMEOUT + 10)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            while True:
+                params = {"timeout": POLL_TIMEOUT, "allowed_updates": allowed_updates}
+                if offset is not None:
+                    params["offset"] = offset
+                try:
+                    async with http.post(url, json=params) as resp:
+                        body = await resp.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+                    logger.warning("getUpdates failed, retrying", exc_info=True)
+                    await asyncio.sleep(1)
+                    continue
+                if not body.get("ok"):
+                    logger.warning("getUpdates: %s", body.get("description"))
+                    await asyncio.sleep(body.get("parameters", {}).get("retry_after", 1))
+                    continue
+                for raw in body["result"]:
+                    offset = raw["update_id"] + 1
+                    self.route(raw)
+
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        if config.WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != config.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        self.route(await request.json())
+        return web.Response()
+
+
+# ---------- WORKER ----------
+
+async def _connect() -> tuple:
+    # the front starts listening before it spawns us; a restart may race it
+    for _ in range(50):
+        try:
+            return await asyncio.open_unix_connection(_socket_path())
+        except (FileNotFoundError, ConnectionRefusedError):
+            await asyncio.sleep(0.1)
+    return await asyncio.open_unix_connection(_socket_path())
+
+
+async def run_worker(bot, dp) -> None:
+    """Handles the updates the front sends until it says stop or goes away."""
+    global _client
+    loop = asyncio.get_running_loop()
+    # Ctrl+C and SIGTERM are the front's to handle: it stops us after the intake
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: None)
+
+    reader, writer = await _connect()
+    _client = _Client(writer)
+    await _client.send(("hello", worker_id))
+    await dp.emit_startup(bot=bot)
+
+    tasks = set()
+
+    async def handle(raw: Dict) -> None:
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception:
+            logger.exception("Update %s failed", raw.get("update_id"))
+        finally:
+            if not writer.is_closing():
+                writer.write(_frame(("done", raw.get("update_id"))))
+
+    try:
+        while True:
+            msg = await _read(reader)
+            kind = msg[0]
+            if kind == "update":
+                # concurrently, as in a single process: a new search can cancel the old one
+                task = asyncio.create_task(handle(msg[1]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            elif kind == "result":
+                _client.resolve(*msg[1:])
+            elif kind == "stop":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        logger.warning("Cluster: the front went away, stopping worker %s", worker_id)
+        _client.fail_all(upstream.UpstreamUnavailable("cluster front"))
+
+    if tasks:
+        # shared calls still need the front: keep reading its replies meanwhile
+        replies = asyncio.create_task(_replies(reader))
+        done, pending = await asyncio.wait(tasks, timeout=config.SHUTDOWN_DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        replies.cancel()
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    writer.close()
+
+
+async def _replies(reader: asyncio.StreamReader) -> None:
+    try:
+        while True:
+            msg = await _read(reader)
+            if msg[0] == "result":
+                _client.resolve(*msg[1:])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        _client.fail_all(upstream.UpstreamUnavailable("cluster front"))
@@ -0,0 +1,136 @@
+# services/features.py
+# Area and feature matching for the "📍 Район" and "⚙️ More" filters.
+# Every listing gets its area and a feature bitmask once, at parse time;
+# filtering is then a dict lookup and an AND per listing.
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+import config
+from keyboards.filters_kb import AREAS, POPULAR_FEATURES
+from services import cluster, metrics, snapshot
+from services.cache import TTLCache
+from services.listing import ListingTable
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- AREAS ----------
+
+# spellings seen on listing cards, besides the AREAS name itself
+AREA_ALIASES = {
+    "Pratumnak": ["phra tamnak", "pratamnak", "pratumnak hill"],
+    "Wongamat": ["wong amat", "wong-amat"],
+    "Naklua": ["na kluea", "na klua"],
+    "Jomtien": ["jomtien beach", "jomtian"],
+    "Central Pattaya": ["pattaya city", "pattaya klang"],
+    "South Pattaya": ["pattaya tai", "walking street"],
+    "North Pattaya": ["pattaya nua"],
+    "East Pattaya": ["huay yai", "nong prue", "siam country club"],
+}
+
+_AREA_BY_TOKEN: Dict[str, str] = {}
+for _area in AREAS:
+    for _token in [_area.lower()] + AREA_ALIASES.get(_area, []):
+        _AREA_BY_TOKEN[_token] = _area
+
+# longest first, so "north pattaya" wins over a bare alias inside it
+_AREA_RE = re.compile(
+    r"\b(" + "|".join(re.escape(t) for t in sorted(_AREA_BY_TOKEN, key=len, reverse=True)) + r")\b"
+)
+
+
+def area_of(*texts: str) -> Optional[str]:
+    for text in texts:
+        m = _AREA_RE.search((text or "").lower())
+        if m:
+            return _AREA_BY_TOKEN[m.group(1)]
+    return None
+
+
+# ---------- FEATURES ----------
+
+FEATURE_PATTERNS = {
+    "pool": r"\bpool|swimming",
+    "sea_view": r"\bsea[ -]?views?\b|\bocean views?\b|\bbeachfront\b|\bsea front\b",
+    "high_floor": r"\bhigh[ -]floor\b|\btop floor\b|\bpenthouse\b|\b(?:[2-9]\d)(?:st|nd|rd|th) floor\b",
+    "corner": r"\bcorner\b",
+    "brand_new": r"\bbrand[ -]new\b|\bnew project\b|\bnever lived\b|\bfirst hand\b",
+}
+
+FEATURE_BITS = {key: 1 << i for i, (_, key) in enumerate(POPULAR_FEATURES)}
+
+_FEATURE_RES = [(FEATURE_BITS[key], re.compile(p)) for key, p in FEATURE_PATTERNS.items()]
+
+
+def feature_mask(*texts: str) -> int:
+    text = " ".join(t for t in texts if t).lower()
+    mask = 0
+    for bit, pattern in _FEATURE_RES:
+        if pattern.search(text):
+            mask |= bit
+    return mask
+
+
+def required_mask(features: Optional[Iterable[str]]) -> int:
+    mask = 0
+    for key in features or ():
+        mask |= FEATURE_BITS.get(key, 0)
+    return mask
+
+
+# ---------- DETAIL PAGES ----------
+
+# features found on a listing's own page, by link
+detail_cache = TTLCache(maxsize=4096, ttl=24 * 3600)
+metrics.register_cache("detail", detail_cache)
+snapshot.register_cache("detail", detail_cache)
+
+
+def _detail_text(html: str) -> str:
+    from bs4 import BeautifulSoup  # only with FEATURES_FETCH_DETAILS on
+    soup = BeautifulSoup(html, "lxml")
+    return soup.get_text(" ", strip=True)
+
+
+@cluster.shared
+async def detail_mask(link: str) -> Optional[int]:
+    # imported here: parser imports this module for feature_mask/area_of
+    from services.parser import fetch_page
+
+    async def load() -> Optional[int]:
+        html = await fetch_page(link)
+        if html is None:
+            return None
+        return feature_mask(await asyncio.to_thread(_detail_text, html))
+
+    return await detail_cache.get_or_fetch(link, load)
+
+
+async def filter_features(items: List[Dict], features: Optional[Iterable[str]]) -> List[Dict]:
+    """
+    Keeps items whose card shows every requested feature. With
+    FEATURES_FETCH_DETAILS on, cards that don't mention them are checked
+    against the detail page (at most FEATURES_DETAIL_LIMIT per search).
+    """
+    req = required_mask(features)
+    if not req:
+        return items
+
+    if isinstance(items, ListingTable) and not config.FEATURES_FETCH_DETAILS:
+        return items.with_features(req)
+
+    items = list(items)  # table rows are built on access; ids below need stable objects
+    if not config.FEATURES_FETCH_DETAILS:
+        return [i for i in items if (i.get("features", 0) & req) == req]
+
+    unknown = [i for i in items if (i.get("features", 0) & req) != req and i.get("link")]
+    unknown = unknown[:config.FEATURES_DETAIL_LIMIT]
+    masks = await asyncio.gather(*(detail_mask(i["link"]) for i in unknown))
+    extra = {id(i): m or 0 for i, m in zip(unknown, masks)}
+
+    return [
+        i for i in items
+        if ((i.get("features", 0) | extra.get(id(i), 0)) & req) == req
+    ]
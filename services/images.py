@@ -0,0 +1,181 @@
+# services/images.py
+# Listing photos. Telegram returns a file_id for every photo we send; we keep
+# it per image URL so later sends reuse the uploaded file instead of making
+# Telegram download it from enlightproperty.com again. Optionally, photos of
+# upcoming result pages are downloaded and shrunk in the background, so the
+# first send uploads a compact JPEG instead of the full-size original.
+import asyncio
+import io
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Union
+
+from aiogram.types import BufferedInputFile, InputFile, Message
+
+import config
+from services import metrics
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- FILE_ID STORE ----------
+
+class FileIdStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS file_ids (url TEXT PRIMARY KEY, file_id TEXT NOT NULL)")
+        self._lock = threading.Lock()
+        self._ids: Dict[str, str] = dict(self._db.execute("SELECT url, file_id FROM file_ids"))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, url: str) -> Optional[str]:
+        return self._ids.get(url)
+
+    def _save(self, url: str, file_id: Optional[str]) -> None:
+        with self._lock:
+            if file_id is None:
+                self._db.execute("DELETE FROM file_ids WHERE url = ?", (url,))
+            else:
+                self._db.execute("INSERT OR REPLACE INTO file_ids (url, file_id) VALUES (?, ?)", (url, file_id))
+
+    async def put(self, url: str, file_id: str) -> None:
+        if self._ids.get(url) == file_id:
+            return
+        self._ids[url] = file_id
+        await asyncio.to_thread(self._save, url, file_id)
+
+    async def forget(self, url: str) -> None:
+        if self._ids.pop(url, None) is not None:
+            await asyncio.to_thread(self._save, url, None)
+
+
+_store: Optional[FileIdStore] = None
+
+
+def file_ids() -> FileIdStore:
+    global _store
+    if _store is None:
+        _store = FileIdStore(os.path.join(config.DATA_DIR, "images.sqlite3"))
+    return _store
+
+
+# ---------- SENDING ----------
+
+# url -> downscaled JPEG bytes, waiting for their first upload
+_prefetched = TTLCache(maxsize=256, ttl=3600)
+metrics.register_cache("image", _prefetched)
+
+
+def media_for(url: str) -> Union[str, InputFile]:
+    """Best thing to hand Telegram for this photo: file_id, prefetched JPEG or the URL."""
+    file_id = file_ids().get(url)
+    if file_id:
+        return file_id
+
+    data = _prefetched.get(url)
+    if data is not None:
+        return BufferedInputFile(data, filename=os.path.basename(url.split("?")[0]) or "photo.jpg")
+
+    return url
+
+
+async def remember(url: str, message: Optional[Message]) -> None:
+    if message is None or not message.photo:
+        return
+    await file_ids().put(url, message.photo[-1].file_id)
+    _prefetched.pop(url)
+
+
+async def forget(url: str) -> None:
+    """Telegram rejected what we sent for this photo: next time use the plain URL."""
+    await file_ids().forget(url)
+    _prefetched.pop(url)
+
+
+async def remember_group(urls: List[str], messages: List[Message]) -> None:
+    for url, message in zip(urls, messages):
+        await remember(url, message)
+
+
+# ---------- PREFETCH ----------
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_queued: set = set()
+metrics.register_queue("image_prefetch", lambda: _queue.qsize() if _queue is not None else 0)
+
+
+def _downscale(data: bytes) -> bytes:
+    from PIL import Image  # Pillow is only needed with IMAGE_PREFETCH=1
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((config.IMAGE_MAX_SIDE, config.IMAGE_MAX_SIDE))
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=config.IMAGE_QUALITY, optimize=True)
+        return out.getvalue()
+
+
+async def _download(url: str) -> Optional[bytes]:
+    from services.parser import get_session
+
+    session = await get_session()
+    try:
+        async with session.get(url) as r:
+            if r.status != 200:
+                return None
+            return await r.read()
+    except Exception:
+        logger.debug("Image download failed: %s", url, exc_info=True)
+        return None
+
+
+async def _worker(queue: asyncio.Queue) -> None:
+    while True:
+        url = await queue.get()
+        try:
+            data = await _download(url)
+            if data:
+                _prefetched.set(url, await asyncio.to_thread(_downscale, data))
+        except Exception:
+            logger.warning("Image prefetch failed: %s", url, exc_info=True)
+        finally:
+            _queued.discard(url)
+            queue.task_done()
+
+
+def prefetch(urls: Iterable[str]) -> None:
+    """Queues photos for background download + downscale (IMAGE_PREFETCH=1)."""
+    global _queue
+    if not config.IMAGE_PREFETCH:
+        return
+
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=1000)
+        _workers.extend(asyncio.create_task(_worker(_queue)) for _ in range(config.IMAGE_WORKERS))
+
+    store = file_ids()
+    for url in urls:
+        if not url or url in _queued or store.get(url) or _prefetched.get(url) is not None:
+            continue
+        try:
+            _queue.put_nowait(url)
+        except asyncio.QueueFull:
+            return
+        _queued.add(url)
+
+
+async def stop_prefetch() -> None:
+    global _queue
+    for t in _workers:
+        t.cancel()
+    _workers.clear()
+    _queue = None
+    _queued.clear()
@@ -0,0 +1,378 @@
+# services/index.py
+# In-memory index of all listings, filled by a periodic background crawl,
+# so "show results" is answered from memory instead of a live scrape.
+import asyncio
+import json
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import aclosing
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from keyboards.filters_kb import BEDROOMS, PROPERTY_TYPES
+from services import cluster, parser, prices, ranking, upstream
+from services.features import filter_features
+
+logger = logging.getLogger(__name__)
+
+# order of fields in a compact record tuple
+FIELDS = ("title", "link", "price", "price_value", "img", "location", "area", "features")
+PRICE = FIELDS.index("price_value")
+AREA = FIELDS.index("area")
+FEATURES = FIELDS.index("features")
+
+MODES = ("buy", "rent")
+POSTING_FIELDS = ("mode", "type", "bed", "area")
+
+_EMPTY: frozenset = frozenset()
+
+
+# ---------- INDEX ----------
+
+class ListingIndex:
+    """
+    Immutable once built: records are tuples in FIELDS order, postings map
+    field -> value -> ids, and prices are kept as a sorted column for range
+    lookups. Price buttons are answered from per-bucket id sets instead.
+    """
+
+    def __init__(self, records: List[tuple], postings: Dict[str, Dict[str, Iterable[int]]], built_at: float):
+        self.records = records
+        self.built_at = built_at
+        self.postings: Dict[str, Dict[str, frozenset]] = {
+            field: {value: frozenset(ids) for value, ids in values.items()}
+            for field, values in postings.items()
+        }
+        for field in POSTING_FIELDS:
+            self.postings.setdefault(field, {})
+
+        priced = sorted((r[PRICE], i) for i, r in enumerate(records) if r[PRICE] is not None)
+        self.prices = array("q", (p for p, _ in priced))
+        self.price_ids = array("l", (i for _, i in priced))
+
+        by_bucket: Dict[int, Set[int]] = defaultdict(set)
+        for p, i in priced:
+            by_bucket[prices.bucket(p)].add(i)
+        self.buckets: Dict[int, frozenset] = {b: frozenset(ids) for b, ids in by_bucket.items()}
+        # (first, last) bucket -> ids; a handful of button ranges
+        self._bucket_ranges: Dict[tuple, frozenset] = {}
+        self._bedrooms: Optional[Dict[int, int]] = None
+
+    def in_buckets(self, first: int, last: int) -> frozenset:
+        ids = self._bucket_ranges.get((first, last))
+        if ids is None:
+            ids = frozenset().union(*(s for b, s in self.buckets.items() if first <= b <= last))
+            self._bucket_ranges[(first, last)] = ids
+        return ids
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def covers(self, mode: str) -> bool:
+        return bool(self.postings.get("mode", {}).get(mode))
+
+    def ids_for(self, filters: Dict) -> Set[int]:
+        mode = filters.get("mode", "buy")
+        sets = [self.postings["mode"].get(mode, _EMPTY)]
+
+        if filters.get("property_type"):
+            sets.append(self.postings["type"].get(filters["property_type"], _EMPTY))
+        if filters.get("bedrooms"):
+            sets.append(self.postings["bed"].get(str(filters["bedrooms"]), _EMPTY))
+        if filters.get("location"):
+            sets.append(self.postings["area"].get(filters["location"], _EMPTY))
+        # unpriced listings never pass price_in_range, so the price filter
+        # is applied even without min/max
+        min_p, max_p = filters.get("min_price"), filters.get("max_price")
+        buckets = prices.bucket_range(min_p, max_p)
+        if buckets is not None:
+            sets.append(self.in_buckets(*buckets))
+
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for s in sets[1:]:
+            ids &= s
+            if not ids:
+                return ids
+        if buckets is not None:
+            return ids
+
+        lo = bisect_left(self.prices, min_p) if min_p is not None else 0
+        hi = bisect_right(self.prices, max_p) if max_p is not None else len(self.prices)
+
+        if len(ids) < hi - lo:
+            return {i for i in ids if parser.price_in_range(self.records[i][PRICE], min_p, max_p)}
+        return ids.intersection(self.price_ids[lo:hi])
+
+    def values_of(self, field: str) -> Dict[int, str]:
+        """Reverse of a posting list: record id -> value (e.g. "type" -> "Condo")."""
+        out = {}
+        for value, ids in self.postings.get(field, {}).items():
+            for i in ids:
+                out[i] = value
+        return out
+
+    def bedrooms(self) -> Dict[int, int]:
+        """Record id -> bedrooms, as far as the crawl's bedroom queries tell ("3" is 3+)."""
+        if self._bedrooms is None:
+            self._bedrooms = {i: int(bed) for i, bed in self.values_of("bed").items()}
+        return self._bedrooms
+
+    def rank_key(self, filters: Dict) -> Callable[[int], Tuple]:
+        """Record id -> ranking.rank() key for filters["sort"]."""
+        sort = filters["sort"]
+        records = self.records
+        bedrooms = ranking.filter_bedrooms(filters)
+        beds = self.bedrooms() if sort == "price_per_bed" and bedrooms is None else {}
+
+        def key(i: int) -> Tuple:
+            r = records[i]
+            return ranking.rank(sort, r[PRICE], r[0], r[1], bedrooms if bedrooms is not None else beds.get(i))
+        return key
+
+    def rows(self, ids: Iterable[int]) -> List[Dict]:
+        return [dict(zip(FIELDS, self.records[i])) for i in ids]
+
+    def search(self, filters: Dict) -> List[Dict]:
+        return self.rows(sorted(self.ids_for(filters)))
+
+    # ----- persistence -----
+
+    def to_json(self) -> Dict:
+        return {
+            "built_at": self.built_at,
+            "fields": FIELDS,
+            "records": self.records,
+            "postings": {
+                field: {value: sorted(ids) for value, ids in values.items()}
+                for field, values in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "ListingIndex":
+        if tuple(data.get("fields", ())) != FIELDS:
+            raise ValueError("index file has an incompatible record layout")
+        return cls([tuple(r) for r in data["records"]], data["postings"], data["built_at"])
+
+
+class _Builder:
+    def __init__(self):
+        self.records: List[tuple] = []
+        self.by_link: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+
+    def add(self, record: tuple) -> int:
+        link = record[1]
+        rid = self.by_link.get(link) if link else None
+        if rid is None:
+            rid = len(self.records)
+            self.records.append(record)
+            if link:
+                self.by_link[link] = rid
+        return rid
+
+    def build(self) -> ListingIndex:
+        for rid, record in enumerate(self.records):
+            area = record[AREA]
+            if area:
+                self.postings["area"][area].add(rid)
+        return ListingIndex(self.records, self.postings, time.time())
+
+
+# ---------- STATE ----------
+
+_current: Optional[ListingIndex] = None
+
+# awaited as cb(old, new) after every rebuild, e.g. saved-search notifications
+listeners: List[Callable[[Optional[ListingIndex], ListingIndex], Awaitable[None]]] = []
+_listener_tasks: Set[asyncio.Task] = set()
+
+
+def current() -> Optional[ListingIndex]:
+    return _current
+
+
+@cluster.shared
+async def search(filters: Dict) -> Optional[upstream.Listings]:
+    """Index answer for the filters, or None if the index can't answer yet."""
+    idx = _current
+    if idx is None or not idx.covers(filters.get("mode", "buy")):
+        return None
+    # crawls keep failing: still the best answer we have, but say how old it is
+    stale = time.time() - idx.built_at > 2 * config.CRAWL_INTERVAL
+    ids = idx.ids_for(filters)
+    sort, features = filters.get("sort"), filters.get("features")
+    if sort and not features:
+        # only the best few are built into rows
+        best = ranking.top_ids(ids, idx.rank_key(filters))
+        return upstream.Listings(idx.rows(best), idx.built_at, stale, total=len(ids) if len(ids) > len(best) else 0)
+
+    items = upstream.Listings(await filter_features(idx.rows(sorted(ids)), features), idx.built_at, stale)
+    if sort:
+        # the features filter may still drop listings, so the cut comes after it
+        items = ranking.top(items, sort, bedrooms=ranking.filter_bedrooms(filters))
+    return items
+
+
+def _index_path() -> str:
+    return os.path.join(config.DATA_DIR, "listings_index.json")
+
+
+def save(idx: ListingIndex, path: Optional[str] = None) -> None:
+    path = path or _index_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx.to_json(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load(path: Optional[str] = None) -> Optional[ListingIndex]:
+    global _current
+    path = path or _index_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            idx = ListingIndex.from_json(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        logger.warning("Could not load listings index from %s", path, exc_info=True)
+        return None
+
+    _current = idx
+    logger.info("Listings index restored: %d records from %s", len(idx), path)
+    return idx
+
+
+# ---------- CRAWLER ----------
+
+def _crawl_queries() -> List[tuple]:
+    """(mode, posting field, posting value, search filters) for every search we walk."""
+    queries = []
+    for mode in MODES:
+        queries.append((mode, None, None, {"mode": mode}))
+        for ptype in PROPERTY_TYPES:
+            queries.append((mode, "type", ptype, {"mode": mode, "property_type": ptype}))
+        for _, bed in BEDROOMS:
+            queries.append((mode, "bed", bed, {"mode": mode, "bedrooms": bed}))
+    return queries
+
+
+async def _crawl_query(filters: Dict) -> Optional[List[Dict]]:
+    url = parser._build_search_url(filters)
+    items: List[Dict] = []
+    seen: Set[str] = set()
+
+    async with aclosing(parser.stream_pages(url, config.CRAWL_MAX_PAGES, parser.fetch_fresh)) as pages:
+        async for page_items in pages:
+            if page_items is None:
+                # half a query would drop listings from the index; keep the old ones
+                return None
+
+            fresh = [i for i in page_items if i["link"] not in seen]
+            # past the last page the site repeats it or returns nothing
+            if not fresh:
+                break
+            seen.update(i["link"] for i in fresh)
+            items.extend(fresh)
+
+    return items
+
+
+def _carry_over(builder: _Builder, old: Optional[ListingIndex], mode: str, field: Optional[str], value: Optional[str]) -> None:
+    """A query failed this round: keep what the previous index knew about it."""
+    if old is None:
+        return
+    ids = old.postings["mode"].get(mode, _EMPTY)
+    if field:
+        ids = ids & old.postings[field].get(value, _EMPTY)
+    for oid in ids:
+        rid = builder.add(old.records[oid])
+        builder.postings["mode"][mode].add(rid)
+        if field:
+            builder.postings[field][value].add(rid)
+
+
+async def crawl_once() -> Optional[ListingIndex]:
+    global _current
+    old = _current
+    started = time.perf_counter()
+    stats_before = dict(parser.fetch_stats)
+
+    queries = _crawl_queries()
+    results = await asyncio.gather(*(_crawl_query(q[3]) for q in queries))
+
+    builder = _Builder()
+    failed = 0
+    for (mode, field, value, _), items in zip(queries, results):
+        if items is None:
+            failed += 1
+            _carry_over(builder, old, mode, field, value)
+            continue
+        for item in items:
+            rid = builder.add(tuple(item[f] for f in FIELDS))
+            builder.postings["mode"][mode].add(rid)
+            if field:
+                builder.postings[field][value].add(rid)
+
+    if failed == len(queries):
+        # site is down: keep the old index and its age, don't save an empty one
+        logger.warning("Crawl failed: all %d queries failed, keeping the previous index", failed)
+        return old
+
+    idx = builder.build()
+    _current = idx  # atomic swap: readers see either the old or the new index
+
+    d = {k: parser.fetch_stats[k] - stats_before[k] for k in stats_before}
+    logger.info(
+        "Crawl done: %d records, %d/%d queries failed, %.1fs; "
+        "%d requests (%d not modified), %.0f KB, %d parsed, %d parses skipped (~%.1fs saved)",
+        len(idx), failed, len(queries), time.perf_counter() - started,
+        d["requests"], d["not_modified"], d["bytes_downloaded"] / 1024,
+        d["parses"], d["parses_skipped"], d["parse_seconds_saved"]
+    )
+    await asyncio.to_thread(save, idx)
+
+    for cb in listeners:
+        task = asyncio.create_task(cb(old, idx))
+        _listener_tasks.add(task)
+        task.add_done_callback(_listener_tasks.discard)
+    return idx
+
+
+async def crawl_forever() -> None:
+    idx = _current
+    if idx is not None:
+        # a fresh index restored from disk doesn't need an immediate recrawl
+        age = time.time() - idx.built_at
+        await asyncio.sleep(max(0.0, config.CRAWL_INTERVAL - age))
+
+    while True:
+        try:
+            await crawl_once()
+        except Exception:
+            logger.exception("Crawl failed")
+        await asyncio.sleep(config.CRAWL_INTERVAL)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def start_crawler() -> None:
+    global _task
+    load()
+    _task = asyncio.create_task(crawl_forever())
+
+
+async def stop_crawler() -> None:
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
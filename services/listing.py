@@ -0,0 +1,237 @@
+# services/listing.py
+# Compact listing records. A parsed card is a slotted Listing instead of an
+# eight-key dict, with its location and area interned; bulk sets (cached
+# pages, result sets) live in a ListingTable: one column per field, prices
+# in a machine-int array, so range filters run over the column instead of
+# calling price_in_range item by item.
+import sys
+from array import array
+from dataclasses import dataclass, fields
+from itertools import compress
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from services import prices
+
+# price_value of a listing without a price ("Price on request")
+NO_PRICE = -1
+
+
+@dataclass(slots=True)
+class Listing:
+    title: str
+    link: str
+    price: str
+    price_value: Optional[int]
+    img: Optional[str]
+    location: str
+    area: Optional[str]
+    features: int = 0
+
+    def __post_init__(self):
+        # a few dozen distinct values across thousands of listings
+        self.location = sys.intern(self.location)
+        if self.area is not None:
+            self.area = sys.intern(self.area)
+
+    # read access like the dicts the handlers were written for
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+
+FIELDS = tuple(f.name for f in fields(Listing))
+
+
+# ---------- STRING TABLE ----------
+
+# location/area values and URL prefixes <-> small ints, shared by all tables
+# so merging them is a plain column concatenation; "" stands for "not set"
+_strings: List[str] = [""]
+_string_ids: Dict[str, int] = {"": 0}
+
+
+def _sid(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    sid = _string_ids.get(value)
+    if sid is None:
+        sid = _string_ids[value] = len(_strings)
+        _strings.append(sys.intern(value))
+    return sid
+
+
+def _split_url(url: Optional[str]) -> tuple:
+    """'https://site/unit/123-x' -> (id of 'https://site/unit/', '123-x')."""
+    if url is None:
+        return 0, None
+    head, sep, tail = url.rpartition("/")
+    return _sid(head + sep), tail
+
+
+def _join_url(prefix: int, tail: Optional[str]) -> Optional[str]:
+    return None if tail is None else _strings[prefix] + tail
+
+
+# ---------- COLUMNS ----------
+
+# columns holding string table ids
+_SID_COLUMNS = ("link_dirs", "img_dirs", "locations", "areas")
+
+
+class ListingTable:
+    """
+    Column store with the list protocol the handlers use: len, iteration,
+    indexing, slicing and extend. Rows come out as Listing objects, built on
+    access. Links and photo URLs keep only their last path segment per row;
+    the shared directory part sits in the string table.
+    """
+
+    __slots__ = (
+        "titles", "link_dirs", "links", "prices", "price_values", "price_buckets",
+        "img_dirs", "imgs", "locations", "areas", "features",
+    )
+
+    def __init__(self, items: Iterable = ()):
+        self.titles: List[str] = []
+        self.link_dirs = array("I")
+        self.links: List[str] = []
+        self.prices: List[str] = []
+        self.price_values = array("q")
+        # prices.bucket() of every price, one byte each
+        self.price_buckets = bytearray()
+        self.img_dirs = array("I")
+        self.imgs: List[Optional[str]] = []
+        self.locations = array("I")
+        self.areas = array("I")
+        self.features = array("Q")
+        self.extend(items)
+
+    def append(self, item: Union[Listing, Dict]) -> None:
+        price_value = item["price_value"]
+        link_dir, link = _split_url(item["link"])
+        img_dir, img = _split_url(item.get("img"))
+        self.titles.append(item["title"])
+        self.link_dirs.append(link_dir)
+        self.links.append(link)
+        self.prices.append(item["price"])
+        self.price_values.append(NO_PRICE if price_value is None else price_value)
+        self.price_buckets.append(prices.bucket(price_value))
+        self.img_dirs.append(img_dir)
+        self.imgs.append(img)
+        self.locations.append(_sid(item.get("location")))
+        self.areas.append(_sid(item.get("area")))
+        self.features.append(item.get("features") or 0)
+
+    def extend(self, items: Iterable) -> None:
+        if isinstance(items, ListingTable):
+            for name in ListingTable.__slots__:
+                getattr(self, name).extend(getattr(items, name))
+            return
+        for item in items:
+            self.append(item)
+
+    def row(self, i: int) -> Listing:
+        price_value = self.price_values[i]
+        return Listing(
+            self.titles[i],
+            _join_url(self.link_dirs[i], self.links[i]),
+            self.prices[i],
+            None if price_value == NO_PRICE else price_value,
+            _join_url(self.img_dirs[i], self.imgs[i]),
+            _strings[self.locations[i]],
+            _strings[self.areas[i]] or None,
+            self.features[i],
+        )
+
+    def take(self, ids: Iterable[int]) -> "ListingTable":
+        out = ListingTable()
+        ids = list(ids)
+        for name in ListingTable.__slots__:
+            col = getattr(self, name)
+            picked = [col[i] for i in ids]
+            if isinstance(col, (array, bytearray)):
+                getattr(out, name).extend(picked)
+            else:
+                setattr(out, name, picked)
+        return out
+
+    # string ids only mean something in this process: a pickled table
+    # (the startup snapshot) carries the strings themselves
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for cls in type(self).__mro__ for name in cls.__dict__.get("__slots__", ())}
+        local: Dict[int, int] = {}
+        for name in _SID_COLUMNS:
+            state[name] = array("I", [local.setdefault(sid, len(local)) for sid in state[name]])
+        state["strings"] = [_strings[sid] for sid in local]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        ids = [_sid(value) for value in state.pop("strings")]
+        for name in _SID_COLUMNS:
+            state[name] = array("I", [ids[i] for i in state[name]])
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def __iter__(self) -> Iterator[Listing]:
+        return (self.row(i) for i in range(len(self)))
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Listing, "ListingTable"]:
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self.row(key)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ListingTable, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {len(self)} listings>"
+
+    # ---------- FILTERS ----------
+
+    def price_ids(self, min_price: Optional[int] = None, max_price: Optional[int] = None) -> List[int]:
+        """Rows with a price inside [min_price, max_price]; unpriced rows never match."""
+        buckets = prices.bucket_range(min_price, max_price)
+        if buckets is not None:
+            # a price button: one pass over the bucket column, in C
+            hits = self.price_buckets.translate(prices.bucket_mask(*buckets))
+            return list(compress(range(len(hits)), hits))
+        lo = 0 if min_price is None else max(min_price, 0)
+        hi = sys.maxsize if max_price is None else max_price
+        return [i for i, p in enumerate(self.price_values) if lo <= p <= hi]
+
+    def select(
+        self,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        area: Optional[str] = None,
+        features: int = 0,
+    ) -> "ListingTable":
+        ids = self.price_ids(min_price, max_price)
+        if area:
+            sid = _string_ids.get(area)
+            if sid is None:
+                return ListingTable()
+            areas = self.areas
+            ids = [i for i in ids if areas[i] == sid]
+        if features:
+            feats = self.features
+            ids = [i for i in ids if feats[i] & features == features]
+        return self.take(ids)
+
+    def with_features(self, mask: int) -> "ListingTable":
+        """Rows whose feature bits include all of `mask` (priced or not)."""
+        return self.take(i for i, f in enumerate(self.features) if f & mask == mask)
@@ -0,0 +1,39 @@
+# services/markup.py
+# lxml helpers shared by the page parsers (listing cards in services.parser,
+# menu sections in services.sections). lxml is imported on first use, so
+# importing a parser doesn't load it.
+
+
+def has_class(name: str) -> str:
+    """XPath predicate: the element's class list has `name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class XPath:
+    """etree.XPath compiled on first call."""
+
+    __slots__ = ("expr", "_compiled")
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        self._compiled = None
+
+    def __call__(self, el):
+        if self._compiled is None:
+            from lxml import etree
+            self._compiled = etree.XPath(self.expr)
+        return self._compiled(el)
+
+
+def document(html: str):
+    from lxml import html as lxml_html
+    return lxml_html.document_fromstring(html)
+
+
+def text(el) -> str:
+    # BeautifulSoup's get_text(strip=True)
+    return "".join(s.strip() for s in el.itertext()) if el is not None else ""
+
+
+def first(found):
+    return found[0] if found else None
@@ -0,0 +1,248 @@
+# services/metrics.py
+# Prometheus metrics and per-update span tracing, without extra dependencies:
+# counters, gauges and histograms rendered in the text exposition format at
+# GET /metrics on the health server. Spans time a stage (upstream fetch,
+# parse, send, handler), feed its histogram and, inside an update, add it to
+# that update's trace, which is logged when the update is slow.
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# seconds; from a cache hit to a slow page fetch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        _registry.append(self)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, v in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {v}"
+
+
+class Gauge(_Metric):
+    """Set directly, or read at scrape time from `fn` (a number or {label tuple: number})."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable] = None):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.fn = fn
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        values = self.values
+        if self.fn is not None:
+            try:
+                got = self.fn()
+            except Exception:
+                logger.debug("Gauge %s failed", self.name, exc_info=True)
+                return
+            values = got if isinstance(got, dict) else {(): got}
+        for key, v in values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {float(v)}"
+
+
+class CallbackCounter(Gauge):
+    """Counter whose value lives elsewhere (e.g. parser.fetch_stats), read at scrape time."""
+
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count], sum
+        self.counts: Dict[Tuple[str, ...], List[int]] = {}
+        self.sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[labels] += value
+
+    def samples(self) -> Iterator[str]:
+        names = self.label_names + ("le",)
+        for key, counts in self.counts.items():
+            total = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                total += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(names, key + (le,))} {total}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {self.sums[key]}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {total}"
+
+
+_registry: List[_Metric] = []
+
+
+def render() -> str:
+    return "".join(m.render() for m in _registry)
+
+
+# ---------- METRICS ----------
+
+handler_seconds = Histogram("bot_handler_seconds", "Handler time per router", ("router",))
+update_seconds = Histogram("bot_update_seconds", "Whole update, middlewares included", ("type",))
+upstream_fetch_seconds = Histogram("bot_upstream_fetch_seconds", "One HTTP request to the site", ("outcome",))
+parse_seconds = Histogram("bot_parse_seconds", "Parsing one listing page")
+send_seconds = Histogram("bot_send_seconds", "Telegram API call incl. send-queue wait", ("method",))
+send_wait_seconds = Histogram("bot_send_wait_seconds", "Wait for a slot in the send queue", ("priority",))
+send_events = Counter("bot_send_events_total", "Send queue: sent, retried after RetryAfter, dropped before their turn", ("event",))
+search_seconds = Histogram("bot_search_seconds", "Streamed search: until the first result is shown and in total", ("until",))
+stage_seconds = Histogram("bot_stage_seconds", "Other traced stages", ("stage",))
+
+
+_caches: Dict[str, object] = {}
+_queues: Dict[str, Callable[[], float]] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Exports a TTLCache's stats() as bot_cache_* gauges labelled cache=name."""
+    _caches[name] = cache
+
+
+def register_queue(name: str, depth: Callable[[], float]) -> None:
+    _queues[name] = depth
+
+
+def _cache_stat(field: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(name, ): c.stats()[field] for name, c in _caches.items()}
+
+
+Gauge("bot_cache_hits", "Cache hits since start", ("cache",), fn=_cache_stat("hits"))
+Gauge("bot_cache_misses", "Cache misses since start", ("cache",), fn=_cache_stat("misses"))
+Gauge("bot_cache_hit_ratio", "Cache hit rate since start", ("cache",), fn=_cache_stat("hit_rate"))
+Gauge("bot_cache_size", "Entries in cache", ("cache",), fn=_cache_stat("size"))
+Gauge("bot_queue_depth", "Items waiting in internal queues", ("queue",),
+      fn=lambda: {(name,): depth() for name, depth in _queues.items()})
+
+
+# ---------- SPANS ----------
+
+# (trace id, [(stage, seconds), ...]) of the update being handled
+_trace: ContextVar[Optional[Tuple[str, List[Tuple[str, float]]]]] = ContextVar("metrics_trace", default=None)
+
+_HISTOGRAMS = {
+    "fetch": upstream_fetch_seconds,
+    "parse": parse_seconds,
+    "send": send_seconds,
+    "send_wait": send_wait_seconds,
+    "search": search_seconds,
+    "handler": handler_seconds,
+}
+
+
+def record(stage: str, seconds: float, *labels: str) -> None:
+    """Feeds the stage's histogram and the current trace."""
+    hist = _HISTOGRAMS.get(stage)
+    if hist is not None:
+        hist.observe(seconds, *labels)
+    else:
+        stage_seconds.observe(seconds, stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace[1].append((":".join((stage, *labels)), seconds))
+
+
+@contextmanager
+def span(stage: str, *labels: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, *labels)
+
+
+def sampled(log: logging.Logger, rate: Optional[float] = None) -> bool:
+    """For hot-path debug logs: True for about `rate` of calls, and only with DEBUG on."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return False
+    return random.random() < (config.LOG_SAMPLE_RATE if rate is None else rate)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: opens the update's trace, times the update and
+    logs the stage breakdown of updates slower than TRACE_SLOW seconds.
+    """
+
+    async def __call__(self, handler, event, data):
+        trace = (uuid.uuid4().hex[:8], [])
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            took = time.perf_counter() - started
+            _trace.reset(token)
+            update_seconds.observe(took, getattr(event, "event_type", "unknown"))
+            if took >= config.TRACE_SLOW:
+                stages = ", ".join(f"{name}={sec * 1000:.0f}ms" for name, sec in trace[1])
+                logger.info("Slow update %s: %.0fms [%s]", trace[0], took * 1000, stages)
+
+
+class HandlerTimer(BaseMiddleware):
+    """Inner middleware on one router's observers: handler latency labelled with the router."""
+
+    def __init__(self, router: str):
+        self.router = router
+
+    async def __call__(self, handler, event, data):
+        with span("handler", self.router):
+            return await handler(event, data)
@@ -1,14 +1,25 @@
 # services/parser.py
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlencode
+import asyncio
+import hashlib
+import re
 import time
-from typing import Dict, List, Optional
+import aiohttp
+from concurrent.futures import Executor
+from contextlib import aclosing, asynccontextmanager
+from urllib.parse import urlencode, urlsplit, parse_qsl, urlunsplit
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
 import logging
 
+import config
+from services import cluster, markup, metrics, prices, snapshot, upstream
+from services.cache import TTLCache
+from services.features import area_of, feature_mask, filter_features
+from services.listing import Listing, ListingTable
+from services.sender import TokenBucket
+
 logger = logging.getLogger(__name__)
 
-BASE = "https://enlightproperty.com"
+BASE = config.BASE_URL
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; PavelPattayaBot/1.0)"
@@ -28,32 +39,12 @@ PROPERTY_TYPE_MAP = {
 def parse_price(text: str) -> Optional[int]:
     """
     Converts price text like:
-    '฿1,250,000', 'From ฿950,000', '1.2M', 'Price on request'
-    into integer THB or None
+    '฿1,250,000', 'From ฿950,000', '1.2M', '฿25,000/month', '฿1.2M – ฿1.5M'
+    into integer THB (the low end of a range), or None for 'Price on request'
+    and prices per sqm. See services.prices.
     """
-    if not text:
-        return None
-
-    t = text.lower()
-
-    if "request" in t:
-        return None
-
-    t = (
-        t.replace("from", "")
-        .replace("฿", "")
-        .replace(",", "")
-        .strip()
-    )
-
-    if "m" in t:
-        try:
-            return int(float(t.replace("m", "")) * 1_000_000)
-        except ValueError:
-            return None
-
-    digits = "".join(c for c in t if c.isdigit())
-    return int(digits) if digits else None
+    price = prices.normalize(text)
+    return None if price is None else price.value
 
 
 def price_in_range(price: Optional[int], min_p: Optional[int], max_p: Optional[int]) -> bool:
@@ -92,13 +83,14 @@ def _build_search_url(filters: dict) -> str:
     query = urlencode(params, doseq=True)
     url = f"{BASE}{endpoint}?{query}"
 
-    logger.warning("BUILT URL: %s", url)
+    if metrics.sampled(logger):
+        logger.debug("Built search URL: %s", url)
     return url
 
 
 # ---------- PARSER ----------
 
-def _parse_listing_block(block) -> Optional[Dict]:
+def _parse_listing_block(block) -> Optional[Listing]:
     try:
         title_tag = block.select_one("h2.product-title a, .product-title a")
         title = title_tag.get_text(strip=True) if title_tag else ""
@@ -119,54 +111,571 @@ def _parse_listing_block(block) -> Optional[Dict]:
         loc_tag = block.select_one(".product-img-location")
         location = loc_tag.get_text(strip=True) if loc_tag else ""
 
-        return {
-            "title": title,
-            "link": link,
-            "price": price_text,
-            "price_value": price_value,
-            "img": img,
-            "location": location,
-        }
+        return Listing(
+            title=title,
+            link=link,
+            price=price_text,
+            price_value=price_value,
+            img=img,
+            location=location,
+            area=area_of(location, title),
+            features=feature_mask(title, block.get_text(" ", strip=True)),
+        )
     except Exception as e:
         logger.exception("Parse error")
         return None
 
 
-# ---------- MAIN ENTRY ----------
-
-def parse_properties(section: str, filters: Dict = None, pages: int = 1) -> List[Dict]:
-    filters = filters or {}
-    min_price = filters.get("min_price")
-    max_price = filters.get("max_price")
+def _parse_page_bs4(html: str) -> List[Listing]:
+    from bs4 import BeautifulSoup  # the fallback parser: loaded only if it is ever used
+    soup = BeautifulSoup(html, "lxml")
+    blocks = soup.select(".ltn__property-item, .product-item")
 
-    url = _build_search_url(filters)
     results = []
+    for b in blocks:
+        item = _parse_listing_block(b)
+        if item:
+            results.append(item)
 
-    for page in range(1, pages + 1):
-        page_url = url if page == 1 else f"{url}&page={page}"
+    return results
 
-        r = requests.get(page_url, headers=HEADERS, timeout=15)
-        if r.status_code != 200:
-            break
 
-        soup = BeautifulSoup(r.text, "lxml")
-        blocks = soup.select(".ltn__property-item, .product-item")
+# ---------- FAST PARSER (lxml) ----------
 
-        for b in blocks:
-            item = _parse_listing_block(b)
-            if not item:
-                continue
+# Same selectors as _parse_listing_block, compiled once. Like select_one,
+# each takes the first match in document order.
+_XP_BLOCKS = markup.XPath(f"//*[{markup.has_class('ltn__property-item')} or {markup.has_class('product-item')}]")
+_XP_TITLE = markup.XPath(f"(.//*[{markup.has_class('product-title')}]//a)[1]")
+_XP_PRICE = markup.XPath(f"(.//*[{markup.has_class('product-price')}])[1]")
+_XP_IMG = markup.XPath("(.//img)[1]/@src")
+_XP_LOCATION = markup.XPath(f"(.//*[{markup.has_class('product-img-location')}])[1]")
 
-            logger.warning(
-                "PRICE CHECK: raw=%r parsed=%r min=%r max=%r",
-                item["price"], item["price_value"], min_price, max_price
-            )
 
-            if not price_in_range(item["price_value"], min_price, max_price):
-                continue
+def _parse_listing_el(el) -> Listing:
+    title_tag = markup.first(_XP_TITLE(el))
+    title = markup.text(title_tag)
+
+    link = (title_tag.get("href") or "") if title_tag is not None else ""
+    if link.startswith("/"):
+        link = BASE + link
+
+    price_text = markup.text(markup.first(_XP_PRICE(el)))
+
+    img = markup.first(_XP_IMG(el))
+    img = str(img) if img is not None else None
+    if img and img.startswith("/"):
+        img = BASE + img
+
+    location = markup.text(markup.first(_XP_LOCATION(el)))
+    card_text = " ".join(t for t in (s.strip() for s in el.itertext()) if t)
+
+    return Listing(
+        title=title,
+        link=link,
+        price=price_text,
+        price_value=parse_price(price_text),
+        img=img,
+        location=location,
+        area=area_of(location, title),
+        features=feature_mask(title, card_text),
+    )
+
+
+def _parse_page_lxml(html: str) -> List[Listing]:
+    doc = markup.document(html)
+    return [_parse_listing_el(el) for el in _XP_BLOCKS(doc)]
+
+
+def _parse_page(html: str) -> List[Listing]:
+    if config.PARSER_BACKEND == "bs4":
+        return _parse_page_bs4(html)
+    try:
+        return _parse_page_lxml(html)
+    except Exception:
+        logger.exception("lxml fast path failed, falling back to BeautifulSoup")
+        return _parse_page_bs4(html)
+
+
+# None -> asyncio's default thread pool
+_parse_pool: Optional[Executor] = None
+
+
+async def parse_page_async(html: str) -> List[Listing]:
+    """Parses off the event loop: threads by default, processes with PARSE_PROCESSES > 0."""
+    global _parse_pool
+    if _parse_pool is None and config.PARSE_PROCESSES > 0:
+        from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing
+        _parse_pool = ProcessPoolExecutor(max_workers=config.PARSE_PROCESSES)
+    return await asyncio.get_running_loop().run_in_executor(_parse_pool, _parse_page, html)
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def _filter_items(items: ListingTable, filters: Dict) -> ListingTable:
+    """Price range and area over the table's columns; features need filter_features (may be async)."""
+    matched = items.select(filters.get("min_price"), filters.get("max_price"), filters.get("location"))
+    if metrics.sampled(logger):
+        logger.debug(
+            "Price filter: %d/%d kept, min=%r max=%r, sample %r -> %r",
+            len(matched), len(items), filters.get("min_price"), filters.get("max_price"),
+            items.prices[0] if len(items) else None, items.price_values[0] if len(items) else None,
+        )
+    return matched
+
+
+# ---------- HTTP SESSION ----------
+
+# One pooled keep-alive session per event loop; the semaphore caps how many
+# pages we pull from enlightproperty.com at the same time and the token
+# bucket how many we start per second. Crawler fetches first pass a smaller
+# semaphore and a slower bucket of their own, so the crawl holds at most
+# CRAWL_CONCURRENCY of the slots and a live search never queues behind it.
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_crawl_semaphore: Optional[asyncio.Semaphore] = None
+_rate = TokenBucket(config.SCRAPER_RATE, config.SCRAPER_BURST)
+_crawl_rate = TokenBucket(config.CRAWL_RATE, 1)
+
+
+async def _polite(bucket: TokenBucket) -> None:
+    # take the token now even if it isn't there yet: callers queue up in order
+    now = time.monotonic()
+    wait = bucket.delay(now)
+    bucket.take(now)
+    if wait:
+        await asyncio.sleep(wait)
+
+
+@asynccontextmanager
+async def _slot(background: bool) -> AsyncIterator[None]:
+    """A connection slot and a rate token; `background` (the crawler) queues for its own first."""
+    if background:
+        async with _crawl_semaphore:
+            await _polite(_crawl_rate)
+            async with _semaphore:
+                await _polite(_rate)
+                yield
+    else:
+        async with _semaphore:
+            await _polite(_rate)
+            yield
+
+
+async def get_session() -> aiohttp.ClientSession:
+    global _session, _session_loop, _semaphore, _crawl_semaphore
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=config.SCRAPER_CONCURRENCY,
+            keepalive_timeout=30,
+        )
+        _session = aiohttp.ClientSession(
+            headers=HEADERS,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=config.SCRAPER_TIMEOUT),
+        )
+        _session_loop = loop
+        _semaphore = asyncio.Semaphore(config.SCRAPER_CONCURRENCY)
+        _crawl_semaphore = asyncio.Semaphore(config.CRAWL_CONCURRENCY)
+
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed and _session_loop is asyncio.get_running_loop():
+        await _session.close()
+    _session = None
+
+
+class _ServerError(Exception):
+    pass
+
+
+_OUTCOMES = {200: "ok", 304: "not_modified", 404: "not_found"}
+
+
+async def _get(
+    url: str, headers: Optional[Dict] = None, background: bool = False
+) -> Optional[Tuple[int, str, Mapping[str, str]]]:
+    """
+    (status, body, response headers), or None if the site failed: network
+    error, timeout or 5xx after the retries, open circuit or spent deadline.
+    `background` fetches (the crawler) go through the crawl limiter too.
+    """
+    admitted = upstream.breaker.allow()
+    if not admitted:
+        fetch_stats["short_circuited"] += 1
+        return None
+    probe = admitted == upstream.PROBE
+
+    session = await get_session()
+    try:
+        for attempt in range(config.UPSTREAM_RETRIES + 1):
+            async with _slot(background):
+                timeout = upstream.attempt_timeout()
+                if timeout is None:
+                    fetch_stats["deadline_exceeded"] += 1
+                    return None
+                started = time.perf_counter()
+                try:
+                    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                        if r.status >= 500 or r.status == 429:
+                            raise _ServerError(r.status)
+                        body = await r.read()
+                        fetch_stats["requests"] += 1
+                        fetch_stats["bytes_downloaded"] += len(body)
+                        upstream.breaker.success()
+                        metrics.record("fetch", time.perf_counter() - started, _OUTCOMES.get(r.status, "http_other"))
+                        text = body.decode(r.get_encoding(), errors="replace") if r.status == 200 else ""
+                        return r.status, text, r.headers
+                except (aiohttp.ClientError, asyncio.TimeoutError, _ServerError) as e:
+                    metrics.record("fetch", time.perf_counter() - started, "error")
+                    fetch_stats["failures"] += 1
+                    upstream.breaker.failure()
+                    logger.warning("Fetch failed (attempt %d): %s: %r", attempt + 1, url, e)
+
+            if attempt == config.UPSTREAM_RETRIES:
+                break
+            admitted = upstream.breaker.allow()
+            probe = probe or admitted == upstream.PROBE
+            if not admitted:
+                break
+            delay = upstream.backoff(attempt)
+            left = upstream.remaining()
+            if left is not None and left < delay + config.UPSTREAM_MIN_ATTEMPT:
+                break
+            fetch_stats["retries"] += 1
+            await asyncio.sleep(delay)
+        return None
+    finally:
+        # our probe ended without a verdict (deadline, cancel): free the slot.
+        # Requests let through while the breaker was closed never held it.
+        if probe:
+            upstream.breaker.release()
+
+
+async def fetch_page(url: str, raise_missing: bool = False) -> Optional[str]:
+    """The page's HTML; None if the site failed. With `raise_missing` a 404 raises PageNotFound."""
+    got = await _get(url)
+    if raise_missing and got is not None and got[0] == 404:
+        raise upstream.PageNotFound(url)
+    if got is None or got[0] != 200:
+        return None
+    return got[1]
+
+
+# ---------- CONDITIONAL FETCH ----------
+
+# also exported as bot_upstream_<key> counters
+fetch_stats = {
+    "requests": 0,
+    "failures": 0,
+    "retries": 0,
+    "short_circuited": 0,    # refused by the open circuit
+    "deadline_exceeded": 0,
+    "stale_served": 0,
+    "bytes_downloaded": 0,
+    "not_modified": 0,       # 304 answers
+    "parses": 0,
+    "parses_skipped": 0,     # 304 or same listing-region hash
+    "parse_seconds": 0.0,
+    "parse_seconds_saved": 0.0,
+}
+
+
+for _key in fetch_stats:
+    metrics.CallbackCounter(
+        f"bot_upstream_{_key}_total", f"parser.fetch_stats[{_key!r}]", fn=lambda k=_key: fetch_stats[k]
+    )
+metrics.Gauge(
+    "bot_upstream_circuit_open", "1 while the circuit breaker refuses requests",
+    fn=lambda: float(upstream.breaker.is_open)
+)
+
+
+class _PageState:
+    __slots__ = ("etag", "last_modified", "digest", "items", "pages")
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], digest: str, items: ListingTable, pages: int):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.items = items
+        self.pages = pages
+
+
+# page URL -> validators, listing-region hash, the parsed items and the page count
+_page_states = TTLCache(maxsize=config.PAGE_STATE_SIZE, ttl=24 * 3600)
+
+_REGION_START = ("ltn__property-item", "product-item")
+
+
+def listing_region_digest(html: str) -> str:
+    """
+    Hash of the part of the page that holds the listings: from the first
+    listing block up to the footer. Tokens, counters and menus in the head
+    and nav change on every request and must not count as a change.
+    """
+    starts = [i for i in (html.find(m) for m in _REGION_START) if i >= 0]
+    start = min(starts) if starts else 0
+    end = html.find("<footer", start)
+    region = html[start:end if end >= 0 else len(html)]
+    return hashlib.blake2b(region.encode("utf-8", "replace"), digest_size=16).hexdigest()
+
+
+# pagination links: ...&page=7 (or &amp;page=7 in raw HTML)
+_PAGE_LINK_RE = re.compile(r"[?&](?:amp;)?page=(\d+)\b")
+
+
+def page_count_of(html: str) -> int:
+    """Highest page number linked from the page (1 without pagination)."""
+    return max((int(n) for n in _PAGE_LINK_RE.findall(html)), default=1)
 
-            results.append(item)
 
-        time.sleep(0.3)
+def known_pages(url: str) -> int:
+    """Page count seen on the last fetch of this page URL."""
+    state = _page_states.get(url)
+    return state.pages if state is not None else 1
 
+
+def _avg_parse_seconds() -> float:
+    return fetch_stats["parse_seconds"] / fetch_stats["parses"] if fetch_stats["parses"] else 0.0
+
+
+async def fetch_parsed(url: str, background: bool = False, raise_missing: bool = False) -> Optional[ListingTable]:
+    """
+    GET with If-None-Match/If-Modified-Since; a 304 or an unchanged listing
+    region reuses the items parsed last time instead of parsing again.
+    With `raise_missing` a 404 raises PageNotFound instead of returning None.
+    """
+    state: Optional[_PageState] = _page_states.get(url)
+    headers = {}
+    if state is not None:
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+    got = await _get(url, headers, background)
+    if got is None:
+        return None
+    status, html, resp_headers = got
+
+    if status == 304 and state is not None:
+        fetch_stats["not_modified"] += 1
+        fetch_stats["parses_skipped"] += 1
+        fetch_stats["parse_seconds_saved"] += _avg_parse_seconds()
+        _page_states.set(url, state)  # refresh TTL
+        return state.items
+    if status == 404 and raise_missing:
+        raise upstream.PageNotFound(url)
+    if status != 200:
+        return None
+
+    digest = listing_region_digest(html)
+    if state is not None and state.digest == digest:
+        fetch_stats["parses_skipped"] += 1
+        fetch_stats["parse_seconds_saved"] += _avg_parse_seconds()
+        items = state.items
+    else:
+        t = time.perf_counter()
+        items = ListingTable(await parse_page_async(html))
+        took = time.perf_counter() - t
+        fetch_stats["parses"] += 1
+        fetch_stats["parse_seconds"] += took
+        metrics.record("parse", took)
+
+    _page_states.set(url, _PageState(
+        resp_headers.get("ETag"), resp_headers.get("Last-Modified"), digest, items, page_count_of(html)
+    ))
+    return items
+
+
+# ---------- RESULT CACHE ----------
+
+# Parsed pages before price filtering (min/max price are not part of the URL).
+result_cache = TTLCache(maxsize=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL)
+
+
+def canonical_url(url: str) -> str:
+    """Same search -> same string, whatever order the params were added in."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+
+
+# Last good copy of every page, kept long after result_cache drops it: what
+# we show when the site is down or too slow for the deadline.
+stale_cache = TTLCache(maxsize=config.RESULT_CACHE_SIZE * 4, ttl=config.STALE_TTL)
+
+metrics.register_cache("page_state", _page_states)
+metrics.register_cache("result", result_cache)
+metrics.register_cache("stale", stale_cache)
+snapshot.register_cache("result", result_cache)
+snapshot.register_cache("stale", stale_cache)
+snapshot.register_cache("page_state", _page_states)
+
+
+def page_url(url: str, page: int) -> str:
+    return url if page == 1 else f"{url}&page={page}"
+
+
+@cluster.shared
+async def fetch_listings(url: str, page: int = 1) -> Optional[upstream.Listings]:
+    key = (canonical_url(url), page)
+
+    async def load() -> Optional[upstream.Listings]:
+        items = await fetch_parsed(page_url(url, page))
+        if items is None:
+            return None
+        fresh = upstream.Listings(items, pages=known_pages(page_url(url, page)))
+        stale_cache.set(key, fresh)
+        return fresh
+
+    # the fetch runs outside our budget (the per-request timeouts still
+    # apply) and is shielded: if the budget runs out it still finishes and
+    # fills the caches for the next search
+    fetch = asyncio.create_task(result_cache.get_or_fetch(key, load), context=upstream.unbudgeted())
+    fetch.add_done_callback(lambda f: f.cancelled() or f.exception())  # nobody may be left to await it
+    try:
+        items = await asyncio.wait_for(asyncio.shield(fetch), upstream.remaining())
+    except asyncio.TimeoutError:
+        fetch_stats["deadline_exceeded"] += 1
+        items = None
+    if items is not None:
+        return items
+
+    old = stale_cache.get(key)
+    if old is None:
+        return None
+    fetch_stats["stale_served"] += 1
+    return upstream.Listings(old, old.fetched_at, stale=True, pages=old.pages)
+
+
+async def fetch_fresh(url: str, page: int = 1) -> Optional[ListingTable]:
+    """Straight from the site, no result or stale cache, behind the crawl limiter (for the crawler)."""
+    return await fetch_parsed(page_url(url, page), background=True)
+
+
+# ---------- MULTI-PAGE ----------
+
+def _pages_of(items: Optional[ListingTable], url: str) -> int:
+    # a Listings page carries its own count: it may have been fetched by
+    # another process (see services.cluster)
+    return getattr(items, "pages", 0) or known_pages(url)
+
+
+async def stream_pages(
+    url: str,
+    max_pages: int,
+    fetch: Callable[[str, int], Awaitable[Optional[ListingTable]]] = fetch_listings,
+) -> AsyncIterator[Optional[ListingTable]]:
+    """
+    Yields the items of every result page in page order. Page 1 tells how
+    many pages there are; the rest are fetched in parallel, at most
+    PREFETCH_PAGES ahead of the consumer (the session's concurrency and
+    rate caps keep it polite), and yielded as soon as their turn comes. If the last page links further than we knew (windowed
+    pagination), the next batch is scheduled. A failed page is yielded as
+    None and ends the stream.
+    """
+    first = await fetch(url, 1)
+    yield first
+    if first is None:
+        return
+
+    known = min(_pages_of(first, url), max_pages)
+    tasks: Dict[int, asyncio.Task] = {}
+    try:
+        page = 2
+        while page <= known:
+            for p in range(page, min(known, page + max(config.PREFETCH_PAGES, 1) - 1) + 1):
+                if p not in tasks:
+                    tasks[p] = asyncio.create_task(fetch(url, p))
+            items = await tasks.pop(page)
+            yield items
+            if items is None:
+                return
+            known = max(known, min(_pages_of(items, page_url(url, page)), max_pages))
+            page += 1
+    finally:
+        # the consumer stopped early or a page failed: drop the rest
+        for t in tasks.values():
+            t.cancel()
+
+
+# ---------- MAIN ENTRY ----------
+
+async def iter_properties(section: str, filters: Dict = None, pages: Optional[int] = None) -> AsyncIterator[upstream.Listings]:
+    """
+    Filtered listings page by page, as they arrive. `pages` caps how many
+    result pages are read (default SEARCH_MAX_PAGES). Raises
+    UpstreamUnavailable when the site fails and no earlier copy of the
+    first page is cached.
+    """
+    filters = filters or {}
+    url = _build_search_url(filters)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce() -> None:
+        try:
+            async with aclosing(stream_pages(url, pages or config.SEARCH_MAX_PAGES)) as pages_iter:
+                async for items in pages_iter:
+                    # same as before: the first failed page ends the listing
+                    if items is None:
+                        break
+                    await queue.put(items)
+        finally:
+            queue.put_nowait(done)
+
+    # the whole search shares one budget; the producer and the page tasks
+    # it starts inherit it from the context
+    with upstream.deadline(config.UPSTREAM_DEADLINE):
+        producer = asyncio.create_task(produce())
+    try:
+        first = True
+        while True:
+            items = await queue.get()
+            if items is done:
+                await producer  # surface its errors
+                if first:
+                    raise upstream.UpstreamUnavailable(url)
+                return
+            first = False
+            matched = await filter_features(_filter_items(items, filters), filters.get("features"))
+            yield upstream.Listings(matched, items.fetched_at, items.stale)
+    finally:
+        producer.cancel()
+
+
+async def parse_properties_async(section: str, filters: Dict = None, pages: Optional[int] = None) -> upstream.Listings:
+    """All of iter_properties in one list; raises UpstreamUnavailable like it."""
+    results = upstream.Listings()
+    async for chunk in iter_properties(section, filters, pages):
+        results.extend(chunk)
+        results.fetched_at = min(results.fetched_at, chunk.fetched_at)
+        results.stale = results.stale or chunk.stale
     return results
+
+
+def parse_properties(section: str, filters: Dict = None, pages: Optional[int] = None) -> upstream.Listings:
+    """
+    Blocking wrapper around parse_properties_async for scripts and old callers.
+    Must not be called from a running event loop (use the async version there).
+    """
+    async def _run() -> upstream.Listings:
+        try:
+            return await parse_properties_async(section, filters, pages)
+        finally:
+            await close_session()
+
+    return asyncio.run(_run())
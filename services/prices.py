@@ -0,0 +1,212 @@
+# services/prices.py
+# Price text -> THB. The card's price slot holds sale prices ("฿1,250,000",
+# "1.2M"), rents ("฿25,000/month"), ranges ("฿1.2M – ฿1.5M") and now and then
+# a foreign currency or a price per sqm, so the text is read with a few
+# compiled patterns instead of string replaces.
+#
+# Every price also gets a bucket: the price buttons' bounds cut the number
+# line into intervals, and a price sitting exactly on a bound gets a bucket
+# of its own. The buttons' ranges (bounds included) are then contiguous
+# bucket ranges, and a price filter is a lookup on the bucket instead of a
+# comparison per listing.
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+from keyboards.filters_kb import BUY_PRICE_BUTTONS, RENT_PRICE_BUTTONS
+
+# rough rates: they only decide which price button a listing falls under
+THB_PER = {"THB": 1.0, "USD": 36.0, "EUR": 39.0, "GBP": 46.0, "RUB": 0.4, "CNY": 5.0}
+
+_CURRENCIES = {
+    "฿": "THB", "thb": "THB", "baht": "THB", "บาท": "THB",
+    "$": "USD", "usd": "USD", "us$": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "₽": "RUB", "rub": "RUB",
+    "¥": "CNY", "cny": "CNY", "rmb": "CNY",
+}
+_MULTIPLIERS = {
+    "k": 1_000, "พัน": 1_000,
+    "m": 1_000_000, "mn": 1_000_000, "mil": 1_000_000, "million": 1_000_000, "ล้าน": 1_000_000,
+    "b": 1_000_000_000, "bn": 1_000_000_000,
+}
+# rents per day/week/year are compared as per month, like the rent buttons
+_TO_MONTH = {"day": 30.0, "week": 52 / 12, "year": 1 / 12}
+
+_CUR = "|".join(re.escape(c) for c in sorted(_CURRENCIES, key=len, reverse=True))
+_MULT = "|".join(sorted(_MULTIPLIERS, key=len, reverse=True))
+# "1,250,000", "1 250 000", "1.250.000", "1,250,000.50", "1.2", "1,5"
+_NUMBER = r"\d{1,3}(?:(?P<sep>[,. \u00a0])\d{3})(?:(?P=sep)\d{3})*(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+
+_AMOUNT = re.compile(
+    # a suffix is only a suffix if no letter follows: "m" in "/month", "b" in "baht"
+    rf"(?P<pre>{_CUR})?\s*(?P<num>{_NUMBER})\s*(?:(?P<mult>{_MULT})(?![a-z0-9²]))?\s*(?P<post>{_CUR})?",
+    re.IGNORECASE,
+)
+_RANGE_SEP = re.compile(r"\s*(?:-|–|—|~|to|ถึง)\s*", re.IGNORECASE)
+_UNIT = re.compile(
+    r"(?:/|\bper\b|\ba\b)\s*(?:(?P<month>month|mo|mth)|(?P<day>day|night)|(?P<week>week|wk)|(?P<year>year|yr|annum)"
+    r"|(?P<sqm>sq\.?\s*m|sqm|m2|m²|square\s+met(?:er|re)))"
+    r"|(?P<month2>\bmonthly\b|\bpcm\b|เดือน)|(?P<day2>\bdaily\b|\bnightly\b|คืน|วัน)",
+    re.IGNORECASE,
+)
+# a bare "sqm" is the unit only right after the amount: in "฿3,500,000 · 35 m²" it is the area's
+_SQM_AFTER = re.compile(r"\s*(?:ตร\.?\s*ม|sqm\b|m2\b|m²)", re.IGNORECASE)
+# "no price" phrases; the digits next to them (a phone number) aren't a
+# price unless a currency or a suffix says so
+_NO_PRICE = re.compile(
+    r"\b(?:price\s+on\s+request|on\s+request|contact\s+(?:us|agent|owner)|call|tba)\b|สอบถาม", re.IGNORECASE
+)
+# where a price's own text ends: "฿12,000,000 (฿95,000/sqm)" is a total
+_CLAUSE_END = re.compile(r"[(\[{;|,\n]")
+_TAIL_END = re.compile(r"[(\[{;|,\n]|\d")
+# amounts under this many THB with no multiplier are counts ("2 bed", "35 sqm"), not prices
+_MIN_THB = 100
+
+
+class Price(NamedTuple):
+    low: int  # THB, per `unit`
+    high: Optional[int]  # the top of a range
+    unit: str  # "total", "month" or "sqm"
+    currency: str  # as written
+
+    @property
+    def value(self) -> Optional[int]:
+        """What price filters compare: the low end; None for a price per sqm."""
+        return None if self.unit == "sqm" else self.low
+
+
+def _number(text: str, has_mult: bool) -> float:
+    text = text.replace(" ", "").replace("\u00a0", "")
+    marks = [c for c in text if c in ",."]
+    if not marks:
+        return float(text)
+    if len(set(marks)) == 2:
+        # "1,250,000.50", "1.250.000,50": the last mark is the decimal point
+        head, _, tail = text.rpartition(text[max(text.rfind(","), text.rfind("."))])
+        return float(head.replace(",", "").replace(".", "") + "." + tail)
+    if len(marks) == 1 and (has_mult or len(text) - text.index(marks[0]) - 1 != 3):
+        # "1.2M", "1,5"
+        return float(text.replace(",", "."))
+    # "25,000", "1.250.000"
+    return float(text.replace(marks[0], ""))
+
+
+def _unit(text: str, start: int, end: int) -> str:
+    """The unit written right after the amount at text[start:end], or before it in the same clause."""
+    if _SQM_AFTER.match(text, end):
+        return "sqm"
+    tail = text[end:]
+    # the clause ends at a bracket or comma, and at the next number: a unit past it is that number's
+    cut = _TAIL_END.search(tail)
+    m = _UNIT.search(tail, 0, cut.start() if cut else len(tail))
+    if m is None:
+        head = text[:start]
+        cuts = [c.end() for c in _CLAUSE_END.finditer(head)]
+        m = _UNIT.search(head, cuts[-1] if cuts else 0)
+    if m is None:
+        return "total"
+    return next(name.rstrip("2") for name, hit in m.groupdict().items() if hit)
+
+
+def _is_count(m: re.Match) -> bool:
+    """"2 bed", "35 sqm", "฿1.5": too small for a price, and no multiplier says otherwise."""
+    cur = m["pre"] or m["post"] or "฿"
+    return not m["mult"] and _number(m["num"], False) * THB_PER[_CURRENCIES[cur.lower()]] < _MIN_THB
+
+
+def _ranged(text: str, a: re.Match, b: re.Match) -> bool:
+    """`b` is the top of a range starting at `a`: "฿1.2M – ฿1.5M", "1.2 - 1.5M", "12,000 - 15,000"."""
+    if not _RANGE_SEP.fullmatch(text, a.end(), b.start()):
+        return False
+    if b["pre"] or b["post"] or b["mult"]:
+        return True
+    # "฿3,500,000 – 2 bed": a bare number of another magnitude is something else
+    x, y = _number(a["num"], bool(a["mult"])), _number(b["num"], False)
+    return x / 10 <= y <= x * 10
+
+
+@lru_cache(maxsize=8192)
+def normalize(text: Optional[str]) -> Optional[Price]:
+    """The price in `text` in THB, or None if there isn't one."""
+    if not text:
+        return None
+    amounts = list(_AMOUNT.finditer(text))
+    if _NO_PRICE.search(text):
+        amounts = [m for m in amounts if m["pre"] or m["post"] or m["mult"]]
+    amounts = [
+        m for i, m in enumerate(amounts)
+        if not _is_count(m)
+        # "1.2 - 1.5M": the multiplier is written once, on the top of the range
+        or (i + 1 < len(amounts) and amounts[i + 1]["mult"] and _ranged(text, m, amounts[i + 1]))
+    ]
+    if not amounts:
+        return None
+
+    first, second = amounts[0], None
+    if len(amounts) > 1 and _ranged(text, first, amounts[1]):
+        second = amounts[1]
+
+    def read(m: re.Match, other: Optional[re.Match]) -> Tuple[float, str]:
+        # "1.2 – 1.5M", "฿1.2M – 1.5M": what is written once goes for both ends
+        mult = m["mult"] or (other["mult"] if other is not None else None)
+        cur = m["pre"] or m["post"] or (other is not None and (other["pre"] or other["post"])) or "฿"
+        amount = _number(m["num"], bool(mult)) * _MULTIPLIERS[mult.lower()] if mult else _number(m["num"], False)
+        return amount, _CURRENCIES[cur.lower()]
+
+    low, currency = read(first, second)
+    high = read(second, first)[0] if second is not None else None
+    if high is not None and high < low:
+        low, high = high, low
+
+    unit = _unit(text, first.start(), (second or first).end())
+    rate = THB_PER[currency]
+    if unit in _TO_MONTH:
+        rate *= _TO_MONTH[unit]
+        unit = "month"
+    return Price(round(low * rate), None if high is None else round(high * rate), unit, currency)
+
+
+# ---------- BUCKETS ----------
+
+def _bounds(*buttons) -> Tuple[int, ...]:
+    out = set()
+    for rows in buttons:
+        for _, value in rows:
+            lo, _, hi = value.partition("-")
+            out.update(int(v) for v in (lo, hi) if v)
+    return tuple(sorted(out))
+
+
+BOUNDS = _bounds(BUY_PRICE_BUTTONS, RENT_PRICE_BUTTONS)
+NO_BUCKET = 0  # no price (or a negative one)
+TOP_BUCKET = 2 * len(BOUNDS)
+
+
+def bucket(price: Optional[int]) -> int:
+    """Odd: exactly on BOUNDS[k] (2k+1); even: between two bounds, or past the last one."""
+    if price is None or price < 0:
+        return NO_BUCKET
+    r = bisect_right(BOUNDS, price)
+    return 2 * r - 1 if r and BOUNDS[r - 1] == price else 2 * r
+
+
+def bucket_range(min_price: Optional[int], max_price: Optional[int]) -> Optional[Tuple[int, int]]:
+    """
+    Buckets [first, last] holding exactly the prices in [min_price,
+    max_price]; None if a bound isn't one of BOUNDS (a bucket lookup would
+    be approximate). Unpriced listings are never inside.
+    """
+    lo = 1 if min_price is None or min_price <= 0 else bucket(min_price)
+    hi = TOP_BUCKET if max_price is None else bucket(max_price)
+    if lo % 2 == 0 or (hi % 2 == 0 and max_price is not None):
+        return None
+    return lo, hi
+
+
+@lru_cache(maxsize=None)
+def bucket_mask(first: int, last: int) -> bytes:
+    """bytes.translate table: 1 for buckets in [first, last], 0 for the rest."""
+    return bytes(1 if first <= b <= last else 0 for b in range(256))
@@ -0,0 +1,80 @@
+# services/ranking.py
+# Sorted results. With a sort picked in the filters only the best
+# RESULTS_TOP_K listings are kept and paged through: heapq.nsmallest over
+# listing ids picks them without building (or sorting) the full result list.
+#
+# The site shows no listing dates, so "newest" goes by the unit number in
+# the link: units are numbered as they are listed. "Price per bedroom"
+# takes the bedroom count from the search filter, the index, or the title
+# ("2 Bedroom ...", "Studio"); a studio counts as one bedroom.
+import heapq
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import config
+from services.listing import NO_PRICE, ListingTable
+from services.upstream import Listings
+
+SORTS = ("price_asc", "price_desc", "price_per_bed", "newest")
+TOP_K = config.RESULTS_TOP_K
+
+_BEDROOMS = re.compile(r"\b(\d{1,2})\s*(?:-\s*)?(?:bed(?:room)?s?|br|спал)|\b(studio|студия)\b", re.IGNORECASE)
+_UNIT_NUMBER = re.compile(r"^(\d+)")
+
+
+def bedrooms_of(title: str) -> Optional[int]:
+    m = _BEDROOMS.search(title or "")
+    if m is None:
+        return None
+    return 0 if m[2] else int(m[1])
+
+
+def unit_number(link: Optional[str]) -> int:
+    """'https://site/public/unit/1234-sea-view' -> 1234; 0 if the link has none."""
+    m = _UNIT_NUMBER.match((link or "").rpartition("/")[2])
+    return int(m[1]) if m else 0
+
+
+def rank(sort: str, price: Optional[int], title: str, link: Optional[str], bedrooms: Optional[int] = None) -> Tuple:
+    """Sort key of one listing, smaller first. Unpriced listings go last."""
+    if sort == "newest":
+        return (-unit_number(link),)
+    if price is None:
+        return (2, 0)
+    if sort == "price_desc":
+        return (0, -price)
+    if sort == "price_per_bed":
+        if bedrooms is None:
+            bedrooms = bedrooms_of(title)
+        # without a bedroom count there is nothing to divide by
+        return (1, price) if bedrooms is None else (0, price / max(bedrooms, 1))
+    return (0, price)
+
+
+def filter_bedrooms(filters: Dict) -> Optional[int]:
+    """The bedroom count every result has, if the filters pin it ("3" is 3+: taken as 3)."""
+    value = filters.get("bedrooms")
+    return int(value) if value is not None and str(value).isdigit() else None
+
+
+def top(items: Union[ListingTable, List], sort: str, k: int = TOP_K, bedrooms: Optional[int] = None):
+    """The k best of `items` in `sort` order; ties keep the site's order."""
+    if not isinstance(items, ListingTable):
+        return heapq.nsmallest(
+            k, items, key=lambda i: rank(sort, i.get("price_value"), i.get("title") or "", i.get("link"), bedrooms)
+        )
+    # straight from the columns: rows are only built for the k picked
+    values, titles, links = items.price_values, items.titles, items.links
+    ids = heapq.nsmallest(k, range(len(items)), key=lambda i: rank(
+        sort, None if values[i] == NO_PRICE else values[i], titles[i], links[i], bedrooms
+    ))
+    out = items.take(ids)
+    if isinstance(items, Listings):
+        total = items.total or len(items)
+        out = Listings(out, items.fetched_at, items.stale, items.pages, total=total if total > len(out) else 0)
+    return out
+
+
+def top_ids(ids: Iterable[int], key: Callable[[int], Tuple], k: int = TOP_K) -> List[int]:
+    """top() for id sets (the index): ties go by id, which is crawl order."""
+    return heapq.nsmallest(k, ids, key=lambda i: (key(i), i))
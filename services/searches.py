@@ -0,0 +1,65 @@
+# services/searches.py
+# One search per chat at a time. A repeated tap on "🔎 Показать результаты"
+# with the same filters joins the run already in flight; a search with other
+# filters (or a filter change) cancels the stale run. Cancelling the task
+# also cancels the sends it has waiting in the send scheduler's queue.
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Tuple
+
+from services import metrics
+from services.subscriptions import SAVED_KEYS
+
+logger = logging.getLogger(__name__)
+
+
+def search_key(filters: Dict) -> str:
+    """Same filters -> same key, whatever else is in the FSM data."""
+    # the sort isn't saved with a subscription, but it changes the answer
+    return json.dumps({k: filters.get(k) for k in SAVED_KEYS + ("sort",)}, sort_keys=True, ensure_ascii=False)
+
+
+class SearchCoordinator:
+    def __init__(self):
+        # chat_id -> (search key, task)
+        self._runs: Dict[int, Tuple[str, asyncio.Task]] = {}
+        self.started = 0
+        self.joined = 0
+        self.cancelled = 0
+
+    def start(self, chat_id: int, key: str, run: Callable[[], Awaitable]) -> Tuple[asyncio.Task, bool]:
+        """(task, joined): the running task for this key, or a new one for run()."""
+        current = self._runs.get(chat_id)
+        if current is not None and not current[1].done():
+            if current[0] == key:
+                self.joined += 1
+                return current[1], True
+            self.cancel(chat_id)
+
+        task = asyncio.create_task(run())
+        self._runs[chat_id] = (key, task)
+        self.started += 1
+
+        def forget(t: asyncio.Task) -> None:
+            if self._runs.get(chat_id, (None, None))[1] is t:
+                del self._runs[chat_id]
+
+        task.add_done_callback(forget)
+        return task, False
+
+    def cancel(self, chat_id: int) -> bool:
+        current = self._runs.pop(chat_id, None)
+        if current is None or current[1].done():
+            return False
+        current[1].cancel()
+        self.cancelled += 1
+        logger.info("Search for chat %s cancelled: filters changed", chat_id)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": len(self._runs), "started": self.started, "joined": self.joined, "cancelled": self.cancelled}
+
+
+coordinator = SearchCoordinator()
+metrics.register_queue("searches", lambda: coordinator.stats()["running"])
@@ -0,0 +1,319 @@
+# services/sections.py
+# Content for the menu sections that are not a filtered search. Each button
+# has a provider: its own page on the site and its own parser. Mostly-static
+# sections (projects, news, contacts, company) are loaded at startup and
+# refreshed in the background, so their buttons answer from memory.
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from html import escape
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+import config
+from services import cluster, index, markup, metrics, parser, snapshot, upstream
+
+logger = logging.getLogger(__name__)
+
+# listings to page through, or one ready HTML message
+Content = Union[upstream.Listings, str]
+
+# section pages on the site
+PATHS = {
+    "projects": "/public/projects",
+    "news": "/public/blog",
+    "contacts": "/public/contact",
+    "company": "/public/about",
+}
+
+# shown while a section's page answers 404: the paths above are read off the
+# site by hand, and a moved page shouldn't turn the button into an error
+FALLBACK = {
+    "news": "📰 <b>Новости</b>\n\nНовости агентства — на сайте: {site}",
+    "contacts": "📞 <b>Контакты</b>\n\nКак связаться с агентством — на сайте: {site}",
+    "company": "🏢 <b>Enlight Property</b>\n\nАгентство недвижимости в Паттайе. Подробнее на сайте: {site}",
+}
+
+NEWS_ITEMS = 5
+TEXT_LIMIT = 1500  # the company blurb; a Telegram message takes 4096
+
+
+@dataclass(frozen=True)
+class Provider:
+    name: str  # button text
+    fetch: Callable[[], Awaitable[Optional[Content]]]
+    # loaded at startup and refreshed every SECTIONS_REFRESH seconds
+    static: bool = True
+
+
+PROVIDERS: Dict[str, Provider] = {}
+
+
+def provider(name: str, static: bool = True):
+    def register(fetch: Callable[[], Awaitable[Optional[Content]]]):
+        PROVIDERS[name] = Provider(name, fetch, static)
+        return fetch
+    return register
+
+
+# name -> (fetched_at, content) of static sections
+_content: Dict[str, tuple] = {}
+_inflight: Dict[str, asyncio.Task] = {}
+
+stats = {"memory": 0, "fetched": 0, "failed": 0, "missing": 0, "refreshes": 0}
+
+for _key in stats:
+    metrics.CallbackCounter(
+        f"bot_sections_{_key}_total", f"sections.stats[{_key!r}]", fn=lambda k=_key: stats[k]
+    )
+
+
+# ---------- PAGES ----------
+
+def _url(path: str) -> str:
+    return parser.BASE + path
+
+
+def _absolute(href: Optional[str]) -> str:
+    href = str(href or "")
+    return parser.BASE + href if href.startswith("/") else href
+
+
+def _missing(name: str) -> None:
+    stats["missing"] += 1
+    logger.warning("Section page %s answered 404, showing the fallback", PATHS[name])
+
+
+async def _text_page(name: str, parse: Callable[[str], Optional[str]]) -> Optional[str]:
+    try:
+        page = await parser.fetch_page(_url(PATHS[name]), raise_missing=True)
+    except upstream.PageNotFound:
+        _missing(name)
+        return FALLBACK[name].format(site=escape(parser.BASE))
+    if page is None:
+        return None
+    return await asyncio.to_thread(parse, page)
+
+
+_XP_POSTS = markup.XPath(f"//*[{markup.has_class('ltn__blog-item')}]")
+_XP_POST_TITLE = markup.XPath(f"(.//*[{markup.has_class('ltn__blog-title')}]//a)[1]")
+_XP_POST_DATE = markup.XPath(f"(.//*[{markup.has_class('ltn__blog-date')}] | .//time)[1]")
+
+
+def parse_news(page: str) -> Optional[str]:
+    doc = markup.document(page)
+    lines = []
+    for post in _XP_POSTS(doc)[:NEWS_ITEMS]:
+        title = markup.first(_XP_POST_TITLE(post))
+        if title is None:
+            continue
+        date = markup.text(markup.first(_XP_POST_DATE(post)))
+        line = f"• <a href='{escape(_absolute(title.get('href')))}'>{escape(markup.text(title))}</a>"
+        lines.append(f"{line} — {escape(date)}" if date else line)
+    if not lines:
+        return None
+    return "📰 <b>Новости</b>\n\n" + "\n\n".join(lines)
+
+
+_XP_PHONES = markup.XPath("//a[starts-with(@href, 'tel:')]")
+_XP_EMAILS = markup.XPath("//a[starts-with(@href, 'mailto:')]/@href")
+_XP_MESSENGERS = markup.XPath(
+    "//a[contains(@href, 'line.me') or contains(@href, 'wa.me') or contains(@href, 't.me/')]/@href"
+)
+# address lines: paragraphs of the contact blocks that aren't a link
+_XP_ADDRESS = markup.XPath(f"//*[{markup.has_class('ltn__contact-address-item')}]//p[not(.//a)]")
+
+
+def _unique(values) -> List[str]:
+    return list(dict.fromkeys(v.strip() for v in values if v.strip()))
+
+
+def parse_contacts(page: str) -> Optional[str]:
+    doc = markup.document(page)
+    # the number as the site writes it, the tel: target if the link has no text
+    phones = _unique(markup.text(a) or a.get("href")[len("tel:"):] for a in _XP_PHONES(doc))
+    emails = _unique(h[len("mailto:"):].split("?")[0] for h in _XP_EMAILS(doc))
+    messengers = _unique(_XP_MESSENGERS(doc))
+    addresses = _unique(" ".join(p.text_content().split()) for p in _XP_ADDRESS(doc))
+
+    lines = [f"☎️ {escape(p)}" for p in phones]
+    lines += [f"✉️ {escape(e)}" for e in emails]
+    lines += [f"💬 {escape(m)}" for m in messengers]
+    lines += [f"📍 {escape(a)}" for a in addresses]
+    if not lines:
+        return None
+    return "📞 <b>Контакты</b>\n\n" + "\n".join(lines)
+
+
+def parse_about(page: str) -> Optional[str]:
+    doc = markup.document(page)
+    for junk in doc.xpath("//header | //nav | //footer | //script | //style"):
+        junk.drop_tree()
+    title = markup.text(markup.first(doc.xpath("//h1"))) or "Компания"
+    text = ""
+    for p in doc.iter("p"):
+        chunk = " ".join(p.text_content().split())
+        if not chunk:
+            continue
+        if len(text) + len(chunk) > TEXT_LIMIT:
+            break
+        text += chunk + "\n\n"
+    if not text:
+        return None
+    more = escape(_url(PATHS["company"]))
+    return f"🏢 <b>{escape(title)}</b>\n\n{escape(text.strip())}\n\n<a href='{more}'>Подробнее на сайте</a>"
+
+
+# ---------- PROVIDERS ----------
+
+async def _listings(section: str, filters: Dict) -> upstream.Listings:
+    # the index answers once it is built, a live search until then
+    results = await index.search(filters)
+    if results is not None:
+        return results
+    return await parser.parse_properties_async(section, filters)
+
+
+@provider("🌆 Проекты")
+async def projects() -> Optional[Content]:
+    # project cards use the same markup as unit cards
+    try:
+        items = await parser.fetch_parsed(_url(PATHS["projects"]), raise_missing=True)
+    except upstream.PageNotFound:
+        # no projects page: the sale listings, what the button showed before
+        _missing("projects")
+        return await _listings("🌆 Проекты", {"mode": "buy"})
+    return None if items is None else upstream.Listings(items)
+
+
+@provider("📰 Новости")
+async def news() -> Optional[Content]:
+    return await _text_page("news", parse_news)
+
+
+@provider("📞 Контакты")
+async def contacts() -> Optional[Content]:
+    return await _text_page("contacts", parse_contacts)
+
+
+@provider("🏢 Компания")
+async def company() -> Optional[Content]:
+    return await _text_page("company", parse_about)
+
+
+@provider("🏢 Продать недвижимость", static=False)
+async def sell() -> Optional[Content]:
+    # no page of its own: the agency takes listings through its contacts
+    text = await get("📞 Контакты")
+    if not text:
+        return None
+    return "Хотите продать или сдать недвижимость через агентство? Свяжитесь с нами:\n\n" + text
+
+
+@provider("📅 Бронирование", static=False)
+async def booking() -> Optional[Content]:
+    # the rent listings, like the buy search
+    return await _listings("📅 Бронирование", {"mode": "rent"})
+
+
+
+# ---------- MEMORY ----------
+
+def cached(name: str) -> bool:
+    """True if the button can answer without waiting for the site."""
+    if cluster.role == "worker":
+        # the front holds the copies and keeps the static ones loaded
+        return PROVIDERS[name].static
+    return name in _content
+
+
+async def _load(p: Provider) -> Optional[Content]:
+    """One fetch per section at a time; concurrent callers share it."""
+    task = _inflight.get(p.name)
+    if task is None:
+        task = _inflight[p.name] = asyncio.ensure_future(p.fetch())
+        task.add_done_callback(lambda t: _inflight.pop(p.name, None))
+    try:
+        content = await asyncio.shield(task)
+    except upstream.UpstreamUnavailable:
+        content = None
+    except Exception:
+        logger.exception("Section %s failed to load", p.name)
+        content = None
+
+    if not content:
+        stats["failed"] += 1
+        return None
+    stats["fetched"] += 1
+    if p.static:
+        _content[p.name] = (time.time(), content)
+    return content
+
+
+@cluster.shared
+async def get(name: str) -> Optional[Content]:
+    """The section's content, from memory when possible; None if the site failed and there is no copy."""
+    p = PROVIDERS[name]
+    got = _content.get(name)
+    if got is not None:
+        stats["memory"] += 1
+        fetched_at, content = got
+        if isinstance(content, upstream.Listings) and time.time() - fetched_at > 2 * config.SECTIONS_REFRESH:
+            # refreshes keep failing: say how old the list is
+            return upstream.Listings(content, fetched_at, stale=True)
+        return content
+    with upstream.deadline(config.UPSTREAM_DEADLINE):
+        return await _load(p)
+
+
+async def refresh() -> None:
+    static = [p for p in PROVIDERS.values() if p.static]
+    results = await asyncio.gather(*(_load(p) for p in static))
+    stats["refreshes"] += 1
+    failed = [p.name for p, c in zip(static, results) if c is None]
+    if failed:
+        # keep serving the previous copy
+        logger.warning("Sections refresh: %s failed", ", ".join(failed))
+
+
+def _restore(saved: Dict[str, tuple], age: float) -> int:
+    # fetched_at is wall-clock time, nothing to shift
+    restored = {name: got for name, got in saved.items() if name in PROVIDERS and PROVIDERS[name].static}
+    _content.update(restored)
+    return len(restored)
+
+
+snapshot.register("sections", lambda: dict(_content), _restore)
+
+
+async def refresh_forever() -> None:
+    static = [name for name, p in PROVIDERS.items() if p.static]
+    if all(name in _content for name in static):
+        # restored from the snapshot: refresh when the oldest copy is due
+        oldest = min(_content[name][0] for name in static)
+        await asyncio.sleep(max(0.0, config.SECTIONS_REFRESH - (time.time() - oldest)))
+
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.exception("Sections refresh failed")
+        await asyncio.sleep(config.SECTIONS_REFRESH)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def start() -> None:
+    # in the background: a slow site must not hold up polling
+    global _task
+    _task = asyncio.create_task(refresh_forever())
+
+
+async def stop() -> None:
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
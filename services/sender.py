@@ -0,0 +1,213 @@
+# services/sender.py
+# Outbound Telegram throttling. Every API call that targets a chat waits for
+# a slot: a global token bucket (~30 msg/s) and a per-chat bucket (~1 msg/s).
+# Chats waiting for a slot are served by priority, then in arrival order,
+# so one user's long result page can't starve everybody else.
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# lower is served first; background fan-out runs with LOW
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = ("high", "normal", "low")
+send_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=NORMAL)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        # Telegram told us to back off: drain the bucket for that long
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    aiogram session middleware: bot.session.middleware(SendScheduler()).
+    Calls without a chat_id (getUpdates, answerCallbackQuery, ...) pass through.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._queues: Dict[Any, Deque[Tuple[int, int, asyncio.Future]]] = {}
+        self._ready: List[Tuple[int, int, Any]] = []      # (priority, seq, chat)
+        self._waiting: List[Tuple[float, int, Any]] = []  # (ready_at, seq, chat)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # waits and sent/retried/dropped counts go to bot_send_wait_seconds and bot_send_events_total
+        metrics.register_queue("send", lambda: self.queue_depth)
+
+    # ----- metrics -----
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    # ----- scheduling -----
+
+    def _bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            # forget idle chats so the dict doesn't grow forever
+            if len(self._chats) > 10_000:
+                now = time.monotonic()
+                for cid in [c for c, b in self._chats.items() if now - b.updated > 60 and c not in self._queues]:
+                    del self._chats[cid]
+        return bucket
+
+    def _drop_cancelled(self, chat_id: Any) -> bool:
+        """Pops sends whose caller gave up (e.g. a cancelled search); False if none are left."""
+        queue = self._queues[chat_id]
+        while queue and queue[0][2].cancelled():
+            queue.popleft()
+            metrics.send_events.inc("dropped")
+        if not queue:
+            del self._queues[chat_id]
+            return False
+        return True
+
+    def _schedule_chat(self, chat_id: Any, now: float) -> None:
+        if not self._drop_cancelled(chat_id):
+            return
+        queue = self._queues[chat_id]
+        priority, seq, _ = queue[0]
+        delay = self._bucket(chat_id).delay(now)
+        if delay <= 0:
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+        else:
+            heapq.heappush(self._waiting, (now + delay, seq, chat_id))
+
+    async def acquire(self, chat_id: Any) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (send_priority.get(), next(self._seq), fut)
+
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            self._queues[chat_id] = deque([entry])
+            self._schedule_chat(chat_id, time.monotonic())
+        else:
+            queue.append(entry)
+        self._wakeup.set()
+
+        started = time.monotonic()
+        await fut
+        metrics.record("send_wait", time.monotonic() - started, PRIORITY_NAMES[entry[0]])
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._waiting)
+                self._schedule_chat(chat_id, now)
+
+            if not self._ready:
+                # sleep until a new request arrives or the next chat's bucket refills
+                self._wakeup.clear()
+                timer = None
+                if self._waiting:
+                    timer = asyncio.get_running_loop().call_later(self._waiting[0][0] - now, self._wakeup.set)
+                try:
+                    await self._wakeup.wait()
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+                continue
+
+            delay = self.global_bucket.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            if not self._drop_cancelled(chat_id):
+                continue
+            queue = self._queues[chat_id]
+            _, _, fut = queue.popleft()
+
+            self.global_bucket.take(now)
+            self._bucket(chat_id).take(now)
+            fut.set_result(None)
+
+            if queue:
+                self._schedule_chat(chat_id, now)
+            else:
+                del self._queues[chat_id]
+
+    # ----- middleware -----
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Any,
+        method: TelegramMethod,
+    ) -> Response:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        with metrics.span("send", type(method).__name__):
+            return await self._send(make_request, bot, method, chat_id)
+
+    async def _send(self, make_request: NextRequestMiddlewareType, bot: Any, method: TelegramMethod, chat_id: Any) -> Response:
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(chat_id)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                metrics.send_events.inc("retried")
+                logger.warning("RetryAfter %ss for chat %s (%s)", e.retry_after, chat_id, type(method).__name__)
+                # the next acquire() waits the pause out
+                self._bucket(chat_id).pause(e.retry_after)
+                continue
+            metrics.send_events.inc("sent")
+            return result
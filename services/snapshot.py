@@ -0,0 +1,114 @@
+# services/snapshot.py
+# Warm restarts. At shutdown the caches worth keeping (parsed pages, search
+# results, result sets users are paging through, menu sections) are written
+# to one file in DATA_DIR; at startup they are put back with their TTLs
+# shortened by the time the process was down, so the first updates after a
+# deploy are answered from memory instead of from the site.
+#
+# pickle, not msgpack: the values are Listing tables and page states, and
+# the file is only ever read back by this bot from its own volume.
+import asyncio
+import logging
+import os
+import pickle
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+from services import cluster
+from services.cache import TTLCache
+from services.listing import FIELDS, ListingTable
+from services.upstream import Listings
+
+logger = logging.getLogger(__name__)
+
+# bump when the pickled shapes change in a way the check below can't see
+VERSION = 1
+_SHAPE = (VERSION, FIELDS, ListingTable.__slots__, Listings.__slots__)
+
+# name -> (dump(), load(payload, age))
+_parts: Dict[str, Tuple[Callable[[], Any], Callable[[Any, float], int]]] = {}
+
+
+def register(name: str, dump: Callable[[], Any], load: Callable[[Any, float], int]) -> None:
+    _parts[name] = (dump, load)
+
+
+def register_cache(name: str, cache: TTLCache) -> None:
+    register(name, cache.dump, cache.load)
+
+
+def _path() -> str:
+    # workers keep their own part (the result sets of their chats)
+    name = "snapshot.pickle" if cluster.worker_id is None else f"snapshot-worker{cluster.worker_id}.pickle"
+    return os.path.join(config.DATA_DIR, name)
+
+
+def save(path: Optional[str] = None) -> int:
+    """Writes every registered part; returns the file size in bytes."""
+    path = path or _path()
+    started = time.perf_counter()
+    parts = {}
+    for name, (dump, _) in _parts.items():
+        try:
+            parts[name] = dump()
+        except Exception:
+            logger.exception("Snapshot: could not dump %s", name)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"shape": _SHAPE, "written_at": time.time(), "parts": parts}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    size = os.path.getsize(path)
+    logger.info("Snapshot saved: %s, %.0f KB in %.0fms", ", ".join(parts), size / 1024, (time.perf_counter() - started) * 1000)
+    return size
+
+
+def restore(path: Optional[str] = None) -> Dict[str, int]:
+    """Loads the snapshot into the registered parts; {part: entries restored}."""
+    path = path or _path()
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            snap = pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        # written by another version of the code, or cut short
+        logger.warning("Snapshot %s could not be read, starting cold", path, exc_info=True)
+        return {}
+
+    if snap.get("shape") != _SHAPE:
+        logger.info("Snapshot %s is from an incompatible version, starting cold", path)
+        return {}
+
+    age = max(0.0, time.time() - snap["written_at"])
+    restored = {}
+    for name, payload in snap["parts"].items():
+        part = _parts.get(name)
+        if part is None:
+            continue
+        try:
+            restored[name] = part[1](payload, age)
+        except Exception:
+            logger.warning("Snapshot: could not restore %s", name, exc_info=True)
+    logger.info(
+        "Snapshot restored in %.0fms (%.0fs old): %s", (time.perf_counter() - started) * 1000, age,
+        ", ".join(f"{name}={n}" for name, n in restored.items())
+    )
+    return restored
+
+
+async def on_startup() -> None:
+    if config.SNAPSHOT:
+        restore()
+
+
+async def on_shutdown() -> None:
+    if not config.SNAPSHOT:
+        return
+    try:
+        await asyncio.to_thread(save)
+    except Exception:
+        logger.exception("Snapshot could not be saved")
@@ -0,0 +1,231 @@
+# services/storage.py
+# FSM storages. SQLite (WAL, write-behind batches) keeps users' filters across
+# restarts; Redis is there for running several instances. Either one is
+# wrapped in a per-update cache, so the repeated state.get_data() calls inside
+# one handler hit the backend only once.
+import asyncio
+import contextvars
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _key(key: StorageKey) -> str:
+    return ":".join(str(p) for p in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+    ))
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+# ---------- SQLITE ----------
+
+class SQLiteStorage(BaseStorage):
+    """
+    Writes go to an in-memory pending map and are flushed in one transaction
+    every flush_interval seconds, so a burst of clicks costs one fsync.
+    A crash loses at most flush_interval seconds of filter changes.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5, max_pending: int = 500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+        # key -> (state, data as json)
+        self._pending: Dict[str, Tuple[Optional[str], str]] = {}
+        # the batch being committed: still newer than what the table holds
+        self._flushing: Dict[str, Tuple[Optional[str], str]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_now: Optional[asyncio.Event] = None
+
+    def _unflushed(self, k: str) -> Optional[Tuple[Optional[str], str]]:
+        pending = self._pending.get(k)
+        return pending if pending is not None else self._flushing.get(k)
+
+    def _select(self, k: str) -> Optional[tuple]:
+        # waits for a commit in progress: off the event loop
+        with self._lock:
+            return self._db.execute("SELECT state, data FROM fsm WHERE key = ?", (k,)).fetchone()
+
+    async def _read(self, k: str) -> Tuple[Optional[str], str]:
+        unflushed = self._unflushed(k)
+        if unflushed is not None:
+            return unflushed
+        row = await asyncio.to_thread(self._select, k)
+        # written while the SELECT ran: the write is newer. A batch committed
+        # after the SELECT is still in _flushing here, since the flush resumes
+        # after us.
+        unflushed = self._unflushed(k)
+        if unflushed is not None:
+            return unflushed
+        return (row[0], row[1]) if row else (None, "{}")
+
+    def _write(self, k: str, state: Optional[str], data: str) -> None:
+        self._pending[k] = (state, data)
+
+        if self._flusher is None or self._flusher.done():
+            self._flush_now = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.max_pending:
+            self._flush_now.set()
+
+    def _commit(self, batch: Dict[str, Tuple[Optional[str], str]]) -> None:
+        upserts = [(k, s, d) for k, (s, d) in batch.items() if s is not None or d != "{}"]
+        deletes = [(k,) for k, (s, d) in batch.items() if s is None and d == "{}"]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO fsm (key, state, data) VALUES (?, ?, ?)", upserts)
+                self._db.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        try:
+            await asyncio.to_thread(self._commit, batch)
+        except Exception:
+            logger.exception("FSM flush failed, will retry")
+            # newer writes win over the failed batch
+            self._pending = {**batch, **self._pending}
+        finally:
+            self._flushing = {}
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            timer = loop.call_later(self.flush_interval, self._flush_now.set)
+            try:
+                await self._flush_now.wait()
+            finally:
+                timer.cancel()
+            self._flush_now.clear()
+            await self.flush()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = _key(key)
+        _, data = await self._read(k)
+        self._write(k, _state_name(state), data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._read(_key(key)))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = _key(key)
+        state, _ = await self._read(k)
+        self._write(k, state, json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return json.loads((await self._read(_key(key)))[1])
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.flush()
+        with self._lock:
+            self._db.close()
+
+
+# ---------- PER-UPDATE CACHE ----------
+
+_update_cache: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("fsm_update_cache", default=None)
+
+
+class UpdateCacheMiddleware(BaseMiddleware):
+    """Outer update middleware: gives every update its own empty FSM read cache."""
+
+    async def __call__(self, handler, event, data):
+        token = _update_cache.set({})
+        try:
+            return await handler(event, data)
+        finally:
+            _update_cache.reset(token)
+
+
+class UpdateCachedStorage(BaseStorage):
+    """Read-through/write-through cache over another storage, scoped to one update."""
+
+    def __init__(self, inner: BaseStorage):
+        self.inner = inner
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self.inner.set_state(key, state)
+        cache = _update_cache.get()
+        if cache is not None:
+            cache[("state", key)] = _state_name(state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        cache = _update_cache.get()
+        if cache is not None and ("state", key) in cache:
+            return cache[("state", key)]
+        state = await self.inner.get_state(key)
+        if cache is not None:
+            cache[("state", key)] = state
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self.inner.set_data(key, data)
+        cache = _update_cache.get()
+        if cache is not None:
+            cache[("data", key)] = copy.deepcopy(data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        cache = _update_cache.get()
+        if cache is not None and ("data", key) in cache:
+            return copy.deepcopy(cache[("data", key)])
+        data = await self.inner.get_data(key)
+        if cache is not None:
+            cache[("data", key)] = copy.deepcopy(data)
+        return data
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+# ---------- FACTORY ----------
+
+def create_storage() -> BaseStorage:
+    """FSM_STORAGE: sqlite (default), redis or memory."""
+    kind = config.FSM_STORAGE
+
+    if kind == "memory":
+        return MemoryStorage()
+
+    if kind == "redis":
+        # optional dependency: pip install redis
+        from aiogram.fsm.storage.redis import RedisStorage
+        inner = RedisStorage.from_url(config.REDIS_URL)
+    else:
+        inner = SQLiteStorage(os.path.join(config.DATA_DIR, "fsm.sqlite3"), config.FSM_FLUSH_INTERVAL)
+
+    return UpdateCachedStorage(inner)
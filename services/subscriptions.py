@@ -0,0 +1,254 @@
+# services/subscriptions.py
+# Saved searches ("🔔 Подписаться"). After every crawl the new index is diffed
+# against the previous one by link fingerprints, the new listings are matched
+# against all subscriptions at once through an inverted index, and each
+# subscriber gets one message, sent at low priority through the send scheduler.
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from html import escape
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+import config
+from services import cluster, index
+from services.features import required_mask
+from services.parser import price_in_range
+from services.sender import LOW, send_priority
+
+logger = logging.getLogger(__name__)
+
+# what a saved search remembers from the filter state
+SAVED_KEYS = ("mode", "location", "min_price", "max_price", "bedrooms", "property_type", "features")
+
+# filter keys that go into the inverted index; ANY is "not set"
+MATCH_FIELDS = ("property_type", "bedrooms", "location")
+ANY = None
+
+
+def fingerprint(link: str) -> int:
+    return int.from_bytes(hashlib.blake2b(link.encode(), digest_size=8).digest(), "big")
+
+
+# ---------- STORE ----------
+
+class SubscriptionStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+            "filters TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self.subs: Dict[int, Dict] = {}
+        for sid, chat_id, filters in self._db.execute("SELECT id, chat_id, filters FROM subscriptions"):
+            self.subs[sid] = {"id": sid, "chat_id": chat_id, "filters": json.loads(filters)}
+        self._matcher: Optional[Matcher] = None
+
+    def for_chat(self, chat_id: int) -> List[Dict]:
+        return [s for s in self.subs.values() if s["chat_id"] == chat_id]
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        # runs in a worker thread (asyncio.to_thread): the loop never waits on the disk
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    async def add(self, chat_id: int, filters: Dict) -> Optional[int]:
+        """Saves the search; None if the chat already has it or hit the limit."""
+        saved = {k: filters.get(k) for k in SAVED_KEYS}
+        mine = self.for_chat(chat_id)
+        if any(s["filters"] == saved for s in mine) or len(mine) >= config.SUBSCRIPTIONS_PER_CHAT:
+            return None
+
+        cur = await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO subscriptions (chat_id, filters, created) VALUES (?, ?, ?)",
+            (chat_id, json.dumps(saved, ensure_ascii=False), time.time()),
+        )
+        sid = cur.lastrowid
+        self.subs[sid] = {"id": sid, "chat_id": chat_id, "filters": saved}
+        self._matcher = None
+        return sid
+
+    async def remove(self, sid: int, chat_id: Optional[int] = None) -> bool:
+        sub = self.subs.get(sid)
+        if sub is None or (chat_id is not None and sub["chat_id"] != chat_id):
+            return False
+        # out of memory first: a second remove of the same id while the DELETE runs finds nothing
+        del self.subs[sid]
+        self._matcher = None
+        await asyncio.to_thread(self._execute, "DELETE FROM subscriptions WHERE id = ?", (sid,))
+        return True
+
+    async def remove_chat(self, chat_id: int) -> None:
+        for sub in self.for_chat(chat_id):
+            await self.remove(sub["id"])
+
+    async def reload(self) -> None:
+        """Picks up searches saved by other processes (cluster workers)."""
+        rows = await asyncio.to_thread(self._query, "SELECT id, chat_id, filters FROM subscriptions")
+        subs = {sid: {"id": sid, "chat_id": chat_id, "filters": json.loads(filters)} for sid, chat_id, filters in rows}
+        if subs != self.subs:
+            self.subs = subs
+            self._matcher = None
+
+    @property
+    def matcher(self) -> "Matcher":
+        if self._matcher is None:
+            self._matcher = Matcher(self.subs.values())
+        return self._matcher
+
+
+class Matcher:
+    """
+    (field, value) -> subscription ids, with ANY for "not set". A listing
+    only meets the subscriptions in the intersection of its own postings;
+    price and features are checked on that short list.
+    """
+
+    def __init__(self, subs):
+        self.subs = {s["id"]: s for s in subs}
+        self.by_mode: Dict[str, Set[int]] = defaultdict(set)
+        self.by_field: Dict[str, Dict[Optional[str], Set[int]]] = {f: defaultdict(set) for f in MATCH_FIELDS}
+
+        for sid, sub in self.subs.items():
+            f = sub["filters"]
+            self.by_mode[f.get("mode") or "buy"].add(sid)
+            for key in MATCH_FIELDS:
+                value = f.get(key)
+                self.by_field[key][str(value) if value else ANY].add(sid)
+
+    def match(self, mode: str, attrs: Dict[str, Optional[str]], price: Optional[int], features: int) -> Set[int]:
+        cand = self.by_mode.get(mode)
+        if not cand:
+            return set()
+        cand = set(cand)
+        for key, postings in self.by_field.items():
+            value = attrs.get(key)
+            ok = postings.get(ANY, set())
+            if value is not None:
+                ok = ok | postings.get(value, set())
+            cand &= ok
+            if not cand:
+                return cand
+
+        out = set()
+        for sid in cand:
+            f = self.subs[sid]["filters"]
+            # same rule as search: unpriced listings never match
+            if not price_in_range(price, f.get("min_price"), f.get("max_price")):
+                continue
+            req = required_mask(f.get("features"))
+            if (features & req) != req:
+                continue
+            out.add(sid)
+        return out
+
+
+_store: Optional[SubscriptionStore] = None
+
+
+def store() -> SubscriptionStore:
+    global _store
+    if _store is None:
+        _store = SubscriptionStore(os.path.join(config.DATA_DIR, "subscriptions.sqlite3"))
+    return _store
+
+
+# ---------- DIFF + FAN-OUT ----------
+
+def new_matches(old: index.ListingIndex, new: index.ListingIndex) -> Dict[int, List[int]]:
+    """chat_id -> ids of listings in `new` that are not in `old` and match one of the chat's searches."""
+    subs = store()
+    if not subs.subs:
+        return {}
+
+    seen = {fingerprint(r[1]) for r in old.records if r[1]}
+    fresh = [rid for rid, r in enumerate(new.records) if r[1] and fingerprint(r[1]) not in seen]
+    if not fresh:
+        return {}
+
+    matcher = subs.matcher
+    types, beds = new.values_of("type"), new.values_of("bed")
+    modes = {rid: mode for mode, ids in new.postings["mode"].items() for rid in ids}
+
+    out: Dict[int, List[int]] = defaultdict(list)
+    for rid in fresh:
+        record = new.records[rid]
+        attrs = {"property_type": types.get(rid), "bedrooms": beds.get(rid), "location": record[index.AREA]}
+        for sid in matcher.match(modes.get(rid, "buy"), attrs, record[index.PRICE], record[index.FEATURES]):
+            chat_id = matcher.subs[sid]["chat_id"]
+            if rid not in out[chat_id]:
+                out[chat_id].append(rid)
+    return out
+
+
+def _notification(idx: index.ListingIndex, rids: List[int]) -> str:
+    lines = [f"🔔 Новые объекты по вашей подписке: {len(rids)}"]
+    for rid in rids[:config.SUBSCRIPTION_ITEMS_PER_MESSAGE]:
+        item = dict(zip(index.FIELDS, idx.records[rid]))
+        lines.append(
+            f"\n<b>{escape(item['title'] or '')}</b>\n💰 {escape(item['price'] or '')}\n"
+            f"<a href='{escape(item['link'] or '')}'>Подробнее</a>"
+        )
+    rest = len(rids) - config.SUBSCRIPTION_ITEMS_PER_MESSAGE
+    if rest > 0:
+        lines.append(f"\n…и ещё {rest}")
+    return "\n".join(lines)
+
+
+def _unsubscribe_kb(chat_id: int) -> InlineKeyboardMarkup:
+    rows = []
+    for sub in store().for_chat(chat_id):
+        mode = sub["filters"].get("mode") or "buy"
+        rows.append([InlineKeyboardButton(text=f"🔕 Отписаться #{sub['id']}", callback_data=f"{mode}:unsub:{sub['id']}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def _notify(bot: Bot, chat_id: int, idx: index.ListingIndex, rids: List[int]) -> None:
+    send_priority.set(LOW)  # interactive traffic goes first
+    try:
+        await bot.send_message(
+            chat_id, _notification(idx, rids),
+            reply_markup=_unsubscribe_kb(chat_id),
+            disable_web_page_preview=True,
+        )
+    except TelegramForbiddenError:
+        # пользователь заблокировал бота
+        await store().remove_chat(chat_id)
+    except TelegramBadRequest:
+        logger.warning("Subscription notice to %s failed", chat_id, exc_info=True)
+
+
+async def start(bot: Bot) -> None:
+    async def on_index_update(old: Optional[index.ListingIndex], new: index.ListingIndex) -> None:
+        if old is None:
+            # first crawl ever: everything is "new", nothing to announce
+            return
+        if cluster.role == "front":
+            # searches are saved by the workers
+            await store().reload()
+        matches = new_matches(old, new)
+        if not matches:
+            return
+        logger.info("Saved searches: %d listings for %d chats", sum(map(len, matches.values())), len(matches))
+        await asyncio.gather(*(_notify(bot, chat_id, new, rids) for chat_id, rids in matches.items()))
+
+    store()
+    index.listeners.append(on_index_update)
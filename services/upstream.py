@@ -0,0 +1,166 @@
+# services/upstream.py
+# Guard rails for talking to enlightproperty.com: a circuit breaker so a dead
+# site costs us nothing, bounded retries with jittered backoff, and a
+# per-search deadline budget. When the site can't answer in time, searches
+# fall back to older results instead of waiting out every timeout.
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+import config
+from services.listing import ListingTable
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """The site didn't answer and there is nothing cached to show instead."""
+
+
+class PageNotFound(Exception):
+    """The site answered 404: the page isn't there, the site itself is up."""
+
+
+class Listings(ListingTable):
+    """
+    Search results plus where they came from. `fetched_at` is the wall-clock
+    time of the oldest page in the list; `stale` is set when they were served
+    as a fallback rather than fetched for this request. `pages` is the page
+    count a result page links to (0 if unknown). `total` is how many matched
+    when only the best of them were kept (0: nothing was cut).
+    """
+
+    __slots__ = ("fetched_at", "stale", "pages", "total")
+
+    def __init__(
+        self, items: Iterable = (), fetched_at: Optional[float] = None, stale: bool = False, pages: int = 0,
+        total: int = 0,
+    ):
+        super().__init__(items)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.stale = stale
+        self.pages = pages
+        self.total = total
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+# ---------- CIRCUIT BREAKER ----------
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+# allow(): refused (falsy), let through, let through as the half-open probe
+REFUSED, ADMITTED, PROBE = 0, 1, 2
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` failures in a row; while open every call is
+    refused at once. After `reset_after` seconds one probe is let through:
+    success closes the breaker, failure opens it for another period.
+    """
+
+    def __init__(self, failures: int = 5, reset_after: float = 30.0):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0  # how many times it tripped
+
+    def allow(self) -> int:
+        """REFUSED, ADMITTED, or PROBE when this call took the half-open slot (free it with release())."""
+        if self.state == CLOSED:
+            return ADMITTED
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_after:
+                return REFUSED
+            self.state = HALF_OPEN
+        # half-open: a single probe at a time
+        if self._probing:
+            return REFUSED
+        self._probing = True
+        return PROBE
+
+    def success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Upstream is back, circuit closed")
+        self.state = CLOSED
+        self._failed = 0
+        self._probing = False
+
+    def failure(self) -> None:
+        self._failed += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._failed >= self.failures):
+            if self.state == CLOSED:
+                logger.warning("Upstream failed %d times in a row, circuit open for %.0fs", self._failed, self.reset_after)
+                self.opened += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Frees the probe slot; only for a call that allow() let through as the PROBE."""
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN and time.monotonic() - self._opened_at < self.reset_after
+
+
+breaker = CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET)
+
+
+# ---------- RETRIES ----------
+
+def backoff(attempt: int) -> float:
+    """Full jitter: uniform in [0, base * 2^attempt], capped."""
+    return random.uniform(0, min(config.UPSTREAM_BACKOFF_MAX, config.UPSTREAM_BACKOFF * 2 ** attempt))
+
+
+# ---------- DEADLINE ----------
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Budget for everything upstream inside the block (and tasks started from it)."""
+    at = asyncio.get_running_loop().time() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def unbudgeted() -> contextvars.Context:
+    """A copy of the current context without the budget, for tasks that outlive the search starting them."""
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    return ctx
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, None without one."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(0.0, at - asyncio.get_running_loop().time())
+
+
+def attempt_timeout() -> Optional[float]:
+    """Timeout for one request: the scraper timeout cut to the budget; None when it's spent."""
+    left = remaining()
+    if left is None:
+        return config.SCRAPER_TIMEOUT
+    if left < config.UPSTREAM_MIN_ATTEMPT:
+        return None
+    return min(config.SCRAPER_TIMEOUT, left)
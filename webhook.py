@@ -0,0 +1,106 @@
+# webhook.py
+# Режим webhook: aiohttp-сервер принимает апдейты от Telegram вместо long polling.
+# Тот же сервер отдаёт /healthz для проверок Fly.
+import asyncio
+import logging
+import signal
+import time
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+import config
+from services import cluster, index, metrics
+
+logger = logging.getLogger(__name__)
+
+_started_at = time.monotonic()
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """При остановке ждёт апдейты, которые ещё обрабатываются, и только потом закрывает сессию бота."""
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def close(self) -> None:
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            logger.info("Draining %d in-flight updates...", len(tasks))
+            done, pending = await asyncio.wait(tasks, timeout=config.SHUTDOWN_DRAIN_TIMEOUT)
+            if pending:
+                logger.warning("%d updates still running after %.0fs, cancelling", len(pending), config.SHUTDOWN_DRAIN_TIMEOUT)
+                for t in pending:
+                    t.cancel()
+        await super().close()
+
+
+def health_app(handler: DrainingRequestHandler = None) -> web.Application:
+    async def healthz(request: web.Request) -> web.Response:
+        idx = index.current()
+        return web.json_response({
+            "status": "ok",
+            "mode": config.RUN_MODE,
+            "uptime": round(time.monotonic() - _started_at, 1),
+            "in_flight": handler.in_flight if handler else None,
+            # во фронте кластера апдейты обрабатывают воркеры
+            "updates_handled": cluster.stats["done"] if cluster.role == "front"
+            else sum(map(sum, metrics.update_seconds.counts.values())),
+            "index_records": len(idx) if idx else 0,
+        })
+
+    async def prometheus(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", prometheus)
+    return app
+
+
+async def serve(app: web.Application) -> None:
+    """Запускает приложение и ждёт SIGTERM/SIGINT; on_shutdown отрабатывает в cleanup()."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, config.WEB_HOST, config.WEB_PORT).start()
+    logger.info("HTTP server on %s:%s", config.WEB_HOST, config.WEB_PORT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    handler = DrainingRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=config.WEBHOOK_IN_BACKGROUND,
+        secret_token=config.WEBHOOK_SECRET or None,
+    )
+    app = health_app(handler)
+    # обработчик регистрируем раньше setup_application: при остановке
+    # сначала дожидаемся апдейтов, потом dp.shutdown (краулер, HTTP-пул)
+    handler.register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    if config.WEBHOOK_BASE_URL:
+        async def set_webhook(app: web.Application) -> None:
+            await bot.set_webhook(
+                url=config.WEBHOOK_BASE_URL.rstrip("/") + config.WEBHOOK_PATH,
+                secret_token=config.WEBHOOK_SECRET or None,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+        app.on_startup.append(set_webhook)
+    else:
+        logger.warning("WEBHOOK_BASE_URL is not set, webhook is not registered with Telegram")
+
+    await serve(app)